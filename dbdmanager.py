@@ -1,24 +1,130 @@
-import requests
-from bs4 import BeautifulSoup
 import sqlite3
 import logging
 import os
 import shutil
-from flask import Flask, jsonify, request
+import sys
+from flask import Flask, g, jsonify, request, Response, stream_with_context, send_from_directory, url_for
 from flask_cors import CORS
+from werkzeug.serving import make_server
 from random import *
+from collections import OrderedDict
 import unicodedata
+from bisect import bisect_left, bisect_right
+import argparse
+import cProfile
+import contextlib
+import itertools
+import marshal
+import hashlib
+import mmap
+import struct
+import io
+import difflib
+import re
+from html import unescape
+import gc
+import gzip
+import json
+import threading
+import signal
+import socket
+import subprocess
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import time
+import uuid
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional; cached catalog responses are then offered gzipped only.
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the API is served from a single process.
+    fcntl = None
 
 DB_PATH = "dbd_data.db"
 DEBUG = False
-
-def setup_logging():
+# Icons are mirrored into ICON_DIR during a rebuild and served from /icons.
+# With OFFLINE_ICONS (DBD_OFFLINE_ICONS=1, or --offline-icons), the database
+# stores the mirrored icons' /icons/<file> paths instead of the wiki's CDN URLs.
+# The paths are relative to the API's address, so the database works wherever
+# it is served from. Thumbnails (served with /icons/<file>?size=N) and per-role
+# perk sprite sheets are made when Pillow is installed.
+ICON_MIRROR = True
+OFFLINE_ICONS = os.environ.get("DBD_OFFLINE_ICONS", "0") not in ("", "0")
+ICON_DIR = "icon_mirror"
+ICON_THUMB_SIZES = (64, 128)
+ICON_SPRITE_SIZE = 64
+ICON_MAX_AGE = 365 * 24 * 3600
+# Address the API listens on, and the listen backlog shared by the worker
+# processes of serve mode.
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 5000
+SERVE_BACKLOG = 1024
+# A worker that exits within SERVE_FAST_FAILURE seconds of starting is restarted
+# after a delay that doubles with each such exit, up to SERVE_RESPAWN_MAX_DELAY;
+# after SERVE_MAX_FAST_FAILURES of them in a row, serve mode gives up.
+SERVE_FAST_FAILURE = 5
+SERVE_RESPAWN_MAX_DELAY = 30
+SERVE_MAX_FAST_FAILURES = 5
+# Largest amount /api/batch_random_build accepts, and the amount above which the
+# builds are streamed in chunks instead of being returned in one response body.
+BATCH_BUILD_MAX = 100000
+BATCH_BUILD_STREAM_THRESHOLD = 1000
+BATCH_BUILD_CHUNK = 500
+# /api/search: largest page size, and the shortest search word that is matched
+# against similar words when nothing starts with it.
+SEARCH_MAX_LIMIT = 100
+SEARCH_TYPO_MIN_LENGTH = 4
+# Quiz sessions: how many decks are kept in memory, how long an unused one is
+# kept, how many options each question offers, and the highest question number
+# a session deals.
+QUIZ_SESSION_MAX = 1000
+QUIZ_SESSION_TTL = 3600
+QUIZ_OPTIONS = 4
+QUIZ_MAX_INDEX = 1000000
+# Fewest add-ons a killer or item needs to be the subject of a random add-on
+# question: the answer and at least one wrong option.
+ADDON_QUESTION_MIN_ADDONS = 2
+# /metrics: upper bounds (in seconds) of the latency histogram buckets kept for
+# every route and SQLite query kind, the response statuses counted on their own
+# (the rest are counted as "other"), and the most worker processes serve mode
+# keeps counters for.
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+METRICS_STATUSES = (200, 202, 304, 400, 404, 409, 500, 503)
+METRICS_MAX_WORKERS = 64
+# Opt-in profiling, written to PROFILE_DIR as a .pstats file and a .collapsed
+# (flamegraph) stack file per profile. DBD_PROFILE=1 lets single requests ask
+# for a profile with ?profile=1 or an "X-Profile: 1" header, DBD_PROFILE_SAMPLE=N
+# profiles one in N requests, and DBD_PROFILE_REBUILD=1 profiles every rebuild
+# by sampling the stacks of all its threads every PROFILE_SAMPLE_INTERVAL seconds.
+PROFILE_DIR = "profiles"
+PROFILE_REQUESTS = os.environ.get("DBD_PROFILE", "0") not in ("", "0")
+PROFILE_SAMPLE_RATE = int(os.environ.get("DBD_PROFILE_SAMPLE", "0") or 0)
+PROFILE_REBUILDS = os.environ.get("DBD_PROFILE_REBUILD", "0") not in ("", "0")
+PROFILE_SAMPLE_INTERVAL = 0.005
+# Compression levels for the catalog responses that are serialized once per
+# database generation (see cached_json_response).
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 11
+# Catalog snapshot to ship with a deployment, written by `python dbdmanager.py
+# bundle`; the repository doesn't include one. A server started without a
+# database serves it, if it is there, while the database is built from the
+# wiki in a separate process (see prepare_database).
+BUNDLED_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_bundle.snapshot")
+
+def setup_logging(archive_old=True):
     if not DEBUG:
         return
     log_dir = "logs"
     log_file = "latest.log"
     # Move old log file if exists
-    if os.path.exists(log_file):
+    if archive_old and os.path.exists(log_file):
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
         # Find a unique name for the old log
@@ -47,7 +153,23 @@ def setup_logging():
         ]
     )
 
-setup_logging()
+# Optional dependencies that are slow to import and only needed by some requests
+# or by rebuilds (NumPy, Pillow) are imported on first use, so they don't slow
+# down starting the server.
+_optional_modules = {}
+
+def optional_module(name):
+    """Import name on first use and return it, or None if it is not installed."""
+    try:
+        return _optional_modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _optional_modules[name] = module
+    return module
 
 def create_tables(conn):
     c = conn.cursor()
@@ -127,570 +249,1695 @@ def create_tables(conn):
     ''')
     conn.commit()
 
-def scrape_killers():
-    url = "https://deadbydaylight.fandom.com/wiki/Killers"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s"
+# Full-text index over the names, owners and plain-text descriptions of perks,
+# add-ons, items and offerings, with the fields /api/search returns stored
+# alongside. search_terms lists its vocabulary for typo-tolerant matching.
+SEARCH_INDEX_SOURCES = """
+    SELECT 'perk', 'killer', kp.name, k.name, kp.icon, kp.description
+    FROM killer_perks kp LEFT JOIN killers k ON kp.killer_id = k.id
+    UNION ALL
+    SELECT 'perk', 'survivor', sp.name, s.name, sp.icon, sp.description
+    FROM survivor_perks sp LEFT JOIN survivors s ON sp.survivor_id = s.id
+    UNION ALL
+    SELECT 'addon', 'killer', a.name, k.name, a.icon, a.description
+    FROM killer_addons a LEFT JOIN killers k ON a.killer_id = k.id
+    UNION ALL
+    SELECT 'addon', 'survivor', a.name, i.name, a.icon, a.description
+    FROM survivor_addons a LEFT JOIN survivor_items i ON a.item = i.id
+    UNION ALL
+    SELECT 'item', 'survivor', name, NULL, icon, description FROM survivor_items
+    UNION ALL
+    SELECT 'offering', role, name, NULL, icon, description FROM offerings
+"""
+
+def _create_search_index(conn):
+    """Create and fill the search index; returns False if this SQLite has no FTS5."""
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                name, owner, body,
+                kind UNINDEXED, role UNINDEXED, icon UNINDEXED, description UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        """)
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_terms USING fts5vocab(search_index, 'row')")
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Could not create the search index, /api/search is disabled: {e}")
+        return False
+    fill_search_index(conn)
+    return True
+
+def has_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").fetchone() is not None
+
+def _plain_text(description):
+    text = unescape(re.sub(r"<[^>]+>", " ", description or ""))
+    return " ".join(text.split())
+
+def fill_search_index(conn):
+    """Replace the contents of the search index with the current rows."""
+    if not has_search_index(conn):
+        return
+    rows = conn.execute(SEARCH_INDEX_SOURCES).fetchall()
+    conn.execute("DELETE FROM search_index")
+    conn.executemany(
+        "INSERT INTO search_index (kind, role, name, owner, icon, description, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(*row, _plain_text(row[5])) for row in rows],
     )
-    killers = []
-    if len(tables) > 1:
-        powers_table = tables[0]
-        for row in powers_table.find_all("tr"):
-            for th in row.find_all("th"):
-                a_tags = th.find_all("a", title=True)
-                if len(a_tags) >= 2:
-                    power = a_tags[0].get("title")
-                    name = a_tags[-1].get("title")
-                    if name and name.startswith("The "):
-                        killers.append((name, power, None))
-
-        perks_table = tables[1] if len(tables) > 1 else None
-        if perks_table:
-            rows = perks_table.find_all("tr")[1:]
-            for row in rows:
-                ths = row.find_all("th")
-                tds = row.find_all("td")
-                if len(ths) >= 3 and len(tds) >= 1:
-                    icon_img = ths[0].find("img")
-                    icon = get_icon_url(icon_img)
-                    name_a = ths[1].find("a", title=True)
-                    name = name_a.get_text(strip=True) if name_a else ""
-                    desc_html = clean_description_html(tds[0])
-                    char_a = ths[2].find("a", title=True)
-                    character = ("The " + char_a.get_text(strip=True) if char_a else "").strip()
-                    character_icon = ths[2].find("img")
-                    if character_icon:
-                        character_icon_url = get_icon_url(character_icon)
-                    else:
-                        character_icon_url = None
-                    # Update the killer's icon if not already set
-                    for idx, (k_name, k_power, k_icon) in enumerate(killers):
-                        if k_name == character and not k_icon and character_icon_url:
-                            killers[idx] = (k_name, k_power, character_icon_url)
-                            break
- 
-                    
-    return killers
-
-def normalize_survivor_name(name):
-    if name == "Troupe":
-        # Special case for "Troupe" which is the 2 characters Aestri Yazar & Baermar Uraz
-        # This is a workaround for the wiki's inconsistent naming.
-        name = "Aestri Yazar & Baermar Uraz"
-
-    # Normalize unicode, remove apostrophes, replace underscores with spaces, strip whitespace
-    name = unicodedata.normalize("NFC", name)
-    name = name.replace("_", " ")
-    name = name.replace("’", "'")  # Replace curly apostrophe with straight
-    name = name.replace("'", "")   # Remove apostrophes
-    name = name.strip()
-    return name
-
-def scrape_survivors():
-    url = "https://deadbydaylight.fandom.com/wiki/Survivors"
-    logging.info(f"Requesting survivors page: {url}")
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    tables = soup.find_all("table", {"class": "wikitable"})
-    survivor_table = tables[3] if len(tables) > 3 else None
-    survivors = []
-    if survivor_table:
-        rows = survivor_table.find_all("tr")
-        # Find the index of the row with a <th> that contains "SURVIVORS" (case-insensitive, partial match)
-        start_idx = None
-        for idx, row in enumerate(rows):
-            th = row.find("th")
-            if th and "SURVIVOR" in th.get_text(strip=True).upper():
-                start_idx = idx
-                break
-        if start_idx is not None:
-            for row_idx, row in enumerate(rows[start_idx+1:], start=start_idx+1):
-                tds = row.find_all("td")
-                for td_idx, td in enumerate(tds):
-                    for a in td.find_all("a", title=True, recursive=False):
-                        name = a.get("title").strip()
-                        if name and not name.startswith("File:") and not name.lower().startswith("chapter "):
-                            normalized_name = normalize_survivor_name(name)
-                            if normalized_name not in survivors:
-                                survivors.append(normalized_name)
-                                logging.info(f"Found survivor: {normalized_name} (row {row_idx}, td {td_idx})")
-        else:
-            logging.warning("Could not find a header row containing 'SURVIVOR' in survivors table.")
-    else:
-        logging.warning("Survivors table not found on the page. There must be less than 4 tables.")
-    logging.info(f"Total survivors found: {len(survivors)}")
-    return survivors
-
-def clean_description_html(desc_cell):
-    # Parse the cell as HTML
-    soup = BeautifulSoup(str(desc_cell), "html.parser")
-    # Remove all <a> tags but keep their children
-    for a in soup.find_all('a'):
-        a.unwrap()
-    # Remove all href attributes from any remaining tags (just in case)
-    for tag in soup.find_all(True):
-        if 'href' in tag.attrs:
-            del tag.attrs['href']
-    # Return the inner HTML (not the outer <td> tag)
-    return ''.join(str(child) for child in soup.td.contents) if soup.td else str(soup)
-
-def get_icon_url(img_tag):
-    # Prefer data-src, then src, and ensure it's not a data URI
-    if img_tag:
-        url = img_tag.get("data-src") or img_tag.get("src") or ""
-        if url.startswith("data:image"):
-            return ""  # Ignore data URIs
-        # If the URL is relative, prepend the wiki base
-        if url and url.startswith("//"):
-            url = "https:" + url
-        elif url and url.startswith("/"):
-            url = "https://deadbydaylight.fandom.com" + url
-        
-        if "/revision" in url:
-            url = url.split("/revision")[0]  # Remove revision part if present
-        return url
-    return ""
-
-def scrape_killer_perks():
-    url = "https://deadbydaylight.fandom.com/wiki/Killers"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
-    logging.info(f"Found {len(tables)} tables with 'wikitable' in class")
-    perks = []
-    if len(tables) > 1:
-        table = tables[1]
-        rows = table.find_all("tr")[1:]
-        for row_idx, row in enumerate(rows):
-            ths = row.find_all("th")
-            tds = row.find_all("td")
-            if len(ths) >= 3 and len(tds) >= 1:
-                icon_img = ths[0].find("img")
-                icon = get_icon_url(icon_img)
-                name_a = ths[1].find("a", title=True)
-                name = name_a.get_text(strip=True) if name_a else ""
-                desc_html = clean_description_html(tds[0])
-                char_a = ths[2].find("a", title=True)
-                character = ("The " + char_a.get_text(strip=True) if char_a else "").strip()
-                if "Unable to retrieve the Perk description or unable to display it." in desc_html:
-                    desc_html = "Unable to retrieve the Perk description or unable to display it. This is almost certainly due to the wiki being incomplete. Unfortunately, there is nothing that can be done about this when scraping data."
-                logging.info(f"Row #{row_idx}: name={name}, character={character}")
-                perks.append((icon, name, desc_html, character))
-            else:
-                logging.warning(f"Row #{row_idx} in table #1 does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
-    else:
-        logging.warning("Less than 2 tables found, cannot process killer perks.")
-    return perks
-    
-def scrape_survivor_perks():
-    url = "https://deadbydaylight.fandom.com/wiki/Survivors"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
-    logging.info(f"Found {len(tables)} tables with 'wikitable' in class")
-    perks = []
-    if len(tables) > 1:
-        table = tables[1]
-        rows = table.find_all("tr")[1:]
-        for row_idx, row in enumerate(rows):
-            ths = row.find_all("th")
-            tds = row.find_all("td")
-            if len(ths) >= 3 and len(tds) >= 1:
-                icon_img = ths[0].find("img")
-                icon = get_icon_url(icon_img)
-                name_a = ths[1].find("a", title=True)
-                name = name_a.get_text(strip=True) if name_a else ""
-                desc_html = clean_description_html(tds[0])
-                char_a = ths[2].find("a", href=True)
-                if char_a and char_a.has_attr("href"):
-                    href = char_a["href"]
-                    if href.startswith("/wiki/"):
-                        character = href[len("/wiki/"):].replace("_", " ")
-                    else:
-                        character = href.replace("_", " ")
+
+# Schema changes made after the tables above, applied in order by
+# migrate_database. Each entry is (version, statements); the applied versions
+# are kept in schema_version, so existing databases are upgraded in place
+# instead of being rebuilt. A statement may also be a function taking the
+# connection; if it returns False (SQLite lacks a feature it needs), its
+# migration is not recorded and is tried again the next time.
+# Append new migrations, never edit applied ones.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        # Owner lookups for perks and add-ons, by rarity for add-on picks
+        "CREATE INDEX IF NOT EXISTS idx_killer_perks_killer ON killer_perks (killer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_survivor_perks_survivor ON survivor_perks (survivor_id)",
+        "CREATE INDEX IF NOT EXISTS idx_killer_addons_killer ON killer_addons (killer_id, rarity)",
+        "CREATE INDEX IF NOT EXISTS idx_survivor_addons_item ON survivor_addons (item, rarity)",
+        "CREATE INDEX IF NOT EXISTS idx_offerings_role ON offerings (role, rarity)",
+        # Killer add-ons are matched to their killer by power
+        "CREATE INDEX IF NOT EXISTS idx_killers_power ON killers (power, id)",
+    ]),
+    (2, [_create_search_index]),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate_database(conn):
+    """Create the tables if needed and apply any pending schema migrations.
+
+    Returns the list of migration versions that were applied.
+    """
+    create_tables(conn)
+    get_schema_version(conn)
+    done = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+    if 2 in done and not has_search_index(conn):
+        # Migration 2 used to be recorded even when SQLite had no FTS5
+        conn.execute("DELETE FROM schema_version WHERE version = 2")
+        done.discard(2)
+    applied = []
+    for version, statements in SCHEMA_MIGRATIONS:
+        if version in done:
+            continue
+        with conn:
+            complete = True
+            for statement in statements:
+                if callable(statement):
+                    complete = statement(conn) is not False and complete
                 else:
-                    character = ""
-                character = normalize_survivor_name(character)
-                logging.info(f"Row #{row_idx}: name={name}, character={character}")
-                perks.append((icon, name, desc_html, character))
-            else:
-                logging.warning(f"Row #{row_idx} in table #1 does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
+                    conn.execute(statement)
+            if not complete:
+                continue
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        logging.info(f"Applied schema migration {version}")
+        applied.append(version)
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
+
+# Position of the icon URL in the scraped rows of each table that has icons
+ICON_FIELDS = {
+    "killers": 2, "survivor_items": 0, "killer_perks": 0, "survivor_perks": 0,
+    "survivor_addons": 0, "killer_addons": 0, "offerings": 0,
+}
+
+def _icon_files_dir():
+    # Only this directory is served; the index next to it is not
+    return os.path.join(ICON_DIR, "files")
+
+def _icon_index_path():
+    return os.path.join(ICON_DIR, "index.json")
+
+def _load_icon_index():
+    try:
+        with open(_icon_index_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_icon_index(index):
+    os.makedirs(ICON_DIR, exist_ok=True)
+    tmp_path = _icon_index_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, _icon_index_path())
+
+def _icon_extension(url, content_type):
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    if ext in (".png", ".webp", ".jpg", ".jpeg", ".gif"):
+        return ext
+    return {"image/webp": ".webp", "image/jpeg": ".jpg", "image/gif": ".gif"}.get(content_type, ".png")
+
+def _make_thumbnails(file_name):
+    """Write resized WebP and PNG copies of a mirrored icon, skipping existing ones."""
+    # Pillow is optional; without it icons are mirrored but not resized.
+    Image = optional_module("PIL.Image")
+    if Image is None:
+        return []
+    sha = file_name.split(".")[0]
+    thumbs, original = [], None
+    try:
+        for size in ICON_THUMB_SIZES:
+            for ext in (".webp", ".png"):
+                thumb_name = f"{sha}-{size}{ext}"
+                thumb_path = os.path.join(_icon_files_dir(), thumb_name)
+                if not os.path.exists(thumb_path):
+                    if original is None:
+                        original = Image.open(os.path.join(_icon_files_dir(), file_name)).convert("RGBA")
+                    thumb = original.copy()
+                    thumb.thumbnail((size, size), Image.LANCZOS)
+                    thumb.save(thumb_path)
+                thumbs.append(thumb_name)
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Could not make thumbnails of {file_name}: {e}")
+    return thumbs
+
+def _mirror_icon(url, entry):
+    """Download one icon into the mirror and return its index entry.
+
+    The previous entry's ETag/Last-Modified are sent along, so icons that
+    haven't changed aren't downloaded again. Files are named by their content
+    hash, so an image used under several URLs is stored once.
+    """
+    import dbdscraper
+    headers = {}
+    if entry and os.path.exists(os.path.join(_icon_files_dir(), entry["file"])):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    response = dbdscraper.http_get(url, headers=headers)
+    if response.status_code == 304 and headers:
+        entry["thumbs"] = _make_thumbnails(entry["file"])
+        return entry, False
+    response.raise_for_status()
+    data = response.content
+    sha = hashlib.sha256(data).hexdigest()
+    file_name = sha + _icon_extension(url, response.headers.get("Content-Type", "").split(";")[0])
+    path = os.path.join(_icon_files_dir(), file_name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {
+        "file": file_name,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "thumbs": _make_thumbnails(file_name),
+    }, True
+
+def _build_sprite_sheet(role, perks, index):
+    """Pack the role's perk icons into one sheet and return its sprite index."""
+    Image = optional_module("PIL.Image")
+    size = ICON_SPRITE_SIZE
+    icons = [(row[1], index[row[0]]) for row in perks if row[0] in index]
+    if Image is None or not icons:
+        return None
+    columns = max(1, int(len(icons) ** 0.5 + 0.999))
+    rows = (len(icons) + columns - 1) // columns
+    sheet = Image.new("RGBA", (columns * size, rows * size))
+    positions = {}
+    for i, (name, entry) in enumerate(icons):
+        x, y = (i % columns) * size, (i // columns) * size
+        try:
+            with Image.open(os.path.join(_icon_files_dir(), entry["file"])) as icon:
+                icon = icon.convert("RGBA")
+                icon.thumbnail((size, size), Image.LANCZOS)
+                sheet.paste(icon, (x, y))
+        except OSError as e:
+            logging.warning(f"Could not add {name} to the {role} sprite sheet: {e}")
+            continue
+        positions[name] = [x, y]
+    buffer = io.BytesIO()
+    sheet.save(buffer, "PNG", optimize=True)
+    file_name = f"perks-{role}-{hashlib.sha256(buffer.getvalue()).hexdigest()[:16]}.png"
+    path = os.path.join(_icon_files_dir(), file_name)
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+    return {"sheet": file_name, "size": size, "icons": positions}
+
+def mirror_icons(scraped):
+    """Mirror every scraped icon locally, in parallel, and build the sprite sheets.
+
+    With OFFLINE_ICONS, the icon URLs in scraped are replaced by the paths of
+    their mirrored copies. Icons that fail to download keep their previous copy, if any, and
+    never fail the rebuild. Returns counts of downloaded, unchanged and failed
+    icons.
+    """
+    import dbdscraper
+    import requests
+    os.makedirs(_icon_files_dir(), exist_ok=True)
+    index = _load_icon_index()
+    icons = index.setdefault("icons", {})
+    urls = {
+        row[field] for table, field in ICON_FIELDS.items() for row in scraped.get(table, ())
+        if row[field] and row[field].startswith(("http://", "https://"))
+    }
+    counts = {"downloaded": 0, "unchanged": 0, "failed": 0}
+
+    def mirror(url):
+        try:
+            return url, _mirror_icon(url, icons.get(url))
+        except (requests.RequestException, OSError) as e:
+            logging.warning(f"Could not mirror icon {url}: {e}")
+            return url, None
+
+    with ThreadPoolExecutor(max_workers=dbdscraper.SCRAPE_WORKERS) as pool:
+        for url, result in pool.map(mirror, sorted(urls)):
+            if result is None:
+                counts["failed"] += 1
+                continue
+            icons[url], downloaded = result
+            counts["downloaded" if downloaded else "unchanged"] += 1
+
+    index["sprites"] = {
+        role: _build_sprite_sheet(role, scraped.get(f"{role}_perks", ()), icons)
+        for role in ("killer", "survivor")
+    }
+    _save_icon_index(index)
+    logging.info(f"Icons: {counts}")
+
+    if OFFLINE_ICONS:
+        for table, field in ICON_FIELDS.items():
+            rows = scraped.get(table, [])
+            for i, row in enumerate(rows):
+                entry = icons.get(row[field])
+                if entry:
+                    rows[i] = row[:field] + (f"/icons/{entry['file']}",) + row[field + 1:]
+    return counts
+
+# Columns kept in sync for each table, besides the id and the natural key (name).
+# Tables are listed parents first, so the ids that children refer to already exist.
+SYNC_COLUMNS = {
+    "killers": ("power", "icon"),
+    "survivors": (),
+    "survivor_items": ("icon", "description"),
+    "killer_perks": ("icon", "description", "killer_id"),
+    "survivor_perks": ("icon", "description", "survivor_id"),
+    "survivor_addons": ("icon", "item", "description", "rarity"),
+    "killer_addons": ("icon", "killer_id", "description", "rarity"),
+    "offerings": ("icon", "description", "role", "rarity"),
+}
+
+def _id_map(c, table, column="name"):
+    ids = {}
+    for row_id, key in c.execute(f"SELECT id, {column} FROM {table} ORDER BY id"):
+        ids.setdefault(key, row_id)
+    return ids
+
+def _owner_resolver(ids, unresolved):
+    """Return a function mapping an owner name to its id, recording the ones not found.
+
+    Rows without an owner (general perks) resolve to None without being recorded.
+    """
+    def resolve(name, owner):
+        owner_id = ids.get(owner)
+        if owner_id is None and owner:
+            unresolved.append((name, owner))
+        return owner_id
+    return resolve
+
+def _scraped_rows(c, table, scraped, unresolved):
+    """Return the scraped rows for table as {name: values in SYNC_COLUMNS order}.
+
+    Owner names are resolved to ids through one lookup dict per table, and rows
+    whose owner isn't found are appended to unresolved as (name, owner).
+    """
+    if table == "killers":
+        rows = [(name, (power, icon)) for name, power, icon in scraped["killers"]]
+    elif table == "survivors":
+        rows = [(name, ()) for name in scraped["survivors"]]
+    elif table == "survivor_items":
+        rows = [(name, (icon, desc)) for icon, name, desc in scraped["survivor_items"]]
+    elif table == "killer_perks":
+        owner_id = _owner_resolver(_id_map(c, "killers"), unresolved)
+        rows = [(name, (icon, desc, owner_id(name, killer))) for icon, name, desc, killer in scraped["killer_perks"]]
+    elif table == "survivor_perks":
+        import dbdscraper
+        # Always normalize survivor name before lookup
+        owner_id = _owner_resolver(_id_map(c, "survivors"), unresolved)
+        rows = [
+            (name, (icon, desc, owner_id(name, dbdscraper.normalize_survivor_name(survivor))))
+            for icon, name, desc, survivor in scraped["survivor_perks"]
+        ]
+    elif table == "survivor_addons":
+        owner_id = _owner_resolver(_id_map(c, "survivor_items"), unresolved)
+        rows = [(name, (icon, owner_id(name, item), desc, rarity)) for icon, name, item, desc, rarity in scraped["survivor_addons"]]
+    elif table == "killer_addons":
+        # Killer addons are scraped per power, not per killer name
+        owner_id = _owner_resolver(_id_map(c, "killers", "power"), unresolved)
+        rows = [(name, (icon, owner_id(name, power), desc, rarity)) for icon, name, power, desc, rarity in scraped["killer_addons"]]
+    else:
+        rows = [(name, (icon, desc, role, rarity)) for icon, name, desc, role, rarity in scraped["offerings"]]
+
+    desired = {}
+    for name, values in rows:
+        # The first row scraped for a name wins, like INSERT OR IGNORE did.
+        desired.setdefault(name, values)
+    return desired
+
+def _sync_table(c, table, desired, conflicts):
+    """Write desired ({name: values}) into table, matching existing rows on their name.
+
+    Rows that would break a unique constraint (two names scraped with the same
+    description) are left as they were and appended to conflicts as (name, error).
+    """
+    columns = SYNC_COLUMNS[table]
+    counts = {"inserted": 0, "updated": 0, "retired": 0}
+    existing = {}
+    for row in c.execute(f"SELECT id, name{''.join(', ' + col for col in columns)} FROM {table}"):
+        existing[row[1]] = (row[0], tuple(row[2:]))
+
+    # Retire vanished rows first so a renamed row can reuse its unique description.
+    retired = [row_id for name, (row_id, _) in existing.items() if name not in desired]
+    if retired and not desired:
+        # An empty scrape almost certainly means the wiki layout changed or the page failed
+        # to load, so keep the rows we already have rather than emptying the table.
+        logging.warning(f"No rows scraped for {table}, keeping the {len(retired)} existing rows.")
     else:
-        logging.warning("Less than 2 tables found, cannot process survivor perks.")
-    return perks
-
-def scrape_survivor_items():
-    url = "https://deadbydaylight.fandom.com/wiki/Add-ons"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    items = []
-    tabber = soup.find_all("div", {"class": "tabber wds-tabber"})[1]
-    divs = tabber.find_all("div", {"class": "wds-tab__content"})
-    logging.info(f"Found {len(divs)} div elements in survivor items tabber")
-    for div in divs:
-        name = div.find("h3").get_text(strip=True).removesuffix("es").removesuffix("s")
-        icon_img = div.find("figure").find("img")
-        icon = get_icon_url(icon_img)
-        text_blocks = [child for child in div.children if child.name == "p"]
-        cleaned_html = ""
-        for text_block in text_blocks:
-            cleaned_html += clean_description_html(text_block)
-        cleaned_html.strip()
-        # Darn wiki has a note about unavailable addons for the firecrackers.
-        cleaned_html.replace("These Add-ons can be found in the Game code, but are not available to use.", "")
-        items.append((icon, name, cleaned_html))
-    return items
-
-def scrape_survivor_addons():
-    url = "https://deadbydaylight.fandom.com/wiki/Add-ons"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    addons = []
-    tabber = soup.find_all("div", {"class": "tabber wds-tabber"})[1]
-    divs = tabber.find_all("div", {"class": "wds-tab__content"})
-    for div in divs:
-        item_name = div.find("h3").get_text(strip=True).removesuffix("es").removesuffix("s")
-        table = div.find("table", {"class": "wikitable"})
-        for row_idx, row in enumerate(table.find_all("tr")[1:]):
-            cols = row.find_all(["th", "td"])
-            if len(cols) == 3:
-                icon_img = cols[0].find("img")
-                icon = get_icon_url(icon_img)
-                rarity = "unknown"
+        c.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id in retired])
+        counts["retired"] = len(retired)
+
+    assignments = ", ".join(f"{col} = ?" for col in columns)
+    changed = [name for name, values in desired.items() if name in existing and existing[name][1] != tuple(values)]
+    # Clear the changed rows first, so a row can take a unique value another
+    # changed row is giving up (say two perks whose descriptions swapped)
+    if changed:
+        c.executemany(
+            f"UPDATE {table} SET {', '.join(f'{col} = NULL' for col in columns)} WHERE id = ?",
+            [(existing[name][0],) for name in changed],
+        )
+    statements = [
+        (f"UPDATE {table} SET {assignments} WHERE id = ?", "updated", name, (*desired[name], existing[name][0]))
+        for name in changed
+    ] + [
+        (
+            f"INSERT INTO {table} (name{''.join(', ' + col for col in columns)}) VALUES (?{', ?' * len(columns)})",
+            "inserted", name, (name, *values),
+        )
+        for name, values in desired.items() if name not in existing
+    ]
+    for sql, kind, name, params in statements:
+        try:
+            c.execute(sql, params)
+        except sqlite3.IntegrityError as e:
+            conflicts.append((name, str(e)))
+            if kind == "updated":
+                # Keep the row as it was; its old values can only be taken if
+                # they clash too, and then the row stays cleared
                 try:
-                    rarity_div = cols[0].find("div", {"style": "--assembly-image-size: 128px;"})
-                    if rarity_div and rarity_div.get("class"):
-                        class_name = rarity_div.get("class")[-1] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
-                        if class_name:
-                            rarity = class_name.replace("-item-element", "").replace("-", " ")
-                except (AttributeError, IndexError, TypeError) as e:
-                    logging.warning(f"Could not extract rarity for addon in row {row_idx}: {e}. Skipping...")
-                    continue
-                
-                name_a = cols[1].find("a", title=True)
-                name = name_a.get_text(strip=True)
-                desc_html = clean_description_html(cols[2])
-                if cols[2].find("span", {"class": "tooltip borderless"}):
-                    logging.warning(f"Row #{row_idx} in table is retired, not available anymore, or on dbd mobile; skipping...")
-                    continue
-                logging.info(f"Row #{row_idx}: item={item_name}, addon={name}, rarity={rarity}")
-                addons.append((icon, name, item_name, desc_html, rarity))
-            else:
-                logging.warning(f"Row #{row_idx} in table does not have expected structure.")
-    return addons
-
-def scrape_addons(killer_data):
-    url = "https://deadbydaylight.fandom.com/wiki/Add-ons"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    logging.info(f"Requesting addon page: {url}")
-    addons = []
-    h3s = soup.find_all("h3")
-    for h3 in h3s:
-        table = h3.find_next_sibling("table")
-        if table and "wikitable" in table.get("class", []):
-            power = None
-            prev_figure = h3.find_previous_sibling("figure")
-            if prev_figure:
-                killer_link = prev_figure.find("a", title=True)
-                if killer_link:
-                    power = killer_link["title"]
-            if not power:
-                headline = h3.find("span", class_="mw-headline")
-                power = headline.get_text(strip=True) if headline else "Unknown"
-            for row_idx, row in enumerate(table.find_all("tr")[1:]):
-                ths = row.find_all("th")
-                tds = row.find_all("td")
-                if len(ths) >= 2 and len(tds) >= 1:
-                    icon_img = ths[0].find("img")
-                    icon = get_icon_url(icon_img)
-                    
-                    # Try to extract rarity, but handle failures gracefully
-                    rarity = "unknown"
-                    try:
-                        rarity_div = ths[0].find("div", {"style": "--assembly-image-size: 128px;"})
-                        if rarity_div and rarity_div.get("class"):
-                            class_name = rarity_div.get("class")[-1] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
-                            if class_name:
-                                rarity = class_name.replace("-item-element", "").replace("-", " ")
-                    except (AttributeError, IndexError, TypeError) as e:
-                        logging.warning(f"Could not extract rarity for addon in row {row_idx}: {e}")
-                    
-                    name_a = ths[1].find("a", title=True)
-                    name = name_a.get_text(strip=True) if name_a else ""
-                    desc_html = clean_description_html(tds[0])
-                    # Unfortunately, the wiki has inconsistent naming for Bear Trap vs Bear Traps,
-                    # so we normalize it here.
-                    if power == "Bear Trap":
-                        power = "Bear Traps"
-                    logging.info(f"Row #{row_idx}: power={power}, addon={name}, rarity={rarity}")
-                    addons.append((icon, name, power, desc_html, rarity))
-                else:
-                    logging.warning(f"Row #{row_idx} in table after {power} does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
-    
-    # Check for missing addons using alternate method
-    for name, power, _ in killer_data:
-        if power not in [addon[2] for addon in addons]:
-            logging.info(f"Addons not found for power '{power}', retrieving using alternate method...")
-            killer_url = "https://deadbydaylight.fandom.com/wiki/" + name.replace(" ", "_")
-            try:
-                killer_r = requests.get(killer_url)
-                killer_soup = BeautifulSoup(killer_r.text, "html.parser")
-                found_addons = False
-                
-                for h3 in killer_soup.find_all("h3"):
-                    # Check if h3 has an id attribute or span with id
-                    h3_id = h3.get("id", "")
-                    span_id = ""
-                    span = h3.find("span", class_="mw-headline")
-                    if span:
-                        span_id = span.get("id", "")
-                    
-                    target_id = f"Add-ons_for_{power.replace(' ', '_')}"
-                    if target_id in h3_id or target_id in span_id:
-                        logging.info(f"Found addons for power '{power}' in killer page.")
-                        table = h3.find_next_sibling("table", {"class": "wikitable"})
-                        if not table:
-                            logging.warning(f"No addons table found for power '{power}' in killer page.")
-                            continue
-                        found_addons = True
-                        for row_idx, row in enumerate(table.find_all("tr")[1:]):
-                            cols = row.find_all(["th", "td"])
-                            if len(cols) >= 3:
-                                icon_img = cols[0].find("img")
-                                icon = get_icon_url(icon_img)
-                                
-                                rarity = "unknown"
-                                try:
-                                    rarity_div = cols[0].find("div", {"style": "--assembly-image-size: 128px;"})
-                                    if rarity_div and rarity_div.get("class"):
-                                        class_name = rarity_div.get("class")[0] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
-                                        if class_name:
-                                            rarity = class_name.split(" ")[-1].replace("-item-element", "").replace("-", " ")
-                                except (AttributeError, IndexError, TypeError) as e:
-                                    logging.warning(f"Could not extract rarity for addon {name} in alternate method: {e}")
-                                
-                                name_a = cols[1].find("a", title=True)
-                                addon_name = name_a.get_text(strip=True) if name_a else ""
-                                desc_html = clean_description_html(cols[2])
-                                logging.info(f"Row #{row_idx}: power={power}, addon={addon_name}, rarity={rarity}")
-                                logging.info(f"Rarity: {rarity}")
-                                addons.append((icon, addon_name, power, desc_html, rarity))
-                            else:
-                                logging.warning(f"Row #{row_idx} in table after {power} does not have expected structure (cols: {len(cols)})")
-                        break
-                
-                if not found_addons:
-                    logging.warning(f"Could not find addons for power '{power}' using alternate method.")
-                    
-            except Exception as e:
-                logging.error(f"Error retrieving addons for power '{power}' from killer page: {e}")
-    
-    return addons
-
-def scrape_flashlights():
-    url = "https://deadbydaylight.fandom.com/wiki/Flashlights"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    logging.info(f"Requesting flashlight page: {url}")
-    flashlights = []
-
-    # Find all tables before the final table, which contains the flashlight addons
-    tables = soup.find_all("table", {"class": "wikitable"})
-    if not tables:
-        logging.warning("No tables found on the flashlight page.")
-        return []
-    if len(tables) < 2:
-        logging.warning("Less than 2 tables found on the flashlight page, cannot process addons.")
-        return []
-    
-    for table_idx, table in enumerate(tables[:-1]):
-        logging.info(f"Processing table #{table_idx} for flashlights")
-        rows = table.find_all("tr")[1:]
-        for row_idx, row in enumerate(rows):
-            tds = row.find_all(["td", "th"])
-            if len(tds) >= 2:
-                icon_img = tds[0].find("img")
-                icon = get_icon_url(icon_img)
-                name_a = tds[1].find("a", title=True)
-                name = name_a.get_text(strip=True) if name_a else ""
-                desc_html = clean_description_html(tds[2])
-                if "THIS ITEM CAN NO LONGER BE OBTAINED FROM THE BLOODWEB" in desc_html:
-                    continue
-                flashlights.append((icon, name, desc_html))
-                logging.info(f"Row #{row_idx}: name={name}")
-            else:
-                logging.warning(f"Row #{row_idx} in table #{table_idx} does not have expected structure (tds: {len(tds)})")
-
-    flashlight_addons = []
-    addons_table = tables[-1]
-    rows = addons_table.find_all("tr")[1:]
-    for row_idx, row in enumerate(rows):
-        tds = row.find_all(["td", "th"])
-        if len(tds) >= 2:
-            icon_img = tds[0].find("img")
-            icon = get_icon_url(icon_img)
-            name_a = tds[1].find("a", title=True)
-            name = name_a.get_text(strip=True) if name_a else ""
-            desc_html = clean_description_html(tds[2])
-            logging.info(f"Row #{row_idx}: name={name}")
-            flashlight_addons.append((icon, name, desc_html))
+                    c.execute(sql, (*existing[name][1], existing[name][0]))
+                except sqlite3.IntegrityError:
+                    pass
         else:
-            logging.warning(f"Row #{row_idx} in flashlight addon table does not have expected structure (tds: {len(tds)})")
+            counts[kind] += 1
+    return counts
+
+def write_scraped_data(conn, scraped):
+    """Bring every table in line with the scraped data inside one transaction.
+
+    Rows are matched on their name, so unchanged rows are left alone and keep
+    their ids; only new, changed and vanished rows are written. Returns the
+    per-table counts of inserted, updated, retired, unresolved and conflicting
+    rows, where unresolved rows are saved without an owner because their owner
+    wasn't found, and conflicting rows aren't written because they would break
+    a unique constraint.
+    """
+    diff = {}
+    unresolved = {}
+    conflicts = {}
+    with conn:
+        c = conn.cursor()
+        for table in SYNC_COLUMNS:
+            print(f"Saving {table.replace('_', ' ')}...")
+            missing = unresolved[table] = []
+            clashes = conflicts[table] = []
+            diff[table] = _sync_table(c, table, _scraped_rows(c, table, scraped, missing), clashes)
+            diff[table]["unresolved"] = len(missing)
+            diff[table]["conflicts"] = len(clashes)
+            logging.info(f"{table}: {diff[table]}")
+        print("Saving search index...")
+        fill_search_index(conn)
+    # Report every unresolved owner together rather than one warning per row
+    report = [
+        f"  {table}: " + ", ".join(f"{name} ({owner})" for name, owner in missing)
+        for table, missing in unresolved.items() if missing
+    ]
+    if report:
+        logging.warning("Saved rows whose owner could not be found:\n" + "\n".join(report))
+        print(f"Warning: {sum(len(m) for m in unresolved.values())} rows have an unknown owner, see the log.")
+    report = [
+        f"  {table}: " + ", ".join(f"{name} ({error})" for name, error in clashes)
+        for table, clashes in conflicts.items() if clashes
+    ]
+    if report:
+        logging.warning("Skipped rows that conflict with another row:\n" + "\n".join(report))
+        print(f"Warning: {sum(len(clashes) for clashes in conflicts.values())} rows conflict with another row and were not saved, see the log.")
+    return diff
+
+# Rebuilds are written to a shadow copy of the database that replaces DB_PATH in
+# a single rename, so readers only ever see a complete database. Each rebuild
+# stores the next generation number in the file (as its user_version) so read
+# paths, in this or any other worker process, can tell when the data changed.
+SHADOW_DB_PATH = DB_PATH + ".shadow"
+SHADOW_LOAD_PRAGMAS = {"journal_mode": "MEMORY", "synchronous": "OFF", "cache_size": -65536}
+BUILD_LOCK_PATH = DB_PATH + ".lock"
+# How often, in seconds, a process checks whether another one replaced DB_PATH
+DB_CHECK_INTERVAL = 1.0
+_db_generation = 0
+_db_file_id = None
+_db_checked_at = None
+_db_swap_lock = threading.Lock()
+
+def _db_file_identity():
+    try:
+        st = os.stat(DB_PATH)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
 
-    return flashlights, flashlight_addons
+def read_db_generation(path=None):
+    path = path or DB_PATH
+    if not os.path.exists(path):
+        return 0
+    conn = connect_database(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
 
-def scrape_offerings():
-    url = "https://deadbydaylight.fandom.com/wiki/Offerings"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
-    logging.info(f"Requesting offering page: {url}")
-    offerings = []
+def get_db_generation():
+    """Return the generation of the database at DB_PATH.
+
+    Rebuilds made by this process are seen at once, and those made by other
+    worker processes within DB_CHECK_INTERVAL seconds.
+    """
+    global _db_generation, _db_file_id, _db_checked_at
+    now = time.monotonic()
+    if _db_checked_at is None or now - _db_checked_at >= DB_CHECK_INTERVAL:
+        with _db_swap_lock:
+            _db_checked_at = now
+            file_id = _db_file_identity()
+            if file_id is not None and file_id != _db_file_id:
+                _db_generation = read_db_generation()
+                _db_file_id = file_id
+    return _db_generation
+
+def validate_database(conn):
+    """Raise RuntimeError if the database is corrupt or is missing core data."""
+    integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    if integrity != "ok":
+        raise RuntimeError(f"Database failed integrity check: {integrity}")
+    for table in ("killers", "survivors", "killer_perks", "survivor_perks"):
+        if conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0:
+            raise RuntimeError(f"Database has no rows in {table}")
+
+def _open_shadow_database(copy_current):
+    if os.path.exists(SHADOW_DB_PATH):
+        os.remove(SHADOW_DB_PATH)
+    conn = connect_database(SHADOW_DB_PATH)
+    # Nobody reads the shadow file and a failed build deletes it, so the load
+    # can skip journaling and syncing; _swap_in_shadow_database syncs it once.
+    for pragma, value in SHADOW_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    if copy_current and os.path.exists(DB_PATH):
+        source = connect_database(DB_PATH)
+        try:
+            source.backup(conn)
+        finally:
+            source.close()
+    migrate_database(conn)
+    return conn
+
+def _swap_in_shadow_database(generation):
+    global _db_generation, _db_file_id, _db_checked_at
+    with _db_swap_lock:
+        fd = os.open(SHADOW_DB_PATH, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(SHADOW_DB_PATH, DB_PATH)
+        _db_generation = generation
+        _db_file_id = _db_file_identity()
+        _db_checked_at = time.monotonic()
+
+class _BuildLock:
+    """Serializes rebuilds across threads and worker processes (where fcntl is available).
+
+    It is held from the start of the scrape until the new database is swapped
+    in. A lock acquired beforehand, with acquire(blocking=False), is kept
+    rather than taken again when the with block is entered.
+    """
+
+    def __init__(self):
+        self.file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock and return True, or return False if blocking is False and it is taken."""
+        self.file = open(BUILD_LOCK_PATH, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                self.file.close()
+                self.file = None
+                return False
+        return True
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        if self.file is None:
+            self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# How long each phase of the last rebuild took and when it finished, for /metrics
+REBUILD_STATS_PATH = DB_PATH + ".rebuild.json"
+
+def _timed(phases, name, function, *args):
+    """Call function(*args), recording how long it took in phases[name]."""
+    started = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        phases[name] = time.perf_counter() - started
 
-    # Find all tables before the final table, which contains the flashlight addons
-    tables = soup.find_all("table", {"class": "wikitable"})
-    if not tables:
-        logging.warning("No tables found on the offering page.")
-        return []
-    
-    for table_idx, table in enumerate(tables):
-        logging.info(f"Processing table #{table_idx} for offerings")
-        rows = table.find_all("tr")[1:]
-        for row_idx, row in enumerate(rows):
-            cols = row.find_all(["th", "td"])
-            if len(cols) == 3:
-                href = cols[0].find("a").get("href", "").strip()
-                icon = get_icon_url(cols[0].find("img"))
-                name = cols[1].find("a", title=True).get_text(strip=True)
-                desc_html = clean_description_html(cols[2])
-                if "<span class=\"tooltip borderless\">" in desc_html:
-                    logging.warning(f"Row #{row_idx} in table #{table_idx} is retired, not available anymore, or on dbd mobile; skipping...")
-                    continue
-                if not href:
-                    logging.warning(f"Row #{row_idx} in table #{table_idx} is missing a link, skipping...")
-                    continue
-                else:
-                    offering_page_r = requests.get("https://deadbydaylight.fandom.com" + href)
-                    offering_soup = BeautifulSoup(offering_page_r.text, "html.parser")
-                    offering_type = offering_soup.find_all("p")[0].get_text(strip=True)
-                    if "killers" in offering_type.lower():
-                        role = "killer"
-                    elif "survivors" in offering_type.lower():
-                        role = "survivor"
-                    elif "all players" in offering_type.lower():
-                        role = "all"
-                    else:
-                        logging.warning(f"Could not determine role for offering {name} (row #{row_idx}, table #{table_idx})")
-                        role = "unknown"
-                    
-                    rarities = ["common", "uncommon", "rare", "very rare", "ultra rare"]
-                    rarity = None
-                    for r in rarities:
-                        if r in offering_type.lower():
-                            rarity = r
-                offerings.append((icon, name, desc_html, role, rarity))
-                logging.info(f"Row #{row_idx}: name={name}")
-            else:
-                logging.warning(f"Row #{row_idx} in table #{table_idx} does not have expected structure (cols: {len(cols)})")
-    return offerings
+def _save_rebuild_stats(generation, phases):
+    stats = {"generation": generation, "finished": time.time(), "phases": phases}
+    try:
+        with open(REBUILD_STATS_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        os.replace(REBUILD_STATS_PATH + ".tmp", REBUILD_STATS_PATH)
+    except OSError as e:
+        logging.warning(f"Could not save rebuild stats: {e}")
+
+def get_rebuild_stats():
+    """Return {"generation", "finished", "phases"} for the last rebuild, or None if none was recorded."""
+    try:
+        with open(REBUILD_STATS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
+def _build_database(scraped, copy_current, phases=None):
+    """Write scraped into a new database generation and swap it in; the caller holds the _BuildLock."""
+    phases = {} if phases is None else phases
+    generation = read_db_generation() + 1
+    conn = _open_shadow_database(copy_current)
+    try:
+        diff = _timed(phases, "write", write_scraped_data, conn, scraped)
+        _timed(phases, "validate", validate_database, conn)
+        conn.execute(f"PRAGMA user_version = {generation}")
+        # Rollback journal, not WAL: the live file is only ever replaced whole,
+        # and a WAL file's -wal and -shm sidecars would outlive the swap
+        conn.execute("PRAGMA journal_mode = DELETE")
+    except Exception:
+        conn.close()
+        os.remove(SHADOW_DB_PATH)
+        raise
+    conn.close()
+    _timed(phases, "swap", _swap_in_shadow_database, generation)
+    _save_rebuild_stats(generation, phases)
+    return diff
+
+def init_database(if_missing=False):
+    """Scrape the wiki into a new database; with if_missing, only if there is none once the build lock is held."""
+    # The scraper, and requests and BeautifulSoup with it, is only imported for
+    # a rebuild, so a process that only serves the API never loads it
+    import dbdscraper
+    phases = {}
+    with _BuildLock(), rebuild_profile("init_database"):
+        if if_missing and os.path.exists(DB_PATH):
+            print("The database was built by another process.")
+            return
+        print("Scraping wiki pages...")
+        scraped = _timed(phases, "scrape", dbdscraper.scrape_all)
+        if ICON_MIRROR:
+            print("Mirroring icons...")
+            _timed(phases, "icons", mirror_icons, scraped)
+        # Start from the current database, if there is one, so rows keep the ids
+        # that saved builds and links refer to
+        _build_database(scraped, copy_current=True, phases=phases)
+    print("Done! Data saved to", DB_PATH)
 
-def init_database():
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
-        
-    conn = sqlite3.connect(DB_PATH)
-    create_tables(conn)
-    c = conn.cursor()
+def refresh_database(build_lock=None):
+    """Rebuild the database from a fresh scrape without disturbing readers.
+
+    The current database is copied to a shadow file, the scraped changes are
+    applied to the copy, and the copy is swapped in once it passes validation.
+    build_lock is a _BuildLock the caller has already acquired, if any; it is
+    released when the rebuild ends. Returns the per-table diff counts.
+    """
+    phases = {}
+    with build_lock or _BuildLock(), rebuild_profile("refresh_database"):
+        import dbdscraper
+        print("Scraping wiki pages...")
+        scraped = _timed(phases, "scrape", dbdscraper.scrape_all)
+        if ICON_MIRROR:
+            print("Mirroring icons...")
+            _timed(phases, "icons", mirror_icons, scraped)
+        diff = _build_database(scraped, copy_current=True, phases=phases)
+    print("Done! Data refreshed in", DB_PATH)
+    return diff
+
+# Jobs are also saved to UPDATE_JOBS_DIR, so any worker process can report on
+# a job that another one started.
+UPDATE_JOBS_DIR = ".update_jobs"
+_update_jobs = {}
+_update_jobs_lock = threading.Lock()
+
+def _save_update_job(job):
+    os.makedirs(UPDATE_JOBS_DIR, exist_ok=True)
+    path = os.path.join(UPDATE_JOBS_DIR, job["job_id"] + ".json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(path + ".tmp", path)
+
+def _is_abandoned(job):
+    """Return True if job was saved as running by a process that has since died."""
+    if job["status"] != "running":
+        return False
+    # os.kill(pid, 0) would end the process on Windows
+    if job.get("pid") is not None and fcntl is not None:
+        try:
+            os.kill(job["pid"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+    # Without the process id, the lock tells: the job's process holds it until
+    # the job is saved as finished
+    build_lock = _BuildLock()
+    if not build_lock.acquire(blocking=False):
+        return False
+    build_lock.release()
+    return True
+
+def get_update_job(job_id):
+    """Return the job with job_id, started by this or another worker process, or None.
+
+    A job that a process saved as running and then died without finishing is
+    saved, and returned, as failed.
+    """
+    job = _update_jobs.get(job_id)
+    if job is not None or not job_id.isalnum():
+        return job
+    try:
+        with open(os.path.join(UPDATE_JOBS_DIR, job_id + ".json"), "r", encoding="utf-8") as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if _is_abandoned(job):
+        job["status"] = "error"
+        job["message"] = "The update was interrupted before it finished."
+        job["finished_at"] = time.time()
+        _save_update_job(job)
+    return job
+
+def _running_update_job():
+    """Return the newest job that a worker process saved as running, or None."""
+    running = []
+    try:
+        names = os.listdir(UPDATE_JOBS_DIR)
+    except OSError:
+        return None
+    for name in names:
+        job = get_update_job(name[:-len(".json")]) if name.endswith(".json") else None
+        if job is not None and job["status"] == "running":
+            running.append(job)
+    return max(running, key=lambda job: job["started_at"], default=None)
 
-    print("Scraping killers...")
-    killer_data = scrape_killers()
-    for name, power, icon in killer_data:
-        c.execute("INSERT OR IGNORE INTO killers (name, power, icon) VALUES (?, ?, ?)", (name, power, icon))
-
-    print("Scraping survivors...")
-    for name in scrape_survivors():
-        c.execute("INSERT OR IGNORE INTO survivors (name) VALUES (?)", (name,))
-
-    print("Scraping killer perks...")
-    for icon, name, desc, killer in scrape_killer_perks():
-        logging.info(f"Processing killer perk: {name} for killer {killer}")
-        c.execute("SELECT id FROM killers WHERE name = ?", (killer,))
-        result = c.fetchone()
-        killer_id = result[0] if result else None
-        c.execute("INSERT OR IGNORE INTO killer_perks (icon, name, description, killer_id) VALUES (?, ?, ?, ?)", (icon, name, desc, killer_id))
-
-    print("Scraping survivor perks...")
-    for icon, name, desc, survivor in scrape_survivor_perks():
-        # Always normalize survivor name before lookup
-        survivor_norm = normalize_survivor_name(survivor)
-        c.execute("SELECT id FROM survivors WHERE name = ?", (survivor_norm,))
-        result = c.fetchone()
-        survivor_id = result[0] if result else None
-        c.execute("INSERT OR IGNORE INTO survivor_perks (icon, name, survivor_id, description) VALUES (?, ?, ?, ?)", (icon, name, survivor_id, desc))
-
-    print("Scraping survivor items...")
-    survivor_items = scrape_survivor_items()
-    for icon, name, desc in survivor_items:
-        c.execute("INSERT OR IGNORE INTO survivor_items (icon, name, description) VALUES (?, ?, ?)", (icon, name, desc))
-
-    print("Scraping survivor addons...")
-    survivor_addons = scrape_survivor_addons()
-    for icon, name, item, desc, rarity in survivor_addons:
-        c.execute("SELECT id FROM survivor_items WHERE name = ?", (item,))
-        result = c.fetchone()
-        item_id = result[0] if result else None
-        c.execute("INSERT OR IGNORE INTO survivor_addons (icon, name, item, description, rarity) VALUES (?, ?, ?, ?, ?)", (icon, name, item_id, desc, rarity))
-
-    print("Scraping addons...")
-    for icon, name, killer, desc, rarity in scrape_addons(killer_data):
-        # Look up killer_id from killers table
-        c.execute("SELECT id FROM killers WHERE power = ?", (killer,))
-        result = c.fetchone()
-        killer_id = result[0] if result else None
-        c.execute("INSERT OR IGNORE INTO killer_addons (icon, name, killer_id, description, rarity) VALUES (?, ?, ?, ?, ?)", (icon, name, killer_id, desc, rarity))
-
-    for icon, name, desc, role, rarity in scrape_offerings():
-        c.execute("INSERT OR IGNORE INTO offerings (icon, name, description, role, rarity) VALUES (?, ?, ?, ?, ?)", (icon, name, desc, role, rarity))
+def _run_update_job(job, build_lock):
+    try:
+        job["changes"] = refresh_database(build_lock)
+        reload_catalog()
+        job["status"] = "success"
+        job["message"] = "Database updated."
+    except Exception as e:
+        logging.exception("Database update failed")
+        job["status"] = "error"
+        job["message"] = str(e)
+    job["generation"] = get_db_generation()
+    job["finished_at"] = time.time()
+    _save_update_job(job)
+
+def start_update_job():
+    """Start a database refresh in the background and return its job.
+
+    Only one refresh runs at a time, across all worker processes: the build
+    lock is taken before the job starts, and asking again while a refresh is
+    running returns the job that is already in progress. Returns None if the
+    rebuild in progress isn't a job (such as the first build of the database).
+    """
+    with _update_jobs_lock:
+        for job in _update_jobs.values():
+            if job["status"] == "running":
+                return job
+        build_lock = _BuildLock()
+        if not build_lock.acquire(blocking=False):
+            # Another worker process, or a rebuild started from the command line, holds it
+            return _running_update_job()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "running",
+            "message": "Database update in progress.",
+            "changes": None,
+            "generation": get_db_generation(),
+            "started_at": time.time(),
+            "finished_at": None,
+            "pid": os.getpid(),
+        }
+        _update_jobs[job["job_id"]] = job
+        _save_update_job(job)
+    threading.Thread(target=_run_update_job, args=(job, build_lock), daemon=True).start()
+    return job
+
+class Killer:
+    __slots__ = ("id", "name", "power", "icon")
+
+    def __init__(self, id, name, power, icon):
+        self.id = id
+        self.name = name
+        self.power = power
+        self.icon = icon
+
+class Survivor:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+class _Described:
+    """Base for records whose description is kept in the catalog snapshot's mapping.
+
+    The description is held as a view of the UTF-8 bytes and decoded on use.
+    """
+    __slots__ = ("_description",)
+
+    @property
+    def description(self):
+        text = self._description
+        return None if text is None else str(text, "utf-8")
+
+class Perk(_Described):
+    __slots__ = ("id", "name", "icon", "owner_id", "owner", "role")
+
+    def __init__(self, id, name, description, icon, owner_id, owner, role):
+        self.id = id
+        self.name = name
+        self._description = description
+        self.icon = icon
+        self.owner_id = owner_id
+        self.owner = owner
+        self.role = role
+
+class Addon(_Described):
+    """A killer addon (owner is the killer) or a survivor addon (owner is the item)."""
+    __slots__ = ("id", "name", "icon", "rarity", "owner_id", "owner")
+
+    def __init__(self, id, name, description, icon, rarity, owner_id, owner):
+        self.id = id
+        self.name = name
+        self._description = description
+        self.icon = icon
+        self.rarity = rarity
+        self.owner_id = owner_id
+        self.owner = owner
+
+class Item(_Described):
+    __slots__ = ("id", "name", "icon")
+
+    def __init__(self, id, name, description, icon):
+        self.id = id
+        self.name = name
+        self._description = description
+        self.icon = icon
+
+class Offering(_Described):
+    __slots__ = ("id", "name", "icon", "role", "rarity")
+
+    def __init__(self, id, name, description, icon, role, rarity):
+        self.id = id
+        self.name = name
+        self._description = description
+        self.icon = icon
+        self.role = role
+        self.rarity = rarity
+
+def sample_distinct(pool, k, rng=None):
+    """Return up to k distinct random elements of pool in O(k).
+
+    This is a partial Fisher-Yates shuffle that records its swaps in a dict
+    instead of copying the pool, so only the k drawn positions are touched.
+    Draws come from rng (a random.Random) if given.
+    """
+    draw = rng.randrange if rng is not None else randrange
+    n = len(pool)
+    swaps = {}
+    picked = []
+    for i in range(min(k, n)):
+        j = draw(i, n)
+        picked.append(pool[swaps.get(j, j)])
+        swaps[j] = swaps.get(i, i)
+    return picked
+
+class PoolView:
+    """Several pools indexed as if they were one sequence, without copying them."""
+    __slots__ = ("pools", "offsets")
+
+    def __init__(self, pools):
+        self.pools = [pool for pool in pools if pool]
+        self.offsets = []
+        total = 0
+        for pool in self.pools:
+            self.offsets.append(total)
+            total += len(pool)
+        self.offsets.append(total)
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, index):
+        pool_idx = bisect_right(self.offsets, index) - 1
+        return self.pools[pool_idx][index - self.offsets[pool_idx]]
+
+def _concat_pools(pools):
+    pools = [pool for pool in pools if pool]
+    if len(pools) == 1:
+        return pools[0]
+    return PoolView(pools)
+
+def _group(records, key):
+    groups = {}
+    for record in records:
+        groups.setdefault(key(record), []).append(record)
+    return {k: tuple(v) for k, v in groups.items()}
+
+class Catalog:
+    """Read-only snapshot of the database that the API serves from.
+
+    The data only changes when the database is rebuilt, so it is loaded once per
+    database generation instead of being queried on every request. Records are
+    stored in id order in tuples, with dicts indexing them by id and by name,
+    and grouped into the pools that random picks sample from.
+    """
+    __slots__ = (
+        "generation", "killers", "survivors", "killer_perks", "survivor_perks",
+        "killer_addons", "survivor_addons", "items", "offerings",
+        "killers_by_id", "killers_by_name", "survivors_by_name", "survivors_by_id", "items_by_id",
+        "killer_names", "survivor_names",
+        "perks_by_owner", "addons_by_owner", "addons_by_owner_rarity",
+        "offerings_by_role", "offerings_by_role_rarity",
+        "addon_owners",
+        "responses", "responses_lock",
+    )
 
-    conn.commit()
-    conn.close()
-    print("Done! Data saved to", DB_PATH)
+    def __init__(self, generation, killers, survivors, killer_perks, survivor_perks,
+                 killer_addons, survivor_addons, items, offerings):
+        self.generation = generation
+        self.killers = tuple(killers)
+        self.survivors = tuple(survivors)
+        self.killer_perks = tuple(killer_perks)
+        self.survivor_perks = tuple(survivor_perks)
+        self.killer_addons = tuple(killer_addons)
+        self.survivor_addons = tuple(survivor_addons)
+        self.items = tuple(items)
+        self.offerings = tuple(offerings)
+        self.killers_by_id = {k.id: k for k in self.killers}
+        self.killers_by_name = {k.name: k for k in self.killers}
+        self.survivors_by_name = {s.name: s for s in self.survivors}
+        self.survivors_by_id = {s.id: s for s in self.survivors}
+        self.items_by_id = {i.id: i for i in self.items}
+        self.killer_names = tuple(sorted(self.killers_by_name))
+        self.survivor_names = tuple(sorted(self.survivors_by_name))
+
+        self.perks_by_owner = _group(self.killer_perks + self.survivor_perks, lambda p: (p.role, p.owner))
+        # Killer addons are keyed by killer id, survivor addons by item id
+        self.addons_by_owner = {
+            **{("killer", k): v for k, v in _group(self.killer_addons, lambda a: a.owner_id).items()},
+            **{("survivor", k): v for k, v in _group(self.survivor_addons, lambda a: a.owner_id).items()},
+        }
+        self.addons_by_owner_rarity = {
+            **{("killer",) + k: v for k, v in _group(self.killer_addons, lambda a: (a.owner_id, a.rarity)).items()},
+            **{("survivor",) + k: v for k, v in _group(self.survivor_addons, lambda a: (a.owner_id, a.rarity)).items()},
+        }
+        self.offerings_by_role = {
+            role: tuple(o for o in self.offerings if o.role == role or o.role == "all")
+            for role in ("killer", "survivor")
+        }
+        self.offerings_by_role_rarity = {
+            role: _group(pool, lambda o: o.rarity) for role, pool in self.offerings_by_role.items()
+        }
+        # Eligibility index, so random add-on picks start from an owner that has
+        # enough add-ons: killers and items by minimum add-on count.
+        self.addon_owners = {}
+        for role, owners in (("killer", self.killers), ("survivor", self.items)):
+            counts = [(o, len(self.addons_by_owner.get((role, o.id), ()))) for o in owners]
+            for n in range(1, QUIZ_OPTIONS + 1):
+                self.addon_owners[role, n] = tuple(o for o, count in counts if count >= n)
+        # Serialized responses built from this snapshot, see cached_json_response
+        self.responses = {}
+        self.responses_lock = threading.Lock()
+
+    def cached_response(self, key, build):
+        """Return the CachedResponse of build(self) stored under key, building it once."""
+        cached = self.responses.get(key)
+        if cached is None:
+            with self.responses_lock:
+                cached = self.responses.get(key)
+                if cached is None:
+                    cached = self.responses[key] = CachedResponse(build(self))
+        return cached
+
+    def characters(self, role):
+        return self.killers if role == "killer" else self.survivors
+
+    def perks(self, role):
+        return self.killer_perks if role == "killer" else self.survivor_perks
+
+    def character_pool(self, role, allowed=None):
+        if not allowed:
+            return self.characters(role)
+        by_name = self.killers_by_name if role == "killer" else self.survivors_by_name
+        return tuple(by_name[name] for name in dict.fromkeys(allowed) if name in by_name)
+
+    def perk_pool(self, role, allowed=None):
+        if not allowed:
+            return self.perks(role)
+        return _concat_pools(self.perks_by_owner.get((role, name), ()) for name in dict.fromkeys(allowed))
+
+    def addon_pool(self, role, owner_id, rarities=None):
+        if not rarities:
+            return self.addons_by_owner.get((role, owner_id), ())
+        return _concat_pools(
+            self.addons_by_owner_rarity.get((role, owner_id, rarity), ()) for rarity in dict.fromkeys(rarities)
+        )
+
+    def addon_owner_pool(self, role, min_addons=1, allowed=None):
+        """Return the killers (or items, for survivors) with at least min_addons add-ons.
+
+        allowed limits killers to those names.
+        """
+        owners = self.addon_owners.get((role, min_addons))
+        if owners is None:
+            owners = tuple(
+                o for o in (self.killers if role == "killer" else self.items)
+                if len(self.addons_by_owner.get((role, o.id), ())) >= min_addons
+            )
+        if allowed and role == "killer":
+            allowed = set(allowed)
+            owners = tuple(o for o in owners if o.name in allowed)
+        return owners
+
+    def offering_pool(self, role, rarities=None):
+        if not rarities:
+            return self.offerings_by_role[role]
+        by_rarity = self.offerings_by_role_rarity[role]
+        return _concat_pools(by_rarity.get(rarity, ()) for rarity in dict.fromkeys(rarities))
+
+# Queries the catalog snapshot is written from. In the tables that have one,
+# the description is the third column.
+CATALOG_QUERIES = {
+    "killers": "SELECT id, name, power, icon FROM killers ORDER BY id",
+    "survivors": "SELECT id, name FROM survivors ORDER BY id",
+    "killer_perks": """
+        SELECT kp.id, kp.name, kp.description, kp.icon, kp.killer_id, k.name
+        FROM killer_perks kp
+        LEFT JOIN killers k ON kp.killer_id = k.id
+        ORDER BY kp.id
+    """,
+    "survivor_perks": """
+        SELECT sp.id, sp.name, sp.description, sp.icon, sp.survivor_id, s.name
+        FROM survivor_perks sp
+        LEFT JOIN survivors s ON sp.survivor_id = s.id
+        ORDER BY sp.id
+    """,
+    "killer_addons": """
+        SELECT a.id, a.name, a.description, a.icon, a.rarity, a.killer_id, k.name
+        FROM killer_addons a
+        LEFT JOIN killers k ON a.killer_id = k.id
+        ORDER BY a.id
+    """,
+    "survivor_addons": """
+        SELECT a.id, a.name, a.description, a.icon, a.rarity, a.item, i.name
+        FROM survivor_addons a
+        LEFT JOIN survivor_items i ON a.item = i.id
+        ORDER BY a.id
+    """,
+    "survivor_items": "SELECT id, name, description, icon FROM survivor_items ORDER BY id",
+    "offerings": "SELECT id, name, description, icon, role, rarity FROM offerings ORDER BY id",
+}
+CATALOG_SNAPSHOT_MAGIC = b"DBDCAT1\n"
+
+def _snapshot_path(generation, db_path=None):
+    return f"{db_path or DB_PATH}.catalog.{generation}"
+
+def _remove_old_snapshots(generation, db_path=None):
+    prefix = os.path.basename(_snapshot_path("", db_path))
+    directory = os.path.dirname(os.path.abspath(_snapshot_path(generation, db_path)))
+    for name in os.listdir(directory):
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and suffix.isdigit() and int(suffix) < generation:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # Still mapped by a process on a platform that won't delete it
+                pass
+
+def write_catalog_snapshot(generation, db_path=None):
+    """Write the catalog snapshot file for a database generation and return its path.
+
+    The file holds a small JSON index of every record, followed by all the
+    descriptions as UTF-8 text, which the index refers to by offset and length.
+    """
+    conn = connect_database(db_path or DB_PATH)
+    texts = bytearray()
+    tables = {}
+    try:
+        for table, query in CATALOG_QUERIES.items():
+            rows = tables[table] = []
+            for row in conn.execute(query):
+                row = list(row)
+                if table not in ("killers", "survivors") and row[2] is not None:
+                    text = row[2].encode("utf-8")
+                    row[2] = [len(texts), len(text)]
+                    texts += text
+                rows.append(row)
+    finally:
+        conn.close()
+    index = json.dumps({"generation": generation, "tables": tables}, separators=(",", ":")).encode("utf-8")
+
+    path = _snapshot_path(generation, db_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CATALOG_SNAPSHOT_MAGIC)
+        f.write(struct.pack("<Q", len(index)))
+        f.write(index)
+        f.write(texts)
+    os.replace(tmp_path, path)
+    _remove_old_snapshots(generation, db_path)
+    return path
+
+def _read_catalog_snapshot(path):
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    start = len(CATALOG_SNAPSHOT_MAGIC) + 8
+    if mapping[:len(CATALOG_SNAPSHOT_MAGIC)] != CATALOG_SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    (index_length,) = struct.unpack_from("<Q", mapping, len(CATALOG_SNAPSHOT_MAGIC))
+    index = json.loads(mapping[start:start + index_length])
+    texts = memoryview(mapping)[start + index_length:]
+    for table, rows in index["tables"].items():
+        if table not in ("killers", "survivors"):
+            for row in rows:
+                if row[2] is not None:
+                    offset, length = row[2]
+                    row[2] = texts[offset:offset + length]
+    return index["tables"]
+
+def load_catalog(db_path=None, generation=None):
+    """Load the catalog for a database generation from its snapshot file.
+
+    The snapshot is written from the database the first time a generation is
+    loaded. It is memory-mapped, so the descriptions, which are most of the
+    data, are shared by every worker process rather than copied into each.
+    Until the first database has been built (generation 0), the bundled
+    snapshot at BUNDLED_CATALOG_PATH is loaded instead.
+    """
+    if generation is None:
+        generation = read_db_generation(db_path) if db_path else get_db_generation()
+    if generation == 0 and not os.path.exists(db_path or DB_PATH):
+        tables = _read_catalog_snapshot(BUNDLED_CATALOG_PATH)
+    else:
+        try:
+            tables = _read_catalog_snapshot(_snapshot_path(generation, db_path))
+        except (OSError, ValueError):
+            tables = _read_catalog_snapshot(write_catalog_snapshot(generation, db_path))
+    return Catalog(
+        generation,
+        [Killer(*row) for row in tables["killers"]],
+        [Survivor(*row) for row in tables["survivors"]],
+        [Perk(*row, "killer") for row in tables["killer_perks"]],
+        [Perk(*row, "survivor") for row in tables["survivor_perks"]],
+        [Addon(*row) for row in tables["killer_addons"]],
+        [Addon(*row) for row in tables["survivor_addons"]],
+        [Item(*row) for row in tables["survivor_items"]],
+        [Offering(*row) for row in tables["offerings"]],
+    )
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def reload_catalog():
+    global _catalog
+    with _catalog_lock:
+        _catalog = load_catalog()
+    return _catalog
+
+def get_catalog():
+    """Return the catalog for the current database, reloading it after a rebuild."""
+    global _catalog
+    catalog = _catalog
+    if catalog is None or catalog.generation != get_db_generation():
+        with _catalog_lock:
+            if _catalog is None or _catalog.generation != get_db_generation():
+                _catalog = load_catalog()
+            catalog = _catalog
+    return catalog
 
 app = Flask(__name__)
 CORS(app)
 
+class MetricsTable:
+    """Latency histograms and counters of every worker process, in one shared mmap.
+
+    Every series has a fixed place in a block of float64 cells, and each worker
+    process only writes to its own block (its slot), so the processes never
+    contend; /metrics adds the blocks up. The mmap is anonymous and created
+    before serve mode forks, so all the workers share it.
+    """
+    __slots__ = ("offsets", "width", "slots", "slot", "values", "lock", "_mmap")
+
+    def __init__(self, histograms, counters, slots=1):
+        self.offsets = {}
+        width = 0
+        for key in histograms:
+            # One cell per bucket, one for +Inf, and the sum
+            self.offsets[key] = width
+            width += len(METRICS_BUCKETS) + 2
+        for key in counters:
+            self.offsets[key] = width
+            width += 1
+        self.width = width
+        self.slots = slots
+        self.slot = 0
+        self._mmap = mmap.mmap(-1, max(1, width * slots) * 8)
+        self.values = memoryview(self._mmap).cast("d")
+        self.lock = threading.Lock()
+
+    def observe(self, key, seconds, counter=None):
+        """Add seconds to the key histogram, and 1 to the counter if one is given."""
+        offset = self.offsets.get(key)
+        if offset is None:
+            return
+        cell = self.slot * self.width + offset
+        counter_offset = self.offsets.get(counter)
+        values = self.values
+        with self.lock:
+            values[cell + bisect_left(METRICS_BUCKETS, seconds)] += 1
+            values[cell + len(METRICS_BUCKETS) + 1] += seconds
+            if counter_offset is not None:
+                values[self.slot * self.width + counter_offset] += 1
+
+    def totals(self, key, cells=1):
+        """Return the key's cells added up over every worker slot."""
+        offset = self.offsets[key]
+        return [
+            sum(self.values[slot * self.width + offset + i] for slot in range(self.slots))
+            for i in range(cells)
+        ]
+
+SQLITE_QUERY_KINDS = ("select", "random_order", "write", "other")
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def _metric_routes():
+    return [
+        (method, rule.rule) for rule in app.url_map.iter_rules() for method in sorted(rule.methods)
+    ] + [("other", "<unmatched>")]
+
+def init_metrics(slots=1):
+    """Set up the metrics table with room for slots worker processes; returns it."""
+    global _metrics
+    routes = _metric_routes()
+    histograms = [("route", method, rule) for method, rule in routes]
+    histograms += [("query", kind) for kind in SQLITE_QUERY_KINDS]
+    counters = [
+        ("status", method, rule, status)
+        for method, rule in routes for status in METRICS_STATUSES + ("other",)
+    ]
+    _metrics = MetricsTable(histograms, counters, min(slots, METRICS_MAX_WORKERS))
+    return _metrics
+
+def get_metrics():
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                init_metrics()
+    return _metrics
+
+_query_kinds = {}
+
+def _query_kind(sql):
+    kind = _query_kinds.get(sql)
+    if kind is None:
+        words = sql.split(None, 1)
+        first = words[0].upper() if words else ""
+        if "RANDOM()" in sql.upper():
+            kind = "random_order"
+        elif first in ("SELECT", "WITH", "PRAGMA"):
+            kind = "select"
+        elif first in ("INSERT", "UPDATE", "DELETE", "REPLACE"):
+            kind = "write"
+        else:
+            kind = "other"
+        if len(_query_kinds) < 1000:
+            _query_kinds[sql] = kind
+    return kind
+
+class _MeteredCursor(sqlite3.Cursor):
+    """Cursor that times its queries into the SQLite query histograms.
+
+    SQLite finds the rows of a query as they are fetched, so each query is
+    observed once, for the time spent running it and fetching its rows. The
+    observation is made when the rows run out, or when the cursor runs its
+    next statement, is closed or is freed, whichever comes first.
+    """
+    _kind = None
+    _seconds = 0.0
+
+    def _finish(self):
+        kind, self._kind = self._kind, None
+        if kind is not None:
+            get_metrics().observe(("query", kind), self._seconds)
+
+    def _run(self, kind, run, *args):
+        self._finish()
+        started = time.perf_counter()
+        has_rows = False
+        try:
+            run(*args)
+            has_rows = self.description is not None
+            return self
+        finally:
+            self._kind, self._seconds = kind, time.perf_counter() - started
+            if not has_rows:
+                self._finish()
+
+    def _fetched(self, started, done):
+        if self._kind is not None:
+            self._seconds += time.perf_counter() - started
+            if done:
+                self._finish()
+
+    def execute(self, sql, *args):
+        return self._run(_query_kind(sql), super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._run(_query_kind(sql), super().executemany, sql, *args)
+
+    def executescript(self, script):
+        return self._run(_query_kind(script), super().executescript, script)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, True)
+            raise
+        self._fetched(started, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+class _MeteredConnection(sqlite3.Connection):
+    """Connection whose queries all go through _MeteredCursor.
+
+    The execute shortcuts of sqlite3.Connection run their statement on the
+    cursor in C, bypassing the Python methods, so they are routed through
+    cursor() here instead.
+    """
+
+    def cursor(self, factory=_MeteredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+def connect_database(path):
+    """Open the SQLite database at path, timing its queries for /metrics."""
+    return sqlite3.connect(path, factory=_MeteredConnection)
+
+_REQUEST_STARTED = "dbd.request_started"
+
+@app.before_request
+def _start_request_timer():
+    # Going through the request proxy once per hook keeps the overhead to a few microseconds
+    request._get_current_object().environ[_REQUEST_STARTED] = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    req = request._get_current_object()
+    started = req.environ.get(_REQUEST_STARTED)
+    if started is not None:
+        rule = req.url_rule
+        method, route = (req.method, rule.rule) if rule is not None else ("other", "<unmatched>")
+        status = response.status_code if response.status_code in METRICS_STATUSES else "other"
+        get_metrics().observe(("route", method, route), time.perf_counter() - started, ("status", method, route, status))
+    return response
+
+def _metric_labels(**labels):
+    escaped = {
+        name: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for name, value in labels.items()
+    }
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+def _histogram_lines(name, metrics, key, **labels):
+    cells = metrics.totals(key, len(METRICS_BUCKETS) + 2)
+    count = sum(cells[:-1])
+    if not count:
+        return []
+    lines = []
+    cumulative = 0
+    for bound, value in zip(METRICS_BUCKETS + ("+Inf",), cells):
+        cumulative += value
+        lines.append(f"{name}_bucket{_metric_labels(**labels, le=bound)} {cumulative:g}")
+    lines.append(f"{name}_sum{_metric_labels(**labels)} {cells[-1]:.6f}")
+    lines.append(f"{name}_count{_metric_labels(**labels)} {count:g}")
+    return lines
+
+def render_metrics():
+    """Return every metric in the Prometheus text exposition format."""
+    metrics = get_metrics()
+    routes = _metric_routes()
+    lines = [
+        "# HELP dbd_http_request_duration_seconds Time spent handling API requests.",
+        "# TYPE dbd_http_request_duration_seconds histogram",
+    ]
+    for method, rule in routes:
+        lines += _histogram_lines("dbd_http_request_duration_seconds", metrics, ("route", method, rule),
+                                  method=method, route=rule)
+    lines += ["# HELP dbd_http_requests_total API responses by status.", "# TYPE dbd_http_requests_total counter"]
+    for method, rule in routes:
+        for status in METRICS_STATUSES + ("other",):
+            count = metrics.totals(("status", method, rule, status))[0]
+            if count:
+                lines.append(f"dbd_http_requests_total{_metric_labels(method=method, route=rule, status=status)} {count:g}")
+    lines += [
+        "# HELP dbd_sqlite_query_duration_seconds Time spent in SQLite queries; random_order is ORDER BY RANDOM().",
+        "# TYPE dbd_sqlite_query_duration_seconds histogram",
+    ]
+    for kind in SQLITE_QUERY_KINDS:
+        lines += _histogram_lines("dbd_sqlite_query_duration_seconds", metrics, ("query", kind), kind=kind)
+
+    lines += [
+        "# HELP dbd_database_generation Generation of the database being served.",
+        "# TYPE dbd_database_generation gauge",
+        f"dbd_database_generation {get_db_generation()}",
+    ]
+    stats = get_rebuild_stats()
+    if stats:
+        lines += [
+            "# HELP dbd_rebuild_phase_duration_seconds How long each phase of the last rebuild took.",
+            "# TYPE dbd_rebuild_phase_duration_seconds gauge",
+        ]
+        lines += [
+            f"dbd_rebuild_phase_duration_seconds{_metric_labels(phase=phase)} {seconds:.6f}"
+            for phase, seconds in stats["phases"].items()
+        ]
+        lines += [
+            "# HELP dbd_last_rebuild_timestamp_seconds When the last rebuild finished (Unix time).",
+            "# TYPE dbd_last_rebuild_timestamp_seconds gauge",
+            f"dbd_last_rebuild_timestamp_seconds {stats['finished']:.3f}",
+            "# HELP dbd_last_rebuild_age_seconds Seconds since the last rebuild finished.",
+            "# TYPE dbd_last_rebuild_age_seconds gauge",
+            f"dbd_last_rebuild_age_seconds {time.time() - stats['finished']:.3f}",
+        ]
+    return "\n".join(lines) + "\n"
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def _profile_base_path(label):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', label)}-{uuid.uuid4().hex[:6]}"
+    return os.path.join(PROFILE_DIR, name)
+
+def _frame_label(key):
+    filename, _, name = key
+    label = name if filename == "~" else f"{os.path.basename(filename)}:{name}"
+    # ";" separates frames in the collapsed format
+    return label.replace(";", ",")
+
+def _write_collapsed(path, stacks):
+    """Write {stack tuple: weight} as flamegraph.pl/speedscope collapsed stacks."""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items()):
+            if weight >= 1:
+                f.write(f"{';'.join(stack)} {int(weight)}\n")
+
+def _collapsed_from_profile(stats, min_share=1e-6):
+    """Estimate collapsed stacks (weighted in microseconds) from cProfile's caller/callee times.
+
+    cProfile only records caller -> callee pairs, so each function's time is
+    split between the paths leading to it in proportion to the time spent on
+    each call edge.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+    stacks = {}
+
+    def walk(func, path, on_path, share):
+        total = stats[func][3]
+        if total <= 0 or share < min_share:
+            return
+        scale = share / total
+        stacks[path] = stacks.get(path, 0) + stats[func][2] * scale * 1e6
+        for callee, edge_ct in callees.get(func, ()):
+            if callee not in on_path:
+                walk(callee, path + (_frame_label(callee),), on_path | {callee}, edge_ct * scale)
+
+    for func, (_, _, _, ct, callers) in stats.items():
+        if not callers:
+            walk(func, (_frame_label(func),), {func}, ct)
+    return stacks
+
+def _save_profile(profile, label):
+    """Write a finished cProfile.Profile as .pstats and .collapsed files; returns their base path."""
+    base = _profile_base_path(label)
+    profile.create_stats()
+    profile.dump_stats(base + ".pstats")
+    _write_collapsed(base + ".collapsed", _collapsed_from_profile(profile.stats))
+    return base
+
+class StackSampler:
+    """Wall-clock sampling profiler for every thread of the process.
+
+    A background thread records the stack of each other thread every
+    PROFILE_SAMPLE_INTERVAL seconds. Unlike cProfile, which only sees the
+    thread it was enabled in, this covers the scraper thread pools of a
+    rebuild, and it costs the profiled threads next to nothing.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                # Pool threads are numbered; samples of one pool are grouped together
+                key = (re.sub(r"_\d+$", "", names.get(ident, "thread")), tuple(reversed(stack)))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def pstats_dict(self):
+        """Return the samples in pstats' marshalled layout; call counts are sample counts."""
+        stats = {}
+        for (_, stack), count in self.samples.items():
+            seconds = count * self.interval
+            for i, func in enumerate(stack):
+                if func in stack[:i]:
+                    continue
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                stats[func] = (cc + count, nc + count, tt, ct + seconds, callers)
+            leaf = stack[-1]
+            cc, nc, tt, ct, callers = stats[leaf]
+            stats[leaf] = (cc, nc, tt + seconds, ct, callers)
+            for caller, callee in zip(stack, stack[1:]):
+                edge = stats[callee][4].get(caller, (0, 0, 0.0, 0.0))
+                stats[callee][4][caller] = (edge[0] + count, edge[1] + count,
+                                            edge[2] + (seconds if callee is leaf else 0.0), edge[3] + seconds)
+        return stats
+
+    def save(self, label):
+        """Write the samples as .pstats and .collapsed files; returns their base path."""
+        base = _profile_base_path(label)
+        with open(base + ".pstats", "wb") as f:
+            marshal.dump(self.pstats_dict(), f)
+        stacks = {}
+        for (thread_name, stack), count in self.samples.items():
+            path = (thread_name,) + tuple(_frame_label(func) for func in stack)
+            stacks[path] = stacks.get(path, 0) + count
+        _write_collapsed(base + ".collapsed", stacks)
+        return base
+
+@contextlib.contextmanager
+def rebuild_profile(label):
+    """Sample the stacks of a rebuild when PROFILE_REBUILDS is on."""
+    if not PROFILE_REBUILDS:
+        yield
+        return
+    sampler = StackSampler()
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        base = sampler.save(label)
+        print(f"Rebuild profile saved to {base}.pstats and {base}.collapsed")
+
+_PROFILER = "dbd.profiler"
+_request_counter = itertools.count(1)
+
+def _profile_requested(req):
+    if PROFILE_REQUESTS and (req.args.get("profile") == "1" or req.headers.get("X-Profile") == "1"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and next(_request_counter) % PROFILE_SAMPLE_RATE == 0
+
+@app.before_request
+def _start_request_profile():
+    if not (PROFILE_REQUESTS or PROFILE_SAMPLE_RATE):
+        return
+    req = request._get_current_object()
+    if _profile_requested(req):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process; skip this request
+            return
+        req.environ[_PROFILER] = profiler
+
+def _finish_request_profile(req):
+    profiler = req.environ.pop(_PROFILER, None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    try:
+        return _save_profile(profiler, f"{req.method}-{req.url_rule.rule if req.url_rule else 'unmatched'}")
+    except OSError as e:
+        logging.warning(f"Could not save request profile: {e}")
+        return None
+
+@app.after_request
+def _stop_request_profile(response):
+    if PROFILE_REQUESTS or PROFILE_SAMPLE_RATE:
+        base = _finish_request_profile(request._get_current_object())
+        if base:
+            response.headers["X-Profile-File"] = os.path.basename(base)
+    return response
+
+@app.teardown_request
+def _discard_request_profile(exc):
+    # A request that raised never reached _stop_request_profile
+    if PROFILE_REQUESTS or PROFILE_SAMPLE_RATE:
+        _finish_request_profile(request._get_current_object())
+
 @app.route("/api/characters", methods=["GET"])
 def api_characters():
     role = request.args.get("role", "any")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    catalog = get_catalog()
     if role == "killer":
-        c.execute("SELECT name FROM killers ORDER BY name")
-        characters = [row[0] for row in c.fetchall()]
+        characters = list(catalog.killer_names)
     elif role == "survivor":
-        c.execute("SELECT name FROM survivors ORDER BY name")
-        characters = [row[0] for row in c.fetchall()]
+        characters = list(catalog.survivor_names)
     else:
-        c.execute("SELECT name FROM killers ORDER BY name")
-        characters = [row[0] for row in c.fetchall()]
-        c.execute("SELECT name FROM survivors ORDER BY name")
-        characters.extend([row[0] for row in c.fetchall()])
-    characters = sorted(set(characters))
-    conn.close()
+        characters = sorted(set(catalog.killer_names) | set(catalog.survivor_names))
     return jsonify({"characters": characters})
 
 @app.route("/api/update", methods=["POST"])
 def api_update():
-    try:
-        init_database()
-        return jsonify({"status": "success", "message": "Database updated."})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    job = start_update_job()
+    if job is None:
+        return jsonify({"status": "error", "message": "The database is already being rebuilt."}), 409
+    return jsonify({
+        "status": "accepted",
+        "job_id": job["job_id"],
+        "status_url": f"/api/update/{job['job_id']}",
+    }), 202
+
+@app.route("/api/update/<job_id>", methods=["GET"])
+def api_update_status(job_id):
+    job = get_update_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown update job."}), 404
+    return jsonify({key: value for key, value in job.items() if key != "pid"})
 
 def get_rarity_color(rarity):
     colors = {
@@ -703,126 +1950,82 @@ def get_rarity_color(rarity):
 
     return colors.get(rarity, "#FFFFFF")
 
-def generate_random_build(role, allowed=None, use_offering=False):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+def _addon_json(addon):
+    return {
+        "name": addon.name,
+        "description": addon.description,
+        "icon": addon.icon,
+        "rarity": addon.rarity.title(),
+        "color": get_rarity_color(addon.rarity)
+    }
+
+def _perk_json(perk):
+    return {"name": perk.name, "description": perk.description, "owner": perk.owner, "icon": perk.icon}
+
+def pick_one(pool):
+    return pool[randrange(len(pool))] if pool else None
+
+def _is_string_list(value):
+    """Whether a JSON filter is a list of strings, or None for no filter.
+
+    A bare string would otherwise be iterated one character at a time.
+    """
+    return value is None or (isinstance(value, list) and all(isinstance(v, str) for v in value))
+
+def generate_random_build(role, allowed=None, use_offering=False, rarities=None):
+    """Draw a random build for role from the catalog.
+
+    allowed, a list of character names, limits the character (and the perks)
+    to those characters, and rarities, a list of rarity names, limits the
+    addons and offering to those rarities.
+    """
+    catalog = get_catalog()
     result = {}
     if role == "any":
         role = ["killer", "survivor"][randint(0, 1)]
 
     if use_offering:
-        c.execute("SELECT icon, name, description, rarity FROM offerings WHERE role = ? OR role = 'all' ORDER BY RANDOM() LIMIT 1", (role,))
-        offering_data = c.fetchone()
-        if not offering_data:
+        offering = pick_one(catalog.offering_pool(role, rarities))
+        if not offering:
             logging.warning("No offering found for %s role.", role)
             result["offering"] = None
         else:
-            color = get_rarity_color(offering_data[3])
-
-            result["offering"] = {
-                "icon": offering_data[0],
-                "name": offering_data[1],
-                "description": offering_data[2],
-                "rarity": offering_data[3].title(),
-                "color": color
-            }
+            result["offering"] = _offering_json(offering)
             logging.info("Offering found for %s role: %s", role, result["offering"]["name"])
     else:
         result["offering"] = None
 
     # Select character based on role
-    if role == "killer":
-        if allowed:
-            placeholders = ",".join("?" for _ in allowed)
-            q = f"SELECT id, name, icon FROM killers WHERE name IN ({placeholders}) ORDER BY RANDOM() LIMIT 1"
-            c.execute(q, tuple(allowed))
-        else:
-            c.execute("SELECT id, name, icon FROM killers ORDER BY RANDOM() LIMIT 1")
-    else:  # survivor
-        if allowed:
-            placeholders = ",".join("?" for _ in allowed)
-            q = f"SELECT id, name FROM survivors WHERE name IN ({placeholders}) ORDER BY RANDOM() LIMIT 1"
-            c.execute(q, tuple(allowed))
-        else:
-            c.execute("SELECT id, name FROM survivors ORDER BY RANDOM() LIMIT 1")
-    
-    character = c.fetchone()
+    character = pick_one(catalog.character_pool(role, allowed))
     if not character:
-        conn.close()
         return None
 
-    character_name = character[1]
     if role == "killer":
-        killer_id = character[0]
-        killer_icon = character[2]
-        result["killer"] = {"name": character_name, "icon": killer_icon}
+        result["killer"] = {"name": character.name, "icon": character.icon}
 
-        c.execute("SELECT name, description, icon, rarity FROM killer_addons WHERE killer_id = ? ORDER BY RANDOM() LIMIT 2", (killer_id,))
-        addons = [{"name": a[0], "description": a[1], "icon": a[2], "rarity": a[3].title(), "color": get_rarity_color(a[3])} for a in c.fetchall()]
+        addons = [_addon_json(a) for a in sample_distinct(catalog.addon_pool("killer", character.id, rarities), 2)]
         if not addons:
-            logging.warning("No addons found for killer %s", character_name)
+            logging.warning("No addons found for killer %s", character.name)
             result["addons"] = None
         else:
             result["addons"] = addons
     else:
-        result["survivor"] = {"name": character_name}
+        result["survivor"] = {"name": character.name}
 
-        c.execute("SELECT id, icon, name, description FROM survivor_items ORDER BY RANDOM() LIMIT 1")
-        item_row = c.fetchone()
-        if item_row:
-            item_id, item_icon, item_name, item_desc = item_row
+        item = pick_one(catalog.items)
+        if item:
             result["item"] = {
-            "icon": item_icon,
-            "name": item_name,
-            "description": item_desc
+                "icon": item.icon,
+                "name": item.name,
+                "description": item.description
             }
             # Select 2 random addons for this item
-            c.execute(
-            "SELECT name, description, icon, rarity FROM survivor_addons WHERE item = ? ORDER BY RANDOM() LIMIT 2",
-            (item_id,)
-            )
-            addons = [
-            {
-                "name": a[0],
-                "description": a[1],
-                "icon": a[2],
-                "rarity": a[3].title(),
-                "color": get_rarity_color(a[3])
-            }
-            for a in c.fetchall()
-            ]
-            result["addons"] = addons
+            result["addons"] = [_addon_json(a) for a in sample_distinct(catalog.addon_pool("survivor", item.id, rarities), 2)]
         else:
             result["item"] = None
             result["addons"] = []
 
-    perk_table = role + "_perks"
-    character_table = role + "s"
-    character_id_field = f"perk_table.{role}_id"
-    
-    if allowed:
-        placeholders = ",".join("?" for _ in allowed)
-        q = f"""
-            SELECT perk_table.name, perk_table.description, character_table.name as owner_name, perk_table.icon
-            FROM {perk_table} perk_table
-            LEFT JOIN {character_table} character_table ON {character_id_field} = character_table.id
-            WHERE character_table.name IN ({placeholders})
-            ORDER BY RANDOM() LIMIT 4
-        """
-        c.execute(q, tuple(allowed))
-    else:
-        q = f"""
-            SELECT perk_table.name, perk_table.description, character_table.name as owner_name, perk_table.icon
-            FROM {perk_table} perk_table
-            LEFT JOIN {character_table} character_table ON {character_id_field} = character_table.id
-            ORDER BY RANDOM() LIMIT 4
-        """
-        c.execute(q)
-    
-    perks = [{"name": p[0], "description": p[1], "owner": p[2], "icon": p[3]} for p in c.fetchall()]
-    result["perks"] = perks
-
-    conn.close()
+    result["perks"] = [_perk_json(p) for p in sample_distinct(catalog.perk_pool(role, allowed), 4)]
     return result
 
 @app.route("/api/random_build", methods=["POST", "GET"])
@@ -831,87 +2034,324 @@ def api_random_build():
         data = request.get_json(force=True)
         allowed = data.get("allowed", None)
         use_offerings = data.get("useOfferings", False)
+        rarities = data.get("rarities", None)
         role = data.get("role", None) or request.args.get("role", "any")
     else:
         allowed = None
         use_offerings = False
+        rarities = None
         role = request.args.get("role", "any")
 
     if role not in ["killer", "survivor", "any"]:
         return jsonify({"error": "Invalid role"}), 400
+    if not _is_string_list(rarities):
+        return jsonify({"error": "Rarities must be a list of rarity names"}), 400
+    if not _is_string_list(allowed):
+        return jsonify({"error": "Allowed must be a list of character names"}), 400
 
-    result = generate_random_build(role, allowed, use_offerings)
+    result = generate_random_build(role, allowed, use_offerings, rarities)
     if result is None:
         return jsonify({"error": f"No {role}s found"}), 404
 
     return jsonify(result)
 
+def _draw_distinct_rows(rng, n, rows, k):
+    """Return a (rows, min(k, n)) array where each row holds distinct random indices below n."""
+    np = optional_module("numpy")
+    k = min(k, n)
+    if k == 0:
+        return np.empty((rows, 0), dtype=np.intp)
+    keys = rng.random((rows, n))
+    idx = np.argpartition(keys, k - 1, axis=1)[:, :k] if k < n else np.arange(n)[None, :].repeat(rows, axis=0)
+    # argpartition leaves the k smallest keys unordered; sort them so the order is random too
+    order = np.take_along_axis(keys, idx, axis=1).argsort(axis=1)
+    return np.take_along_axis(idx, order, axis=1)
+
+def _draw_owned_rows(rng, owner_idx, pool_for_owner, k):
+    """For each row, draw k distinct records from the pool of that row's owner."""
+    np = optional_module("numpy")
+    drawn = [None] * len(owner_idx)
+    for owner in np.unique(owner_idx):
+        rows = np.nonzero(owner_idx == owner)[0]
+        pool = pool_for_owner(int(owner))
+        picks = _draw_distinct_rows(rng, len(pool), len(rows), k)
+        for row, pick in zip(rows.tolist(), picks.tolist()):
+            drawn[row] = [pool[i] for i in pick]
+    return drawn
+
+_numpy_fallback_logged = False
+
+def generate_random_builds(role, amount, allowed=None):
+    """Draw amount builds for role at once, or return None if there are no characters.
+
+    With NumPy available, every pool is sampled for all builds in one vectorized
+    pass and the records are converted to JSON once each; without it this falls
+    back to calling generate_random_build amount times.
+    """
+    catalog = get_catalog()
+    characters = catalog.character_pool(role, allowed)
+    if not characters:
+        return None
+    # NumPy is optional; without it batch builds are drawn one build at a time.
+    np = optional_module("numpy")
+    if np is None:
+        global _numpy_fallback_logged
+        if not _numpy_fallback_logged:
+            _numpy_fallback_logged = True
+            logging.warning("NumPy is not installed, so batch builds are drawn one at a time (pip install numpy)")
+        return [generate_random_build(role, allowed) for _ in range(amount)]
+
+    rng = np.random.default_rng()
+    perk_pool = catalog.perk_pool(role, allowed)
+    char_idx = rng.integers(0, len(characters), size=amount)
+    perk_idx = _draw_distinct_rows(rng, len(perk_pool), amount, 4)
+
+    json_cache = {}
+    def as_json(record, to_json):
+        key = (type(record), record.id)
+        if key not in json_cache:
+            json_cache[key] = to_json(record)
+        return json_cache[key]
+
+    builds = [{"offering": None} for _ in range(amount)]
+    if role == "killer":
+        addons = _draw_owned_rows(rng, char_idx, lambda i: catalog.addon_pool("killer", characters[i].id), 2)
+        for build, ci, build_addons in zip(builds, char_idx.tolist(), addons):
+            killer = characters[ci]
+            build["killer"] = {"name": killer.name, "icon": killer.icon}
+            build["addons"] = [as_json(a, _addon_json) for a in build_addons] or None
+    else:
+        if catalog.items:
+            item_idx = rng.integers(0, len(catalog.items), size=amount)
+            addons = _draw_owned_rows(rng, item_idx, lambda i: catalog.addon_pool("survivor", catalog.items[i].id), 2)
+        else:
+            item_idx, addons = None, [[]] * amount
+        for row, (build, ci, build_addons) in enumerate(zip(builds, char_idx.tolist(), addons)):
+            build["survivor"] = {"name": characters[ci].name}
+            if item_idx is None:
+                build["item"] = None
+            else:
+                item = catalog.items[int(item_idx[row])]
+                build["item"] = {"icon": item.icon, "name": item.name, "description": item.description}
+            build["addons"] = [as_json(a, _addon_json) for a in build_addons]
+
+    for build, picks in zip(builds, perk_idx.tolist()):
+        build["perks"] = [as_json(perk_pool[i], _perk_json) for i in picks]
+    return builds
+
+def _stream_builds(role, amount, allowed):
+    yield '{"builds": ['
+    separator = ""
+    for start in range(0, amount, BATCH_BUILD_CHUNK):
+        builds = generate_random_builds(role, min(BATCH_BUILD_CHUNK, amount - start), allowed) or []
+        # A chunk can come back empty (the data may change mid-stream), so the
+        # separator is only written once a build has been
+        if builds:
+            yield separator + ",".join(app.json.dumps(build) for build in builds)
+            separator = ","
+    yield "]}"
+
 @app.route("/api/batch_random_build", methods=["GET", "POST"])
 def batch_random_build():
-    if request.method == "POST":
-        data = request.get_json(force=True)
-        role = data.get("role", None)
-        amount = int(data.get("amount", 1))
-        allowed = data.get("allowed", None)
-    else:
-        role = request.args.get("role", None)
-        amount = int(request.args.get("amount", 1))
-        allowed = None
+    try:
+        if request.method == "POST":
+            data = request.get_json(force=True)
+            role = data.get("role", None)
+            amount = int(data.get("amount", 1))
+            allowed = data.get("allowed", None)
+        else:
+            role = request.args.get("role", None)
+            amount = int(request.args.get("amount", 1))
+            allowed = None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid amount"}), 400
 
     if role not in ["killer", "survivor"]:
         return jsonify({"error": "Invalid role"}), 400
+    if amount < 1 or amount > BATCH_BUILD_MAX:
+        return jsonify({"error": f"Amount must be between 1 and {BATCH_BUILD_MAX}"}), 400
+    if not _is_string_list(allowed):
+        return jsonify({"error": "Allowed must be a list of character names"}), 400
+    if not get_catalog().character_pool(role, allowed):
+        return jsonify({"error": f"No {role}s found"}), 404
 
-    builds = []
-    for _ in range(amount):
-        build = generate_random_build(role, allowed)
-        if build is None:
-            return jsonify({"error": f"No {role}s found"}), 404
-        builds.append(build)
+    if amount > BATCH_BUILD_STREAM_THRESHOLD:
+        return Response(stream_with_context(_stream_builds(role, amount, allowed)), mimetype="application/json")
+    return jsonify({"builds": generate_random_builds(role, amount, allowed)})
 
-    return jsonify({"builds": builds})
 
+MAX_LOBBY_SURVIVORS = 4
 
-@app.route("/api/custom_match_random_builds", methods=["GET"])
-def custom_match_random_builds():
-    killer_build_raw = generate_random_build("killer")
-    if not killer_build_raw:
-        return jsonify({"error": "No killer found"}), 404
+def _offering_json(offering):
+    if not offering:
+        return None
+    return {
+        "icon": offering.icon,
+        "name": offering.name,
+        "description": offering.description,
+        "rarity": offering.rarity.title(),
+        "color": get_rarity_color(offering.rarity)
+    }
 
-    killer_info = killer_build_raw.get("killer", {})
+def _draw(pool, k, unique, what):
+    """Draw k records from pool, distinct ones if unique is set."""
+    if unique:
+        if len(pool) < k:
+            raise ValueError(f"Not enough {what} to draw {k} distinct ones (only {len(pool)} available)")
+        return sample_distinct(pool, k)
+    return [pick_one(pool) for _ in range(k)]
+
+def generate_match(killer_allowed=None, survivor_allowed=None, survivor_count=MAX_LOBBY_SURVIVORS,
+                   unique_survivors=True, unique_perks=False, unique_items=False, use_offerings=False):
+    """Draw a whole custom match lobby in one pass over the catalog pools.
+
+    Every uniqueness constraint is met by drawing all the records it covers at
+    once without replacement, so the cost does not depend on the constraints.
+    Raises ValueError if the pools are too small to satisfy a constraint, and
+    returns None if there is no killer or survivor to pick.
+    """
+    catalog = get_catalog()
+    killer = pick_one(catalog.character_pool("killer", killer_allowed))
+    survivor_pool = catalog.character_pool("survivor", survivor_allowed)
+    if not killer or not survivor_pool:
+        return None
+
+    killer_addons = [_addon_json(a) for a in sample_distinct(catalog.addon_pool("killer", killer.id), 2)]
     result = {
         "killer": {
-            "name": killer_info.get("name"),
-            "icon": killer_info.get("icon"),
-            "addons": killer_build_raw.get("addons", []),
-            "perks": killer_build_raw.get("perks", [])
+            "name": killer.name,
+            "icon": killer.icon,
+            "addons": killer_addons or None,
+            "perks": [_perk_json(p) for p in sample_distinct(catalog.perk_pool("killer", killer_allowed), 4)]
         },
         "survivors": []
     }
+    if use_offerings:
+        result["killer"]["offering"] = _offering_json(pick_one(catalog.offering_pool("killer")))
+
+    survivors = _draw(survivor_pool, survivor_count, unique_survivors, "survivors")
+    perk_pool = catalog.perk_pool("survivor", survivor_allowed)
+    if unique_perks:
+        team_perks = _draw(perk_pool, 4 * survivor_count, True, "survivor perks")
+        perks = [team_perks[i * 4:(i + 1) * 4] for i in range(survivor_count)]
+    else:
+        perks = [sample_distinct(perk_pool, 4) for _ in range(survivor_count)]
+    items = _draw(catalog.items, survivor_count, unique_items, "items") if catalog.items else [None] * survivor_count
+
+    for survivor, item, survivor_perks in zip(survivors, items, perks):
+        build = {
+            "offering": _offering_json(pick_one(catalog.offering_pool("survivor"))) if use_offerings else None,
+            "survivor": {"name": survivor.name},
+            "item": None,
+            "addons": [],
+            "perks": [_perk_json(p) for p in survivor_perks],
+        }
+        if item:
+            build["item"] = {"icon": item.icon, "name": item.name, "description": item.description}
+            build["addons"] = [_addon_json(a) for a in sample_distinct(catalog.addon_pool("survivor", item.id), 2)]
+        result["survivors"].append(build)
+    return result
 
-    for _ in range(4):
-        sb = generate_random_build("survivor")
-        if not sb:
-            return jsonify({"error": "Not enough survivors found"}), 404
-        result["survivors"].append(sb)
+@app.route("/api/custom_match_random_builds", methods=["GET", "POST"])
+def custom_match_random_builds():
+    if request.method == "POST":
+        data = request.get_json(force=True)
+        try:
+            survivor_count = int(data.get("survivors", MAX_LOBBY_SURVIVORS))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid lobby size"}), 400
+        options = {
+            "killer_allowed": data.get("killerAllowed", None),
+            "survivor_allowed": data.get("survivorAllowed", None),
+            "survivor_count": survivor_count,
+            "unique_survivors": bool(data.get("uniqueSurvivors", True)),
+            "unique_perks": bool(data.get("uniquePerks", False)),
+            "unique_items": bool(data.get("uniqueItems", False)),
+            "use_offerings": bool(data.get("useOfferings", False)),
+        }
+        if not 1 <= survivor_count <= MAX_LOBBY_SURVIVORS:
+            return jsonify({"error": f"Lobby size must be between 1 and {MAX_LOBBY_SURVIVORS} survivors"}), 400
+        if not (_is_string_list(options["killer_allowed"]) and _is_string_list(options["survivor_allowed"])):
+            return jsonify({"error": "Allowed must be a list of character names"}), 400
+    else:
+        options = {}
 
+    try:
+        result = generate_match(**options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if result is None:
+        return jsonify({"error": "No killer or survivors found"}), 404
     return jsonify(result)
 
-@app.route("/api/all_addons")
-def api_all_addons():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        SELECT a.name, a.description, a.icon, k.name as killer
-        FROM killer_addons a
-        LEFT JOIN killers k ON a.killer_id = k.id
-        ORDER BY k.name, a.name
-    """)
+class CachedResponse:
+    """A JSON body serialized and compressed once, with a strong ETag per encoding."""
+    __slots__ = ("bodies", "etags")
+
+    def __init__(self, payload):
+        body = app.json.response(payload).get_data()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, CACHED_GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=CACHED_BROTLI_QUALITY)
+        # Each encoding is a different representation, so each gets its own tag
+        self.etags = {
+            encoding: digest if encoding == "identity" else f"{digest}-{encoding}"
+            for encoding in self.bodies
+        }
+
+    def choose_encoding(self, accept_encodings):
+        best, best_quality = "identity", 0
+        for encoding in ("br", "gzip"):
+            quality = accept_encodings[encoding] if encoding in self.bodies else 0
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+def cached_json_response(key, build):
+    """Serve the JSON payload returned by build(catalog) from a per-generation cache.
+
+    The payload is serialized and compressed the first time it is requested for
+    the current catalog and reused until the database is rebuilt. Responses
+    carry a strong ETag, and a matching If-None-Match gets an empty 304.
+    """
+    cached = get_catalog().cached_response(key, build)
+    encoding = cached.choose_encoding(request.accept_encodings)
+    etag = cached.etags[encoding]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.bodies[encoding], mimetype="application/json")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    # Clients may keep the body but must revalidate, since a rebuild changes it
+    response.cache_control.no_cache = True
+    return response
+
+def _owner_sort_key(record):
+    # Matches SQLite's ORDER BY owner, name, where NULL owners sort first
+    return (record.owner is not None, record.owner or "", record.name)
+
+def _all_addons_payload(catalog):
     addons = [
-        {"name": row[0], "description": row[1], "icon": row[2], "killer": row[3]}
-        for row in c.fetchall()
+        {"name": a.name, "description": a.description, "icon": a.icon, "killer": a.owner}
+        for a in sorted(catalog.killer_addons, key=_owner_sort_key)
     ]
-    conn.close()
-    return jsonify({"addons": addons})
+    return {"addons": addons}
+
+@app.route("/api/all_addons")
+def api_all_addons():
+    return cached_json_response("all_addons", _all_addons_payload)
+
+def _option_json(record):
+    return {"name": record.name, "description": record.description, "icon": record.icon}
+
+def _random_role(eligible):
+    """Pick "killer" or "survivor" among the roles that eligible(role) says can be drawn from."""
+    roles = [role for role in ("killer", "survivor") if eligible(role)]
+    return choice(roles) if roles else None
 
 @app.route("/api/random_addons", methods=["GET", "POST"])
 def api_random_addons():
@@ -922,79 +2362,46 @@ def api_random_addons():
     else:
         allowed = None
         role = request.args.get("role", "killer")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    if not _is_string_list(allowed):
+        return jsonify({"error": "Allowed must be a list of character names"}), 400
+    catalog = get_catalog()
     result = {}
     if role == "any":
-        role = ["killer", "survivor"][randint(0, 1)]
+        role = _random_role(lambda r: catalog.addon_owner_pool(r, ADDON_QUESTION_MIN_ADDONS, allowed)) or "killer"
 
     if role == "killer":
-        if allowed:
-            q = "SELECT id, name, icon FROM killers WHERE name IN ({}) ORDER BY RANDOM() LIMIT 1".format(
-                ",".join("?" for _ in allowed)
-            )
-            c.execute(q, allowed)
-        else:
-            c.execute("SELECT id, name, icon FROM killers ORDER BY RANDOM() LIMIT 1")
-        killer = c.fetchone()
-        if not killer:
-            conn.close()
+        if not catalog.character_pool("killer", allowed):
             return jsonify({"error": "No killers found"}), 404
-        killer_id, killer_name, killer_icon = killer
-        result["killer"] = {"name": killer_name, "icon": killer_icon}
-
-        c.execute("SELECT name, description, icon FROM killer_addons WHERE killer_id = ? ORDER BY RANDOM() LIMIT 1", (killer_id,))
-        a = c.fetchone()
-        if not a:
-            conn.close()
-            # If there are no addons, try again - will select another random killer.
-            # If there is only killers in which addons cannot be retrieved, the maximum
-            # recursion depth will be exceeded and the frontend will display "Failed to fetch."
-            return api_random_addons()
-        
-        chosen_addon = {"name": a[0], "description": a[1], "icon": a[2]}
-        result["chosen_addon"] = chosen_addon
-
-        c.execute(
-            "SELECT name, description, icon FROM killer_addons WHERE killer_id = ? AND name != ? ORDER BY RANDOM() LIMIT 3",
-            (killer_id, chosen_addon["name"]),
-        )
-        false_addons = [{"name": a[0], "description": a[1], "icon": a[2]} for a in c.fetchall()]
-        false_addons.append(chosen_addon)
-        options = false_addons + [chosen_addon]
-        options = [dict(t) for t in {tuple(d.items()) for d in options}]  # remove exact duplicates
-        shuffle(options)
-
-        result["addon_options"] = options
+        # Only killers with enough add-ons for a question are drawn
+        killer = pick_one(catalog.addon_owner_pool("killer", ADDON_QUESTION_MIN_ADDONS, allowed))
+        if not killer:
+            return jsonify({"error": "None of these killers have enough add-ons"}), 409
+        result["killer"] = {"name": killer.name, "icon": killer.icon}
+        pool = catalog.addon_pool("killer", killer.id)
     elif role == "survivor":
-        if allowed:
-            q = "SELECT id, name FROM survivors WHERE name IN ({}) ORDER BY RANDOM() LIMIT 1".format(
-                ",".join("?" for _ in allowed)
-            )
-            c.execute(q, allowed)
-        else:
-            c.execute("SELECT id, name FROM survivors ORDER BY RANDOM() LIMIT 1")
-        survivor = c.fetchone()
+        survivor = pick_one(catalog.character_pool("survivor", allowed))
         if not survivor:
-            conn.close()
-            return api_random_addons()
-        survivor_name = survivor[1]
-        result["survivor"] = {"name": survivor_name}
-
-        c.execute("SELECT name, description, icon FROM killer_addons WHERE killer_id IS NULL ORDER BY RANDOM() LIMIT 1")
-        a = c.fetchone()
-        chosen_addon = {"name": a[0], "description": a[1], "icon": a[2]}
-        result["chosen_addon"] = chosen_addon
-
-        c.execute(
-            "SELECT name, description, icon FROM killer_addons WHERE killer_id IS NULL AND name != ? ORDER BY RANDOM() LIMIT 3",
-            (chosen_addon["name"],)
-        )
-        false_addons = [{"name": a[0], "description": a[1], "icon": a[2]} for a in c.fetchall()]
-        result["false_addons"] = false_addons
+            return jsonify({"error": "No survivors found"}), 404
+        result["survivor"] = {"name": survivor.name}
+        # Survivor add-ons belong to items, so the question is about one item's add-ons
+        item = pick_one(catalog.addon_owner_pool("survivor", ADDON_QUESTION_MIN_ADDONS))
+        if not item:
+            return jsonify({"error": "No items have enough add-ons"}), 409
+        result["item"] = {"name": item.name, "icon": item.icon}
+        pool = catalog.addon_pool("survivor", item.id)
     else:
-        return jsonify({"error": "An unknown error has occurred."})
-    conn.close()
+        return jsonify({"error": "Invalid role"}), 400
+
+    # The first addon drawn is the answer, the rest are the wrong options
+    addons = sample_distinct(pool, QUIZ_OPTIONS)
+    chosen_addon = _option_json(addons[0])
+    result["chosen_addon"] = chosen_addon
+    false_addons = [_option_json(a) for a in addons[1:]]
+    if role == "survivor":
+        result["false_addons"] = false_addons
+    options = false_addons + [chosen_addon]
+    shuffle(options)
+    result["addon_options"] = options
     return jsonify(result)
 
 @app.route("/api/random_perks", methods=["GET", "POST"])
@@ -1006,161 +2413,625 @@ def api_random_perks():
     else:
         allowed = None
         role = request.args.get("role", "killer")
+    if not _is_string_list(allowed):
+        return jsonify({"error": "Allowed must be a list of character names"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    catalog = get_catalog()
     result = {}
 
     if role == "any":
-        role = ["killer", "survivor"][randint(0, 1)]
+        role = _random_role(lambda r: catalog.character_pool(r, allowed) and catalog.perks(r)) or "killer"
 
-    if role == "killer":
-        if allowed:
-            q = "SELECT id, name, icon FROM killers WHERE name IN ({}) ORDER BY RANDOM() LIMIT 1".format(
-                ",".join("?" for _ in allowed)
-            )
-            c.execute(q, allowed)
-        else:
-            c.execute("SELECT id, name, icon FROM killers ORDER BY RANDOM() LIMIT 1")
-
-        killer = c.fetchone()
-        if not killer:
-            conn.close()
-            return api_random_perks()
+    if role not in ("killer", "survivor"):
+        return jsonify({"error": "Invalid role"}), 400
 
-        _, killer_name, killer_icon = killer
-        result["killer"] = {"name": killer_name, "icon": killer_icon}
+    character = pick_one(catalog.character_pool(role, allowed))
+    if not character:
+        return jsonify({"error": f"No {role}s found"}), 404
+    if role == "killer":
+        result["killer"] = {"name": character.name, "icon": character.icon}
+    else:
+        result["survivor"] = {"name": character.name}
 
-        # Fetch one random killer perk (can filter by character_id if needed)
-        c.execute("""
-            SELECT name, description, icon
-            FROM killer_perks
-            ORDER BY RANDOM() LIMIT 1
-        """)
-        p = c.fetchone()
-        if not p:
-            conn.close()
-            return api_random_perks()
+    # Pick random perks of the role; the first one drawn is the answer and the
+    # rest are the wrong options
+    perks = sample_distinct(catalog.perks(role), QUIZ_OPTIONS)
+    if not perks:
+        return jsonify({"error": f"No {role} perks found"}), 409
 
-        chosen_perk = {"name": p[0], "description": p[1], "icon": p[2]}
-        result["chosen_perk"] = chosen_perk
+    chosen_perk = _option_json(perks[0])
+    result["chosen_perk"] = chosen_perk
 
-        c.execute("""
-            SELECT name, description, icon
-            FROM killer_perks
-            WHERE name != ?
-            ORDER BY RANDOM() LIMIT 3
-        """, (chosen_perk["name"],))
-        false_perks = [{"name": r[0], "description": r[1], "icon": r[2]} for r in c.fetchall()]
+    false_perks = [_option_json(p) for p in perks[1:]]
+    options = false_perks + [chosen_perk]
+    shuffle(options)
+    result["perk_options"] = options
 
-        options = false_perks + [chosen_perk]
-        options = [dict(t) for t in {tuple(d.items()) for d in options}]  # deduplicate
-        shuffle(options)
-        result["perk_options"] = options
+    return jsonify(result)
 
-    elif role == "survivor":
-        if allowed:
-            q = "SELECT id, name FROM survivors WHERE name IN ({}) ORDER BY RANDOM() LIMIT 1".format(
-                ",".join("?" for _ in allowed)
-            )
-            c.execute(q, allowed)
+class QuizSession:
+    """A shuffled deck of quiz questions that deals each one once per round.
+
+    Everything is derived from the session id (quiz kind, role, allowed
+    characters and a random seed), so any worker process can rebuild a
+    session it hasn't seen, and question n is the same however often, and
+    wherever, it is asked for.
+    """
+    __slots__ = ("session_id", "kind", "role", "seed", "catalog", "pool", "characters", "decks", "expires_at")
+
+    def __init__(self, session_id, kind, role, seed, allowed, catalog):
+        self.session_id = session_id
+        self.kind = kind
+        self.role = role
+        self.seed = seed
+        self.catalog = catalog
+        roles = ("killer", "survivor") if role == "any" else (role,)
+        self.characters = {r: catalog.character_pool(r, allowed.get(r)) for r in roles}
+        if kind == "perk":
+            # Perk questions show a character of the perk's role, so that role needs one
+            self.pool = _concat_pools(catalog.perks(r) for r in roles if self.characters[r])
         else:
-            c.execute("SELECT id, name FROM survivors ORDER BY RANDOM() LIMIT 1")
-
-        survivor = c.fetchone()
-        if not survivor:
-            conn.close()
-            return api_random_perks()
-
-        _, survivor_name = survivor
-        result["survivor"] = {"name": survivor_name}
-
-        c.execute("""
-            SELECT name, description, icon
-            FROM survivor_perks
-            ORDER BY RANDOM() LIMIT 1
-        """)
-        p = c.fetchone()
-        if not p:
-            conn.close()
-            return api_random_perks()
-
-        chosen_perk = {"name": p[0], "description": p[1], "icon": p[2]}
-        result["chosen_perk"] = chosen_perk
-
-        c.execute("""
-            SELECT name, description, icon
-            FROM survivor_perks
-            WHERE name != ?
-            ORDER BY RANDOM() LIMIT 3
-        """, (chosen_perk["name"],))
-        false_perks = [{"name": r[0], "description": r[1], "icon": r[2]} for r in c.fetchall()]
-
-        options = false_perks + [chosen_perk]
-        options = [dict(t) for t in {tuple(d.items()) for d in options}]
-        shuffle(options)
-        result["perk_options"] = options
-
+            owners = catalog.addon_owner_pool(role, ADDON_QUESTION_MIN_ADDONS, allowed.get(role))
+            self.pool = _concat_pools(catalog.addon_pool(role, owner.id) for owner in owners)
+        self.decks = {}
+
+    def deck(self, round_number):
+        """Return the question order of a round, never starting with the previous round's last question."""
+        deck = self.decks.get(round_number)
+        if deck is None:
+            deck = list(range(len(self.pool)))
+            Random(f"{self.seed}:{round_number}").shuffle(deck)
+            if round_number > 0 and len(deck) > 1 and deck[0] == self._round_end(round_number - 1):
+                deck[0], deck[1] = deck[1], deck[0]
+            # Only the rounds around the one being played are kept
+            self.decks = {r: d for r, d in self.decks.items() if abs(r - round_number) <= 1}
+            self.decks[round_number] = deck
+        return deck
+
+    def _round_end(self, round_number):
+        """Return the last question of a round without dealing the rounds before it.
+
+        deck() only ever swaps the first two questions, so with three or more
+        a round ends like its plain shuffle does. With two, every round ends
+        with the question round 0 ends with.
+        """
+        if len(self.pool) == 2:
+            round_number = 0
+        deck = list(range(len(self.pool)))
+        Random(f"{self.seed}:{round_number}").shuffle(deck)
+        return deck[-1]
+
+    def question(self, index):
+        size = len(self.pool)
+        round_number, position = divmod(index, size)
+        record = self.pool[self.deck(round_number)[position]]
+        rng = Random(f"{self.seed}:q{index}")
+        result = {"session_id": self.session_id, "index": index, "size": size, "round": round_number}
+        if self.kind == "perk":
+            characters = self.characters[record.role]
+            character = characters[rng.randrange(len(characters))]
+            if record.role == "killer":
+                result["killer"] = {"name": character.name, "icon": character.icon}
+            else:
+                result["survivor"] = {"name": character.name}
+            options = self.catalog.perks(record.role)
+            key = "perk"
+        else:
+            if self.role == "killer":
+                killer = self.catalog.killers_by_id[record.owner_id]
+                result["killer"] = {"name": killer.name, "icon": killer.icon}
+            else:
+                item = self.catalog.items_by_id[record.owner_id]
+                result["item"] = {"name": item.name, "icon": item.icon}
+            options = self.catalog.addon_pool(self.role, record.owner_id)
+            key = "addon"
+        # Draw one extra in case the answer itself is drawn
+        wrong = [o for o in sample_distinct(options, QUIZ_OPTIONS, rng) if o is not record][:QUIZ_OPTIONS - 1]
+        chosen = _option_json(record)
+        options = [_option_json(o) for o in wrong] + [chosen]
+        rng.shuffle(options)
+        result[f"chosen_{key}"] = chosen
+        result[f"{key}_options"] = options
+        return result
+
+# The (kind, role) pairs a quiz can be made of
+QUIZ_KINDS = {
+    ("perk", "killer"), ("perk", "survivor"), ("perk", "any"),
+    ("addon", "killer"), ("addon", "survivor"),
+}
+_quiz_sessions = OrderedDict()
+_quiz_sessions_lock = threading.Lock()
+
+def _quiz_session_id(kind, role, seed, allowed_ids):
+    return f"{kind}-{role}-{seed:016x}-{'.'.join(allowed_ids)}"
+
+def _parse_quiz_session_id(session_id, catalog):
+    """Return (kind, role, seed, allowed names per role), or None if the id is malformed."""
+    parts = session_id.split("-", 3)
+    if len(parts) != 4 or (parts[0], parts[1]) not in QUIZ_KINDS:
+        return None
+    try:
+        seed = int(parts[2], 16)
+    except ValueError:
+        return None
+    allowed = {}
+    for ref in filter(None, parts[3].split(".")):
+        role, ids = ("killer", catalog.killers_by_id) if ref[0] == "k" else ("survivor", catalog.survivors_by_id)
+        if not ref[1:].isdigit() or int(ref[1:]) not in ids:
+            return None
+        allowed.setdefault(role, []).append(ids[int(ref[1:])].name)
+    return parts[0], parts[1], seed, allowed
+
+def get_quiz_session(session_id):
+    """Return the session for session_id, rebuilding it if this process doesn't hold it."""
+    now = time.monotonic()
+    with _quiz_sessions_lock:
+        # Entries are in least recently used order, so expired ones are at the front
+        while _quiz_sessions and next(iter(_quiz_sessions.values())).expires_at <= now:
+            _quiz_sessions.popitem(last=False)
+        session = _quiz_sessions.get(session_id)
+        if session is not None:
+            _quiz_sessions.move_to_end(session_id)
+            session.expires_at = now + QUIZ_SESSION_TTL
+            return session
+
+    catalog = get_catalog()
+    parsed = _parse_quiz_session_id(session_id, catalog)
+    if parsed is None:
+        return None
+    kind, role, seed, allowed = parsed
+    session = QuizSession(session_id, kind, role, seed, allowed, catalog)
+    session.expires_at = now + QUIZ_SESSION_TTL
+    with _quiz_sessions_lock:
+        _quiz_sessions[session_id] = session
+        while len(_quiz_sessions) > QUIZ_SESSION_MAX:
+            _quiz_sessions.popitem(last=False)
+    return session
+
+def create_quiz_session(kind, role, allowed=None):
+    """Create a quiz session and return it, or None if none of the filters match a question."""
+    catalog = get_catalog()
+    allowed_ids = []
+    if allowed:
+        names = dict.fromkeys(allowed)
+        allowed_ids += [f"k{k.id}" for k in catalog.killers if k.name in names]
+        allowed_ids += [f"s{s.id}" for s in catalog.survivors if s.name in names]
+        if not allowed_ids:
+            return None
+    session = get_quiz_session(_quiz_session_id(kind, role, getrandbits(64), allowed_ids))
+    if not session.pool:
+        return None
+    return session
+
+@app.route("/api/quiz", methods=["POST"])
+def api_quiz_create():
+    """Start a quiz session: {"kind": "perk" or "addon", "role": ..., "allowed": [names]}."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind", "perk")
+    role = data.get("role", "any")
+    if (kind, role) not in QUIZ_KINDS:
+        return jsonify({"error": "Invalid quiz kind or role"}), 400
+    if not _is_string_list(data.get("allowed")):
+        return jsonify({"error": "Allowed must be a list of character names"}), 400
+    session = create_quiz_session(kind, role, data.get("allowed"))
+    if session is None:
+        return jsonify({"error": "No questions match these filters"}), 409
+    return jsonify({
+        "session_id": session.session_id,
+        "kind": kind,
+        "role": role,
+        "size": len(session.pool),
+        "question_url": f"/api/quiz/{session.session_id}/0",
+    }), 201
+
+@app.route("/api/quiz/<session_id>/<int:index>")
+def api_quiz_question(session_id, index):
+    """Return question number index of a session; each round of the deck asks every question once."""
+    session = get_quiz_session(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown quiz session."}), 404
+    if not session.pool:
+        return jsonify({"error": "No questions match these filters"}), 409
+    if index > QUIZ_MAX_INDEX:
+        return jsonify({"error": f"The question number must be at most {QUIZ_MAX_INDEX}"}), 400
+    return jsonify(session.question(index))
+
+def _all_perks_payload(catalog, role):
+    if role in ("killer", "survivor"):
+        perks = sorted(catalog.perks(role), key=_owner_sort_key)
     else:
-        return jsonify({"error": "Invalid role"}), 400
-
-    conn.close()
-    return jsonify(result)
-
+        perks = catalog.killer_perks + catalog.survivor_perks
+    perks = [
+        {"name": p.name, "description": p.description, "icon": p.icon, "owner": p.owner, "role": p.role}
+        for p in perks
+    ]
+    return {"perks": perks}
 
 @app.route("/api/all_perks")
 def api_all_perks():
     role = request.args.get("role", "killer")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    if role == "killer":
-        c.execute("""
-            SELECT kp.name, kp.description, kp.icon, k.name as owner
-            FROM killer_perks kp
-            LEFT JOIN killers k ON kp.killer_id = k.id
-            ORDER BY k.name, kp.name
-        """)
-        perks = [
-            {"name": row[0], "description": row[1], "icon": row[2], "owner": row[3], "role": "killer"}
-            for row in c.fetchall()
-        ]
-
-    elif role == "survivor":
-        c.execute("""
-            SELECT sp.name, sp.description, sp.icon, s.name as owner
-            FROM survivor_perks sp
-            LEFT JOIN survivors s ON sp.survivor_id = s.id
-            ORDER BY s.name, sp.name
-        """)
-        perks = [
-            {"name": row[0], "description": row[1], "icon": row[2], "owner": row[3], "role": "survivor"}
-            for row in c.fetchall()
-        ]
-
-    else:
-        c.execute("""
-            SELECT kp.name, kp.description, kp.icon, k.name AS owner, 'killer' AS role
-            FROM killer_perks kp
-            LEFT JOIN killers k ON kp.killer_id = k.id
+    # Every role other than killer or survivor returns the same list
+    if role not in ("killer", "survivor"):
+        role = "any"
+    return cached_json_response(("all_perks", role), lambda catalog: _all_perks_payload(catalog, role))
+
+def warm_cached_responses(catalog):
+    """Build every response that cached_json_response serves from catalog.
+
+    Serve mode calls this before forking, so the workers share the bodies
+    instead of each serializing and compressing its own copy.
+    """
+    catalog.cached_response("all_addons", _all_addons_payload)
+    for role in ("killer", "survivor", "any"):
+        catalog.cached_response(("all_perks", role), lambda catalog, role=role: _all_perks_payload(catalog, role))
+
+@app.route("/icons/<path:filename>")
+def icons(filename):
+    """Serve mirrored icons. File names are content hashes, so they never change.
+
+    With ?size=N (one of ICON_THUMB_SIZES), the icon's thumbnail of that size is
+    served instead: WebP to clients that accept it, PNG to the rest. Icons
+    without thumbnails (made without Pillow) are served as they are.
+    """
+    size = request.args.get("size")
+    if size is not None:
+        if not size.isdigit() or int(size) not in ICON_THUMB_SIZES:
+            return jsonify({"error": f"size must be one of {', '.join(map(str, ICON_THUMB_SIZES))}"}), 400
+        ext = ".webp" if request.accept_mimetypes["image/webp"] else ".png"
+        thumb_name = f"{filename.split('.')[0]}-{size}{ext}"
+        if "/" not in filename and os.path.exists(os.path.join(_icon_files_dir(), thumb_name)):
+            filename = thumb_name
+    response = send_from_directory(os.path.abspath(_icon_files_dir()), filename, max_age=ICON_MAX_AGE)
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    if size is not None:
+        response.vary.add("Accept")
+    return response
+
+@app.route("/api/icon_sprites/<role>")
+def api_icon_sprites(role):
+    """Return the perk sprite sheet URL for a role and each perk's offset in it."""
+    sprites = _load_icon_index().get("sprites", {}).get(role)
+    if not sprites:
+        return jsonify({"error": "No sprite sheet for this role"}), 404
+    return jsonify({
+        # Built for the address the client used, which may be a proxy's or another host's
+        "sheet": url_for("icons", filename=sprites["sheet"], _external=True),
+        "size": sprites["size"],
+        "icons": sprites["icons"],
+    })
+
+_search_vocab = (None, {})
+_search_vocab_lock = threading.Lock()
+
+def _search_connection():
+    """Return this request's read connection, closed when the request ends."""
+    if "search_conn" not in g:
+        g.search_conn = connect_database(DB_PATH)
+    return g.search_conn
+
+@app.teardown_appcontext
+def _close_search_connection(exc):
+    conn = g.pop("search_conn", None)
+    if conn is not None:
+        conn.close()
 
-            UNION ALL
+def _search_prefixes(conn):
+    """Return the index vocabulary grouped by first letter, loaded once per generation."""
+    global _search_vocab
+    generation = get_db_generation()
+    if _search_vocab[0] != generation:
+        with _search_vocab_lock:
+            if _search_vocab[0] != generation:
+                vocab = {}
+                for (term,) in conn.execute("SELECT term FROM search_terms"):
+                    vocab.setdefault(term[0], []).append(term)
+                _search_vocab = (generation, vocab)
+    return _search_vocab[1]
+
+def _search_words(query):
+    # Fold the query the way the index's unicode61 tokenizer folds the text
+    folded = unicodedata.normalize("NFKD", query.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return re.findall(r"\w+", folded)
+
+def build_search_match(conn, query, fields=("name", "owner", "body")):
+    """Return (FTS5 MATCH expression, corrections) for a user's search query.
+
+    Every word must match as a prefix. A word that no indexed word starts with
+    is replaced by the closest word prefixes in the index, which are reported
+    in corrections. Returns (None, corrections) if nothing can match.
+    """
+    vocab = _search_prefixes(conn)
+    clauses, corrections = [], {}
+    for word in _search_words(query):
+        terms = vocab.get(word[0], ())
+        alternatives = [word]
+        if len(word) >= SEARCH_TYPO_MIN_LENGTH and not any(term.startswith(word) for term in terms):
+            prefixes = {term[:len(word)] for term in terms if len(term) >= len(word) - 1}
+            alternatives = corrections[word] = difflib.get_close_matches(word, prefixes, n=3, cutoff=0.75)
+            if not alternatives:
+                return None, corrections
+        clauses.append("(" + " OR ".join(f'"{alternative}"*' for alternative in alternatives) + ")")
+    if not clauses:
+        return None, corrections
+    return "{" + " ".join(fields) + "} : (" + " AND ".join(clauses) + ")", corrections
+
+@app.route("/api/search")
+def api_search():
+    """Ranked full-text search over perks, add-ons, items and offerings.
+
+    Query parameters: q, kind (perk, addon, item or offering), role (killer or
+    survivor), owner, fields (all, or name to skip descriptions), limit, offset.
+    A result named exactly q comes first; more is true if another page follows.
+    """
+    args = request.args
+    query = args.get("q", "").strip()
+    kind = args.get("kind")
+    role = args.get("role")
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    if kind not in (None, "perk", "addon", "item", "offering"):
+        return jsonify({"error": "kind must be perk, addon, item or offering"}), 400
+    if role not in (None, "any", "killer", "survivor"):
+        return jsonify({"error": "role must be killer, survivor or any"}), 400
+    try:
+        limit = min(max(int(args.get("limit", 20)), 1), SEARCH_MAX_LIMIT)
+        offset = max(int(args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    fields = ("name", "owner") if args.get("fields") == "name" else ("name", "owner", "body")
 
-            SELECT sp.name, sp.description, sp.icon, s.name AS owner, 'survivor' AS role
-            FROM survivor_perks sp
-            LEFT JOIN survivors s ON sp.survivor_id = s.id
+    # Connecting would create an empty database file while the first build runs
+    if not os.path.exists(DB_PATH):
+        return jsonify({"error": "Search is not available until the database is built"}), 503
+    conn = _search_connection()
+    if not has_search_index(conn):
+        return jsonify({"error": "Search is not available"}), 503
+    match, corrections = build_search_match(conn, query, fields)
+    result = {"results": [], "more": False, "limit": limit, "offset": offset, "corrections": corrections}
+    if match is None:
+        return jsonify(result)
+
+    where, params = ["search_index MATCH ?"], [match]
+    if kind:
+        where.append("kind = ?")
+        params.append(kind)
+    if role in ("killer", "survivor"):
+        where.append("role IN (?, 'all')")
+        params.append(role)
+    if args.get("owner"):
+        where.append("owner = ? COLLATE NOCASE")
+        params.append(args["owner"])
+    where = " AND ".join(where)
+    # One row past the page tells whether another follows, without counting every match
+    rows = conn.execute(f"""
+        SELECT kind, role, name, owner, icon, description FROM search_index
+        WHERE {where}
+        ORDER BY name = ? COLLATE NOCASE DESC, bm25(search_index, 10.0, 5.0, 1.0)
+        LIMIT ? OFFSET ?
+    """, (*params, query, limit + 1, offset)).fetchall()
+    result["more"] = len(rows) > limit
+    result["results"] = [
+        {"kind": kind, "role": role, "name": name, "owner": owner, "icon": icon, "description": description}
+        for kind, role, name, owner, icon, description in rows[:limit]
+    ]
+    return jsonify(result)
 
-            ORDER BY role;
-        """)
-        perks = [
-            {"name": row[0], "description": row[1], "icon": row[2], "owner": row[3], "role": row[4]}
-            for row in c.fetchall()
-        ]
+def start_database_build():
+    """Build the database in a separate `rebuild` process and return it.
+
+    Running the scrape in its own process keeps the scraper, and the
+    connections it pools, out of the serving processes, which switch to the
+    new database once it is swapped in. If this process replays a fixture
+    archive, the build replays it too.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "rebuild", "--if-missing"]
+    if OFFLINE_ICONS:
+        command.append("--offline-icons")
+    scraper = sys.modules.get("dbdscraper")
+    if scraper is not None and scraper._fixture is not None and scraper._fixture["mode"] == "replay":
+        command += ["--replay", scraper._fixture["path"]]
+    return subprocess.Popen(command)
+
+def prepare_database():
+    """Migrate the database in place and load the catalog, or build the database if it is missing.
+
+    Without a database, the bundled catalog is served while the database is
+    built in the background (see start_database_build), so the server can
+    accept requests at once, and the build process is returned for the caller
+    to wait for. Only when there is no bundled catalog either is the database
+    built before this returns.
+    """
+    if not os.path.exists(DB_PATH):
+        if os.path.exists(BUNDLED_CATALOG_PATH):
+            logging.info("Database not found, serving the bundled catalog while it is built...")
+            build = start_database_build()
+            reload_catalog()
+            return build
+        logging.info("Database not found, initializing...")
+        if start_database_build().wait() != 0:
+            raise RuntimeError("Building the database failed")
+    else:
+        conn = connect_database(DB_PATH)
+        try:
+            migrate_database(conn)
+            # Databases built while the live file used WAL are switched back,
+            # which folds in and deletes their -wal and -shm files
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+    # Rewrite the snapshot, in case the database was replaced by hand
+    write_catalog_snapshot(get_db_generation())
+    reload_catalog()
+    return None
+
+def _reap_in_background(build):
+    """Wait for a background database build in a thread, so it is not left a zombie."""
+    def wait():
+        if build.wait() != 0:
+            logging.error(f"Building the database failed with status {build.returncode}")
+    threading.Thread(target=wait, name="database-build", daemon=True).start()
+
+def bundle_catalog(path=BUNDLED_CATALOG_PATH):
+    """Copy the current database's catalog snapshot to path, to be shipped with the code."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Read from the file, as a background build may have just replaced it
+    shutil.copyfile(write_catalog_snapshot(read_db_generation()), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def _serve_worker(sock, host, port):
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, workers=None):
+    """Serve the API from several pre-forked worker processes, without the debug reloader.
+
+    The listening socket is bound, the catalog loaded and its cached responses
+    built before the workers are forked, so they all accept on the same port
+    and share the catalog's memory. A worker that dies is replaced, after a
+    growing delay if it keeps dying right after it starts. Without os.fork (on
+    Windows) the API is served from a single threaded process.
+    """
+    workers = workers or os.cpu_count() or 1
+    build = prepare_database()
+    if workers == 1 or not hasattr(os, "fork"):
+        if build is not None:
+            _reap_in_background(build)
+        logging.info(f"Serving on http://{host}:{port} from one process")
+        make_server(host, port, app, threaded=True).serve_forever()
+        return
 
-    conn.close()
-    return jsonify({"perks": perks})
+    warm_cached_responses(get_catalog())
+    # Keep the collector in the workers from writing to, and so copying, every
+    # object they inherit
+    gc.freeze()
+
+    sock = socket.create_server((host, port), backlog=SERVE_BACKLOG)
+    # Every worker counts its requests in its own slot of the shared metrics table
+    metrics = init_metrics(workers)
+    children = {}
+    started = {}
+    fast_failures = dict.fromkeys(range(workers), 0)
+
+    def spawn(slot):
+        # Hold off SIGTERM until the child has dropped the master's handler
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+            metrics.slot = slot % metrics.slots
+            try:
+                _serve_worker(sock, host, port)
+            finally:
+                os._exit(0)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+        children[pid] = slot
+        started[slot] = time.monotonic()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    for slot in range(workers):
+        spawn(slot)
+    logging.info(f"Serving on http://{host}:{port} from {workers} worker processes")
+    try:
+        while True:
+            pid, status = os.wait()
+            if pid not in children:
+                # The database build started by prepare_database, not a worker
+                if build is not None and pid == build.pid and status != 0:
+                    logging.error(f"Building the database failed with status {status}")
+                continue
+            slot = children.pop(pid)
+            if time.monotonic() - started[slot] >= SERVE_FAST_FAILURE:
+                fast_failures[slot] = 0
+                logging.warning(f"Worker {pid} exited with status {status}, starting a new one")
+                spawn(slot)
+                continue
+            fast_failures[slot] += 1
+            if fast_failures[slot] >= SERVE_MAX_FAST_FAILURES:
+                raise RuntimeError(f"Workers exited right after starting {fast_failures[slot]} times in a row")
+            delay = min(2 ** (fast_failures[slot] - 1), SERVE_RESPAWN_MAX_DELAY)
+            logging.warning(f"Worker {pid} exited with status {status} right after starting, "
+                            f"starting a new one in {delay} seconds")
+            time.sleep(delay)
+            spawn(slot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
 
 if __name__ == "__main__":
-    if not os.path.exists(DB_PATH):
-        logging.info("Database not found, initializing...")
-        init_database()
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Dead by Daylight tools backend.")
+    parser.add_argument("mode", nargs="?", choices=("dev", "serve", "rebuild", "bundle"), default="dev",
+                        help="dev: Flask's debug server (default); serve: several worker processes; "
+                             "rebuild: scrape the wiki into a new database and exit; "
+                             f"bundle: write the database's catalog to {os.path.basename(BUNDLED_CATALOG_PATH)}")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, help="worker processes in serve mode (default: one per CPU)")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument("--record", metavar="ARCHIVE", help="rebuild mode: save every fetched page to a fixture archive")
+    fixtures.add_argument("--replay", metavar="ARCHIVE", help="scrape from a recorded fixture archive instead of the wiki")
+    parser.add_argument("--profile", action="store_true", help=f"profile rebuilds into {PROFILE_DIR}/ (like DBD_PROFILE_REBUILD=1)")
+    parser.add_argument("--if-missing", action="store_true", help="rebuild mode: do nothing if the database already exists")
+    parser.add_argument("--offline-icons", action="store_true",
+                        help="store the mirrored icons' paths in rebuilds instead of the wiki's URLs (like DBD_OFFLINE_ICONS=1)")
+    args = parser.parse_args()
+    # A background build appends to the log of the server that started it
+    setup_logging(archive_old=not args.if_missing)
+    if args.profile:
+        PROFILE_REBUILDS = True
+    if args.offline_icons:
+        OFFLINE_ICONS = True
+    if args.record and args.mode != "rebuild":
+        parser.error("--record is only supported in rebuild mode")
+    if args.record or args.replay:
+        import dbdscraper
+        if args.record:
+            dbdscraper.use_fixture_archive(args.record, "record")
+        else:
+            dbdscraper.use_fixture_archive(args.replay, "replay")
+    if args.mode == "rebuild":
+        if args.if_missing and os.path.exists(DB_PATH):
+            sys.exit()
+        init_database(if_missing=args.if_missing)
+        if args.record:
+            print(f"Recorded {dbdscraper.save_fixture_archive()} responses to {args.record}")
+    elif args.mode == "bundle":
+        # With an old bundle but no database, the database is built in the
+        # background; the new bundle is made from it once it is done
+        build = prepare_database()
+        if build is not None and build.wait() != 0:
+            sys.exit("Building the database failed")
+        print("Wrote the catalog to", bundle_catalog())
+    elif args.mode == "serve":
+        serve(args.host, args.port, args.workers)
+    else:
+        # The reloader runs this module twice: in a watcher process, and in the
+        # server process it starts (and restarts on changes). Only the server
+        # prepares the database, so a missing one is built once.
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            build = prepare_database()
+            if build is not None:
+                _reap_in_background(build)
+        app.run(debug=True, host=args.host, port=args.port)
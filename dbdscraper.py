@@ -0,0 +1,1053 @@
+"""Wiki scraper for dbdmanager.
+
+Everything that downloads and parses the DbD Wiki lives here, so that serving
+the API never imports requests or BeautifulSoup; dbdmanager imports this module
+only when it rebuilds the database. scrape_all() returns the scraped rows of
+every table, in the shape dbdmanager.write_scraped_data() expects.
+"""
+import requests
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from bs4.formatter import HTMLFormatter
+import logging
+import os
+from random import uniform
+import unicodedata
+import hashlib
+import importlib.util
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, unquote
+import time
+import zipfile
+
+WIKI_BASE = "https://deadbydaylight.fandom.com"
+PAGE_CACHE_DIR = ".page_cache"
+# Number of scrapers run at once during a rebuild, and how many requests may be
+# in flight to a single host at any time.
+SCRAPE_WORKERS = 6
+SCRAPE_MAX_PER_HOST = 4
+# Shared scraping client: (connect, read) timeout in seconds, how often a failed
+# request is retried, the backoff cap between retries, and the minimum gap
+# between two requests to the same host.
+HTTP_TIMEOUT = (10, 30)
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 30
+HTTP_MIN_HOST_INTERVAL = 0.05
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "DbD-Tools/1.0 (+https://github.com/BubkisLord/DbD-Tools)"
+# BeautifulSoup backend used for wiki pages: "lxml" (faster) if it is installed,
+# otherwise "html.parser". With TARGETED_PARSING, only the parts of each page that
+# the scrapers read are parsed (see PAGE_STRAINERS and tools/parser_parity.py).
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+TARGETED_PARSING = True
+# Scraper traffic can be recorded into, or replayed from, a fixture archive (see
+# use_fixture_archive). Replay refuses archives of another FIXTURE_VERSION.
+FIXTURE_VERSION = 1
+FIXTURE_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_http_session = None
+_http_lock = threading.Lock()
+_host_semaphores = {}
+_host_next_request = {}
+_http_metrics = {}
+
+def _get_http_session():
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            # Keep enough pooled keep-alive connections for every request allowed in flight per host
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SCRAPE_MAX_PER_HOST)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+            _http_session = session
+    return _http_session
+
+def _reset_http_session():
+    """Give a forked child its own client rather than the parent's pooled connections."""
+    global _http_session, _http_lock
+    _http_session = None
+    _http_lock = threading.Lock()
+    _host_semaphores.clear()
+    _host_next_request.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_http_session)
+
+def _host_semaphore(url):
+    host = urlsplit(url).netloc
+    with _http_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(SCRAPE_MAX_PER_HOST)
+            _host_semaphores[host] = semaphore
+    return semaphore
+
+def _wait_for_host(url):
+    """Space out requests to the same host by at least HTTP_MIN_HOST_INTERVAL."""
+    host = urlsplit(url).netloc
+    with _http_lock:
+        now = time.monotonic()
+        start = max(now, _host_next_request.get(host, now))
+        _host_next_request[host] = start + HTTP_MIN_HOST_INTERVAL
+    if start > now:
+        time.sleep(start - now)
+
+def _retry_delay(attempt, response):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), HTTP_BACKOFF_MAX)
+    # Exponential backoff with full jitter
+    return uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+def _record_http_metrics(url, latency, size, retries, status):
+    with _http_lock:
+        metrics = _http_metrics.setdefault(url, {"requests": 0, "retries": 0, "bytes": 0, "latency": 0.0, "status": None})
+        metrics["requests"] += 1
+        metrics["retries"] += retries
+        metrics["bytes"] += size
+        metrics["latency"] += latency
+        metrics["status"] = status
+
+def get_http_metrics():
+    """Return {url: requests, retries, bytes, total latency and last status} for every URL fetched."""
+    with _http_lock:
+        return {url: dict(metrics) for url, metrics in _http_metrics.items()}
+
+def reset_http_metrics():
+    with _http_lock:
+        _http_metrics.clear()
+
+# The fixture archive being recorded or replayed, if any:
+# {"mode": "record" or "replay", "path": ..., "entries": {url: entry}, "bodies": {name: bytes}}
+_fixture = None
+_fixture_lock = threading.Lock()
+
+def _fixture_url(url, params):
+    return requests.Request("GET", url, params=params).prepare().url
+
+def use_fixture_archive(path, mode):
+    """Record every response http_get receives into path, or replay them from it.
+
+    mode is "record", "replay", or None to go back to the network. Recorded
+    responses are kept in memory until save_fixture_archive(). Returns the
+    manifest of a replayed archive. Raises ValueError if it was written by
+    another FIXTURE_VERSION.
+    """
+    global _fixture
+    if mode is None:
+        _fixture = None
+        return None
+    manifest = None
+    fixture = {"mode": mode, "path": path, "entries": {}, "bodies": {}}
+    if mode == "replay":
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+            if manifest.get("version") != FIXTURE_VERSION:
+                raise ValueError(f"{path} is a version {manifest.get('version')} fixture archive, expected {FIXTURE_VERSION}")
+            fixture["entries"] = manifest["entries"]
+            for entry in manifest["entries"].values():
+                fixture["bodies"][entry["body"]] = archive.read(entry["body"])
+    elif mode != "record":
+        raise ValueError(f"Unknown fixture mode {mode!r}")
+    _fixture = fixture
+    return manifest
+
+def save_fixture_archive():
+    """Write the responses recorded since use_fixture_archive(path, "record") to path."""
+    with _fixture_lock:
+        entries = dict(_fixture["entries"])
+        bodies = dict(_fixture["bodies"])
+    path = _fixture["path"]
+    manifest = {
+        "version": FIXTURE_VERSION,
+        "recorded": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "wiki_base": WIKI_BASE,
+        "entries": entries,
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=1, sort_keys=True))
+        for name in sorted(bodies):
+            archive.writestr(name, bodies[name])
+    os.replace(tmp_path, path)
+    logging.info(f"Saved {len(entries)} responses to fixture archive {path}")
+    return len(entries)
+
+def _record_fixture(url, params, response):
+    body = response.content
+    name = "bodies/" + hashlib.sha256(body).hexdigest()
+    entry = {
+        "status": response.status_code,
+        "encoding": response.encoding,
+        "headers": {key: response.headers[key] for key in FIXTURE_HEADERS if key in response.headers},
+        "body": name,
+    }
+    with _fixture_lock:
+        _fixture["entries"][_fixture_url(url, params)] = entry
+        _fixture["bodies"][name] = body
+
+def _replay_fixture(url, params):
+    """Answer a request from the replayed fixture archive, as if it came from the network."""
+    full_url = _fixture_url(url, params)
+    entry = _fixture["entries"].get(full_url)
+    if entry is None:
+        raise requests.ConnectionError(f"{full_url} is not in the fixture archive {_fixture['path']}")
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.headers.update(entry["headers"])
+    response.encoding = entry["encoding"]
+    response._content = _fixture["bodies"][entry["body"]]
+    response.url = full_url
+    _record_http_metrics(url, 0.0, len(response._content), 0, response.status_code)
+    return response
+
+def http_get(url, headers=None, params=None):
+    """GET url through the shared scraping session.
+
+    Requests are limited per host (SCRAPE_MAX_PER_HOST in flight, spaced by
+    HTTP_MIN_HOST_INTERVAL), time out after HTTP_TIMEOUT, and are retried with
+    exponential backoff on connection errors and 429/5xx responses. Raises
+    requests.RequestException once the retries are used up.
+
+    While a fixture archive is in use (see use_fixture_archive), responses are
+    recorded into it, or answered from it without touching the network.
+    """
+    if _fixture is not None:
+        if _fixture["mode"] == "replay":
+            return _replay_fixture(url, params)
+        # A revalidated 304 has no body to record, so recordings always fetch in full
+        headers = {key: value for key, value in (headers or {}).items()
+                   if key not in ("If-None-Match", "If-Modified-Since")}
+    session = _get_http_session()
+    started = time.perf_counter()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        response = None
+        try:
+            with _host_semaphore(url):
+                _wait_for_host(url)
+                response = session.get(url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_RETRIES:
+                _record_http_metrics(url, time.perf_counter() - started, len(response.content), attempt, response.status_code)
+                if _fixture is not None:
+                    _record_fixture(url, params, response)
+                return response
+            logging.warning(f"HTTP {response.status_code} from {url}, retrying...")
+        except requests.RequestException as e:
+            if attempt == HTTP_MAX_RETRIES:
+                _record_http_metrics(url, time.perf_counter() - started, 0, attempt, None)
+                raise
+            logging.warning(f"Request to {url} failed ({e}), retrying...")
+        time.sleep(_retry_delay(attempt, response))
+
+# Parsed pages for the current rebuild, keyed by URL and strainer. Several scrapers read the
+# same wiki page, so each page is only downloaded and parsed once per rebuild.
+_page_cache = {}
+_page_locks = {}
+_page_cache_lock = threading.Lock()
+_page_index_lock = threading.Lock()
+# The page cache's index as (directory, {url: entry}), read once and written
+# back by save_page_index instead of on every fetch
+_page_index = (None, None)
+_page_index_dirty = False
+
+def reset_page_cache():
+    with _page_cache_lock:
+        _page_cache.clear()
+        _page_locks.clear()
+
+def _page_index_path():
+    return os.path.join(PAGE_CACHE_DIR, "index.json")
+
+def _load_page_index():
+    try:
+        with open(_page_index_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_page_index(index):
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    tmp_path = _page_index_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, _page_index_path())
+
+def _page_index_entries():
+    """Return the in-memory page index, reading it on first use. Call with _page_index_lock held."""
+    global _page_index
+    if _page_index[0] != PAGE_CACHE_DIR:
+        _page_index = (PAGE_CACHE_DIR, _load_page_index())
+    return _page_index[1]
+
+def save_page_index():
+    """Write the page index changed by fetch_page, and delete the bodies it no longer refers to.
+
+    The index is read again from disk by the next fetch_page.
+    """
+    global _page_index, _page_index_dirty
+    with _page_index_lock:
+        if _page_index[0] != PAGE_CACHE_DIR:
+            return
+        index = _page_index[1]
+        try:
+            if _page_index_dirty:
+                _save_page_index(index)
+            # A page whose content changed leaves its old body behind
+            referenced = {entry.get("sha256") for entry in index.values()}
+            for name in os.listdir(PAGE_CACHE_DIR):
+                sha, ext = os.path.splitext(name)
+                if ext == ".html" and sha not in referenced:
+                    os.remove(os.path.join(PAGE_CACHE_DIR, name))
+        except OSError as e:
+            logging.warning(f"Could not write page cache index: {e}")
+        _page_index = (None, None)
+        _page_index_dirty = False
+
+def _read_cached_page(entry):
+    try:
+        with open(os.path.join(PAGE_CACHE_DIR, entry["sha256"] + ".html"), "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, KeyError):
+        return None
+
+def fetch_page(url):
+    """Return the HTML of url, revalidating against the on-disk page cache.
+
+    Page bodies are stored content-addressed (by SHA-256) in PAGE_CACHE_DIR, and
+    the ETag/Last-Modified of each URL is kept in an index so unchanged pages come
+    back as a 304 instead of being downloaded again. The index is kept in memory
+    until save_page_index, which scrape_all calls when it is done. If the page can't be
+    fetched, the cached copy is returned; without one, requests.RequestException
+    is raised (requests.HTTPError for an error response).
+    """
+    with _page_index_lock:
+        entry = _page_index_entries().get(url)
+    cached_text = _read_cached_page(entry) if entry else None
+    headers = {}
+    if cached_text is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        r = http_get(url, headers=headers)
+    except requests.RequestException as e:
+        if cached_text is None:
+            raise
+        logging.warning(f"Could not fetch {url} ({e}), using cached copy.")
+        return cached_text
+    if r.status_code == 304 and cached_text is not None:
+        logging.info(f"Page not modified, using cached copy: {url}")
+        return cached_text
+    if r.status_code != 200:
+        # Never hand an error page to the parsers, where it would read as a
+        # page with nothing on it and empty the tables built from it
+        if cached_text is not None:
+            logging.warning(f"HTTP {r.status_code} from {url}, using cached copy.")
+            return cached_text
+        raise requests.HTTPError(f"HTTP {r.status_code} from {url}", response=r)
+
+    global _page_index_dirty
+    text = r.text
+    sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    body_path = os.path.join(PAGE_CACHE_DIR, sha + ".html")
+    try:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        if not os.path.exists(body_path):
+            tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, body_path)
+    except OSError as e:
+        logging.warning(f"Could not write page cache for {url}: {e}")
+        return text
+    with _page_index_lock:
+        _page_index_entries()[url] = {
+            "sha256": sha,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+        _page_index_dirty = True
+    return text
+
+# The parts of a page each scraper needs. Scrapers that navigate between
+# siblings (h3 -> table) need the whole article body, the others only its tables.
+PAGE_STRAINERS = {
+    "tables": SoupStrainer("table"),
+    "content": SoupStrainer("div", class_="mw-parser-output"),
+    "paragraphs": SoupStrainer("p"),
+}
+
+def parse_html(text, only=None):
+    """Parse text with HTML_PARSER, keeping only the PAGE_STRAINERS[only] subtrees if targeted parsing is on."""
+    strainer = PAGE_STRAINERS[only] if only and TARGETED_PARSING else None
+    return BeautifulSoup(text, HTML_PARSER, parse_only=strainer)
+
+def fetch_soup(url, only=None):
+    """Return the parsed page for url, shared between scrapers until reset_page_cache()."""
+    key = (url, only)
+    with _page_cache_lock:
+        soup = _page_cache.get(key)
+        if soup is not None:
+            return soup
+        lock = _page_locks.setdefault(key, threading.Lock())
+    # Scrapers running in parallel may ask for the same page; only the first one fetches it.
+    with lock:
+        soup = _page_cache.get(key)
+        if soup is None:
+            soup = parse_html(fetch_page(url), only)
+            with _page_cache_lock:
+                _page_cache[key] = soup
+    return soup
+
+def scrape_killers():
+    url = WIKI_BASE + "/wiki/Killers"
+    soup = fetch_soup(url, "tables")
+    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    killers = []
+    if len(tables) > 1:
+        powers_table = tables[0]
+        for row in powers_table.find_all("tr"):
+            for th in row.find_all("th"):
+                a_tags = th.find_all("a", title=True)
+                if len(a_tags) >= 2:
+                    power = a_tags[0].get("title")
+                    name = a_tags[-1].get("title")
+                    if name and name.startswith("The "):
+                        killers.append((name, power, None))
+
+        perks_table = tables[1] if len(tables) > 1 else None
+        if perks_table:
+            rows = perks_table.find_all("tr")[1:]
+            for row in rows:
+                ths = row.find_all("th")
+                tds = row.find_all("td")
+                if len(ths) >= 3 and len(tds) >= 1:
+                    icon_img = ths[0].find("img")
+                    icon = get_icon_url(icon_img)
+                    name_a = ths[1].find("a", title=True)
+                    name = name_a.get_text(strip=True) if name_a else ""
+                    char_a = ths[2].find("a", title=True)
+                    character = ("The " + char_a.get_text(strip=True) if char_a else "").strip()
+                    character_icon = ths[2].find("img")
+                    if character_icon:
+                        character_icon_url = get_icon_url(character_icon)
+                    else:
+                        character_icon_url = None
+                    # Update the killer's icon if not already set
+                    for idx, (k_name, k_power, k_icon) in enumerate(killers):
+                        if k_name == character and not k_icon and character_icon_url:
+                            killers[idx] = (k_name, k_power, character_icon_url)
+                            break
+ 
+                    
+    return killers
+
+def normalize_survivor_name(name):
+    if name == "Troupe":
+        # Special case for "Troupe" which is the 2 characters Aestri Yazar & Baermar Uraz
+        # This is a workaround for the wiki's inconsistent naming.
+        name = "Aestri Yazar & Baermar Uraz"
+
+    # Normalize unicode, remove apostrophes, replace underscores with spaces, strip whitespace
+    name = unicodedata.normalize("NFC", name)
+    name = name.replace("_", " ")
+    name = name.replace("’", "'")  # Replace curly apostrophe with straight
+    name = name.replace("'", "")   # Remove apostrophes
+    name = name.strip()
+    return name
+
+def scrape_survivors():
+    url = WIKI_BASE + "/wiki/Survivors"
+    logging.info(f"Requesting survivors page: {url}")
+    soup = fetch_soup(url, "tables")
+    tables = soup.find_all("table", {"class": "wikitable"})
+    survivor_table = tables[3] if len(tables) > 3 else None
+    survivors = []
+    if survivor_table:
+        rows = survivor_table.find_all("tr")
+        # Find the index of the row with a <th> that contains "SURVIVORS" (case-insensitive, partial match)
+        start_idx = None
+        for idx, row in enumerate(rows):
+            th = row.find("th")
+            if th and "SURVIVOR" in th.get_text(strip=True).upper():
+                start_idx = idx
+                break
+        if start_idx is not None:
+            for row_idx, row in enumerate(rows[start_idx+1:], start=start_idx+1):
+                tds = row.find_all("td")
+                for td_idx, td in enumerate(tds):
+                    for a in td.find_all("a", title=True, recursive=False):
+                        name = a.get("title").strip()
+                        if name and not name.startswith("File:") and not name.lower().startswith("chapter "):
+                            normalized_name = normalize_survivor_name(name)
+                            if normalized_name not in survivors:
+                                survivors.append(normalized_name)
+                                logging.info(f"Found survivor: {normalized_name} (row {row_idx}, td {td_idx})")
+        else:
+            logging.warning("Could not find a header row containing 'SURVIVOR' in survivors table.")
+    else:
+        logging.warning("Survivors table not found on the page. There must be less than 4 tables.")
+    logging.info(f"Total survivors found: {len(survivors)}")
+    return survivors
+
+_HTML_FORMATTER = HTMLFormatter.REGISTRY["minimal"]
+# Cleaned descriptions keyed by a hash of their cell's HTML, so cells read by
+# several scrapers, or by later rebuilds of an unchanged page, are only cleaned
+# once, whichever parser read them.
+CLEAN_CACHE_SIZE = 50000
+_clean_cache = {}
+
+def _render_clean_node(node, out, raw_text=False):
+    """Append the HTML of node to out, dropping <a> tags (but not their children) and href attributes.
+
+    With raw_text, strings are appended as their plain text rather than as
+    escaped HTML, which is how the top level of a <td> cell has always been
+    stored.
+    """
+    fmt = _HTML_FORMATTER
+    if not isinstance(node, Tag):
+        out.append(str(node) if raw_text else node.output_ready(fmt))
+        return
+    if node.name == "a":
+        _render_clean_children(node, out, raw_text)
+        return
+    name = f"{node.prefix}:{node.name}" if node.prefix else node.name
+    attrs = []
+    for key, val in fmt.attributes(node):
+        if key == "href":
+            continue
+        if val is None:
+            attrs.append(key)
+        else:
+            if isinstance(val, (list, tuple)):
+                val = " ".join(val)
+            attrs.append(f"{key}={fmt.quoted_attribute_value(fmt.attribute_value(str(val)))}")
+    attr_string = " " + " ".join(attrs) if attrs else ""
+    if node.is_empty_element:
+        out.append(f"<{name}{attr_string}{fmt.void_element_close_prefix or ''}>")
+    else:
+        out.append(f"<{name}{attr_string}>")
+        _render_clean_children(node, out)
+        out.append(f"</{name}>")
+
+def _render_clean_children(node, out, raw_text=False):
+    for child in node.children:
+        _render_clean_node(child, out, raw_text)
+
+def _cell_cache_key(desc_cell):
+    # Source positions would be simpler, but lxml does not record them
+    return hashlib.sha1(desc_cell.decode().encode("utf-8")).digest()
+
+def clean_description_html(desc_cell):
+    """Return the HTML of a description cell with links unwrapped and hrefs removed.
+
+    For a <td> this is its inner HTML; for other cells (e.g. a <p>) it is the
+    whole element. The cell is serialized in one pass without being re-parsed.
+    """
+    key = _cell_cache_key(desc_cell)
+    if key in _clean_cache:
+        return _clean_cache[key]
+
+    out = []
+    td = desc_cell if desc_cell.name == "td" else desc_cell.find("td")
+    if td is not None:
+        # Return the inner HTML (not the outer <td> tag)
+        _render_clean_children(td, out, raw_text=True)
+    else:
+        _render_clean_node(desc_cell, out)
+    html = "".join(out)
+
+    if len(_clean_cache) >= CLEAN_CACHE_SIZE:
+        _clean_cache.clear()
+    _clean_cache[key] = html
+    return html
+
+def get_icon_url(img_tag):
+    # Prefer data-src, then src, and ensure it's not a data URI
+    if img_tag:
+        url = img_tag.get("data-src") or img_tag.get("src") or ""
+        if url.startswith("data:image"):
+            return ""  # Ignore data URIs
+        # If the URL is relative, prepend the wiki base
+        if url and url.startswith("//"):
+            url = "https:" + url
+        elif url and url.startswith("/"):
+            url = WIKI_BASE + url
+        
+        if "/revision" in url:
+            url = url.split("/revision")[0]  # Remove revision part if present
+        return url
+    return ""
+
+def scrape_killer_perks():
+    url = WIKI_BASE + "/wiki/Killers"
+    soup = fetch_soup(url, "tables")
+    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
+    logging.info(f"Found {len(tables)} tables with 'wikitable' in class")
+    perks = []
+    if len(tables) > 1:
+        table = tables[1]
+        rows = table.find_all("tr")[1:]
+        for row_idx, row in enumerate(rows):
+            ths = row.find_all("th")
+            tds = row.find_all("td")
+            if len(ths) >= 3 and len(tds) >= 1:
+                icon_img = ths[0].find("img")
+                icon = get_icon_url(icon_img)
+                name_a = ths[1].find("a", title=True)
+                name = name_a.get_text(strip=True) if name_a else ""
+                desc_html = clean_description_html(tds[0])
+                char_a = ths[2].find("a", title=True)
+                character = ("The " + char_a.get_text(strip=True) if char_a else "").strip()
+                if "Unable to retrieve the Perk description or unable to display it." in desc_html:
+                    desc_html = "Unable to retrieve the Perk description or unable to display it. This is almost certainly due to the wiki being incomplete. Unfortunately, there is nothing that can be done about this when scraping data."
+                logging.info(f"Row #{row_idx}: name={name}, character={character}")
+                perks.append((icon, name, desc_html, character))
+            else:
+                logging.warning(f"Row #{row_idx} in table #1 does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
+    else:
+        logging.warning("Less than 2 tables found, cannot process killer perks.")
+    return perks
+    
+def scrape_survivor_perks():
+    url = WIKI_BASE + "/wiki/Survivors"
+    soup = fetch_soup(url, "tables")
+    tables = soup.find_all("table", {"class": lambda x: x and "wikitable" in x})
+    logging.info(f"Found {len(tables)} tables with 'wikitable' in class")
+    perks = []
+    if len(tables) > 1:
+        table = tables[1]
+        rows = table.find_all("tr")[1:]
+        for row_idx, row in enumerate(rows):
+            ths = row.find_all("th")
+            tds = row.find_all("td")
+            if len(ths) >= 3 and len(tds) >= 1:
+                icon_img = ths[0].find("img")
+                icon = get_icon_url(icon_img)
+                name_a = ths[1].find("a", title=True)
+                name = name_a.get_text(strip=True) if name_a else ""
+                desc_html = clean_description_html(tds[0])
+                char_a = ths[2].find("a", href=True)
+                if char_a and char_a.has_attr("href"):
+                    href = char_a["href"]
+                    if href.startswith("/wiki/"):
+                        character = href[len("/wiki/"):].replace("_", " ")
+                    else:
+                        character = href.replace("_", " ")
+                else:
+                    character = ""
+                character = normalize_survivor_name(character)
+                logging.info(f"Row #{row_idx}: name={name}, character={character}")
+                perks.append((icon, name, desc_html, character))
+            else:
+                logging.warning(f"Row #{row_idx} in table #1 does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
+    else:
+        logging.warning("Less than 2 tables found, cannot process survivor perks.")
+    return perks
+
+def scrape_survivor_items():
+    url = WIKI_BASE + "/wiki/Add-ons"
+    soup = fetch_soup(url, "content")
+    items = []
+    tabber = soup.find_all("div", {"class": "tabber wds-tabber"})[1]
+    divs = tabber.find_all("div", {"class": "wds-tab__content"})
+    logging.info(f"Found {len(divs)} div elements in survivor items tabber")
+    for div in divs:
+        name = div.find("h3").get_text(strip=True).removesuffix("es").removesuffix("s")
+        icon_img = div.find("figure").find("img")
+        icon = get_icon_url(icon_img)
+        text_blocks = [child for child in div.children if child.name == "p"]
+        cleaned_html = ""
+        for text_block in text_blocks:
+            cleaned_html += clean_description_html(text_block)
+        cleaned_html.strip()
+        # Darn wiki has a note about unavailable addons for the firecrackers.
+        cleaned_html.replace("These Add-ons can be found in the Game code, but are not available to use.", "")
+        items.append((icon, name, cleaned_html))
+    return items
+
+def scrape_survivor_addons():
+    url = WIKI_BASE + "/wiki/Add-ons"
+    soup = fetch_soup(url, "content")
+    addons = []
+    tabber = soup.find_all("div", {"class": "tabber wds-tabber"})[1]
+    divs = tabber.find_all("div", {"class": "wds-tab__content"})
+    for div in divs:
+        item_name = div.find("h3").get_text(strip=True).removesuffix("es").removesuffix("s")
+        table = div.find("table", {"class": "wikitable"})
+        for row_idx, row in enumerate(table.find_all("tr")[1:]):
+            cols = row.find_all(["th", "td"])
+            if len(cols) == 3:
+                icon_img = cols[0].find("img")
+                icon = get_icon_url(icon_img)
+                rarity = "unknown"
+                try:
+                    rarity_div = cols[0].find("div", {"style": "--assembly-image-size: 128px;"})
+                    if rarity_div and rarity_div.get("class"):
+                        class_name = rarity_div.get("class")[-1] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
+                        if class_name:
+                            rarity = class_name.replace("-item-element", "").replace("-", " ")
+                except (AttributeError, IndexError, TypeError) as e:
+                    logging.warning(f"Could not extract rarity for addon in row {row_idx}: {e}. Skipping...")
+                    continue
+                
+                name_a = cols[1].find("a", title=True)
+                name = name_a.get_text(strip=True)
+                desc_html = clean_description_html(cols[2])
+                if cols[2].find("span", {"class": "tooltip borderless"}):
+                    logging.warning(f"Row #{row_idx} in table is retired, not available anymore, or on dbd mobile; skipping...")
+                    continue
+                logging.info(f"Row #{row_idx}: item={item_name}, addon={name}, rarity={rarity}")
+                addons.append((icon, name, item_name, desc_html, rarity))
+            else:
+                logging.warning(f"Row #{row_idx} in table does not have expected structure.")
+    return addons
+
+def scrape_addons(killer_data):
+    url = WIKI_BASE + "/wiki/Add-ons"
+    soup = fetch_soup(url, "content")
+    logging.info(f"Requesting addon page: {url}")
+    addons = []
+    h3s = soup.find_all("h3")
+    for h3 in h3s:
+        table = h3.find_next_sibling("table")
+        if table and "wikitable" in table.get("class", []):
+            power = None
+            prev_figure = h3.find_previous_sibling("figure")
+            if prev_figure:
+                killer_link = prev_figure.find("a", title=True)
+                if killer_link:
+                    power = killer_link["title"]
+            if not power:
+                headline = h3.find("span", class_="mw-headline")
+                power = headline.get_text(strip=True) if headline else "Unknown"
+            for row_idx, row in enumerate(table.find_all("tr")[1:]):
+                ths = row.find_all("th")
+                tds = row.find_all("td")
+                if len(ths) >= 2 and len(tds) >= 1:
+                    icon_img = ths[0].find("img")
+                    icon = get_icon_url(icon_img)
+                    
+                    # Try to extract rarity, but handle failures gracefully
+                    rarity = "unknown"
+                    try:
+                        rarity_div = ths[0].find("div", {"style": "--assembly-image-size: 128px;"})
+                        if rarity_div and rarity_div.get("class"):
+                            class_name = rarity_div.get("class")[-1] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
+                            if class_name:
+                                rarity = class_name.replace("-item-element", "").replace("-", " ")
+                    except (AttributeError, IndexError, TypeError) as e:
+                        logging.warning(f"Could not extract rarity for addon in row {row_idx}: {e}")
+                    
+                    name_a = ths[1].find("a", title=True)
+                    name = name_a.get_text(strip=True) if name_a else ""
+                    desc_html = clean_description_html(tds[0])
+                    # Unfortunately, the wiki has inconsistent naming for Bear Trap vs Bear Traps,
+                    # so we normalize it here.
+                    if power == "Bear Trap":
+                        power = "Bear Traps"
+                    logging.info(f"Row #{row_idx}: power={power}, addon={name}, rarity={rarity}")
+                    addons.append((icon, name, power, desc_html, rarity))
+                else:
+                    logging.warning(f"Row #{row_idx} in table after {power} does not have expected structure (ths: {len(ths)}, tds: {len(tds)})")
+    
+    # Check for missing addons using alternate method
+    for name, power, _ in killer_data:
+        if power not in [addon[2] for addon in addons]:
+            logging.info(f"Addons not found for power '{power}', retrieving using alternate method...")
+            killer_url = WIKI_BASE + "/wiki/" + name.replace(" ", "_")
+            try:
+                killer_soup = fetch_soup(killer_url, "content")
+                found_addons = False
+                
+                for h3 in killer_soup.find_all("h3"):
+                    # Check if h3 has an id attribute or span with id
+                    h3_id = h3.get("id", "")
+                    span_id = ""
+                    span = h3.find("span", class_="mw-headline")
+                    if span:
+                        span_id = span.get("id", "")
+                    
+                    target_id = f"Add-ons_for_{power.replace(' ', '_')}"
+                    if target_id in h3_id or target_id in span_id:
+                        logging.info(f"Found addons for power '{power}' in killer page.")
+                        table = h3.find_next_sibling("table", {"class": "wikitable"})
+                        if not table:
+                            logging.warning(f"No addons table found for power '{power}' in killer page.")
+                            continue
+                        found_addons = True
+                        for row_idx, row in enumerate(table.find_all("tr")[1:]):
+                            cols = row.find_all(["th", "td"])
+                            if len(cols) >= 3:
+                                icon_img = cols[0].find("img")
+                                icon = get_icon_url(icon_img)
+                                
+                                rarity = "unknown"
+                                try:
+                                    rarity_div = cols[0].find("div", {"style": "--assembly-image-size: 128px;"})
+                                    if rarity_div and rarity_div.get("class"):
+                                        class_name = rarity_div.get("class")[0] if isinstance(rarity_div.get("class"), list) else rarity_div.get("class")
+                                        if class_name:
+                                            rarity = class_name.split(" ")[-1].replace("-item-element", "").replace("-", " ")
+                                except (AttributeError, IndexError, TypeError) as e:
+                                    logging.warning(f"Could not extract rarity for addon {name} in alternate method: {e}")
+                                
+                                name_a = cols[1].find("a", title=True)
+                                addon_name = name_a.get_text(strip=True) if name_a else ""
+                                desc_html = clean_description_html(cols[2])
+                                logging.info(f"Row #{row_idx}: power={power}, addon={addon_name}, rarity={rarity}")
+                                logging.info(f"Rarity: {rarity}")
+                                addons.append((icon, addon_name, power, desc_html, rarity))
+                            else:
+                                logging.warning(f"Row #{row_idx} in table after {power} does not have expected structure (cols: {len(cols)})")
+                        break
+                
+                if not found_addons:
+                    logging.warning(f"Could not find addons for power '{power}' using alternate method.")
+                    
+            except Exception as e:
+                logging.error(f"Error retrieving addons for power '{power}' from killer page: {e}")
+    
+    return addons
+
+def scrape_flashlights():
+    url = WIKI_BASE + "/wiki/Flashlights"
+    soup = fetch_soup(url, "tables")
+    logging.info(f"Requesting flashlight page: {url}")
+    flashlights = []
+
+    # Find all tables before the final table, which contains the flashlight addons
+    tables = soup.find_all("table", {"class": "wikitable"})
+    if not tables:
+        logging.warning("No tables found on the flashlight page.")
+        return []
+    if len(tables) < 2:
+        logging.warning("Less than 2 tables found on the flashlight page, cannot process addons.")
+        return []
+    
+    for table_idx, table in enumerate(tables[:-1]):
+        logging.info(f"Processing table #{table_idx} for flashlights")
+        rows = table.find_all("tr")[1:]
+        for row_idx, row in enumerate(rows):
+            tds = row.find_all(["td", "th"])
+            if len(tds) >= 2:
+                icon_img = tds[0].find("img")
+                icon = get_icon_url(icon_img)
+                name_a = tds[1].find("a", title=True)
+                name = name_a.get_text(strip=True) if name_a else ""
+                desc_html = clean_description_html(tds[2])
+                if "THIS ITEM CAN NO LONGER BE OBTAINED FROM THE BLOODWEB" in desc_html:
+                    continue
+                flashlights.append((icon, name, desc_html))
+                logging.info(f"Row #{row_idx}: name={name}")
+            else:
+                logging.warning(f"Row #{row_idx} in table #{table_idx} does not have expected structure (tds: {len(tds)})")
+
+    flashlight_addons = []
+    addons_table = tables[-1]
+    rows = addons_table.find_all("tr")[1:]
+    for row_idx, row in enumerate(rows):
+        tds = row.find_all(["td", "th"])
+        if len(tds) >= 2:
+            icon_img = tds[0].find("img")
+            icon = get_icon_url(icon_img)
+            name_a = tds[1].find("a", title=True)
+            name = name_a.get_text(strip=True) if name_a else ""
+            desc_html = clean_description_html(tds[2])
+            logging.info(f"Row #{row_idx}: name={name}")
+            flashlight_addons.append((icon, name, desc_html))
+        else:
+            logging.warning(f"Row #{row_idx} in flashlight addon table does not have expected structure (tds: {len(tds)})")
+
+    return flashlights, flashlight_addons
+
+OFFERING_DETAILS_PATH = os.path.join(PAGE_CACHE_DIR, "offerings.json")
+# The MediaWiki API accepts at most 50 titles per query.
+WIKI_API_BATCH_SIZE = 50
+
+def _title_from_href(href):
+    return unquote(href[len("/wiki/"):] if href.startswith("/wiki/") else href).replace("_", " ")
+
+def fetch_page_revisions(hrefs):
+    """Return {href: latest revision id} using batched MediaWiki API info queries."""
+    titles = {_title_from_href(href): href for href in hrefs}
+    title_list = list(titles)
+    revisions = {}
+    for start in range(0, len(title_list), WIKI_API_BATCH_SIZE):
+        batch = title_list[start:start + WIKI_API_BATCH_SIZE]
+        try:
+            r = http_get(WIKI_BASE + "/api.php", params={
+                "action": "query",
+                "prop": "info",
+                "titles": "|".join(batch),
+                "format": "json",
+                "formatversion": "2",
+            })
+            query = r.json().get("query", {})
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"Could not query page revisions from the wiki API: {e}")
+            continue
+        # The API normalizes titles (e.g. capitalization), so map them back to what we asked for.
+        renamed = {n["to"]: n["from"] for n in query.get("normalized", [])}
+        for page in query.get("pages", []):
+            title = renamed.get(page.get("title"), page.get("title"))
+            if title in titles and "lastrevid" in page:
+                revisions[titles[title]] = page["lastrevid"]
+    return revisions
+
+def _parse_offering_type(offering_type, name):
+    offering_type = offering_type.lower()
+    if "killers" in offering_type:
+        role = "killer"
+    elif "survivors" in offering_type:
+        role = "survivor"
+    elif "all players" in offering_type:
+        role = "all"
+    else:
+        logging.warning(f"Could not determine role for offering {name}")
+        role = "unknown"
+
+    rarities = ["common", "uncommon", "rare", "very rare", "ultra rare"]
+    rarity = None
+    for r in rarities:
+        if r in offering_type:
+            rarity = r
+    return role, rarity
+
+def _fetch_offering_detail(href, name):
+    try:
+        # Detail pages are only read once, so they are parsed without being kept in the page cache.
+        offering_soup = parse_html(fetch_page(WIKI_BASE + href), "paragraphs")
+        offering_type = offering_soup.find_all("p")[0].get_text(strip=True)
+    except (requests.RequestException, IndexError) as e:
+        logging.warning(f"Could not fetch details for offering {name}: {e}")
+        return "unknown", None
+    return _parse_offering_type(offering_type, name)
+
+def fetch_offering_details(offerings):
+    """Return {href: (role, rarity)} for the given (href, name) pairs.
+
+    Results are cached per href in OFFERING_DETAILS_PATH together with the page
+    revision they were read from. Pages whose revision hasn't changed since the
+    last rebuild are not fetched at all; the rest are fetched in parallel.
+    """
+    try:
+        with open(OFFERING_DETAILS_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if _fixture is not None and _fixture["mode"] == "record":
+        # Every detail page has to end up in the recording
+        cache = {}
+
+    revisions = fetch_page_revisions([href for href, _ in offerings])
+    details = {}
+    stale = []
+    for href, name in offerings:
+        entry = cache.get(href)
+        if entry and href in revisions and entry.get("revid") == revisions[href]:
+            details[href] = (entry["role"], entry["rarity"])
+        else:
+            stale.append((href, name))
+    logging.info(f"Offering details: {len(details)} unchanged, {len(stale)} to fetch")
+
+    with ThreadPoolExecutor(max_workers=SCRAPE_MAX_PER_HOST) as pool:
+        fetched = pool.map(lambda offering: _fetch_offering_detail(*offering), stale)
+        for (href, _), (role, rarity) in zip(stale, fetched):
+            details[href] = (role, rarity)
+            if role != "unknown" and href in revisions:
+                cache[href] = {"revid": revisions[href], "role": role, "rarity": rarity}
+
+    try:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        with open(OFFERING_DETAILS_PATH, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+    except OSError as e:
+        logging.warning(f"Could not write offering details cache: {e}")
+    return details
+
+def scrape_offerings():
+    url = WIKI_BASE + "/wiki/Offerings"
+    soup = fetch_soup(url, "tables")
+    logging.info(f"Requesting offering page: {url}")
+    rows_found = []
+
+    # Find all tables before the final table, which contains the flashlight addons
+    tables = soup.find_all("table", {"class": "wikitable"})
+    if not tables:
+        logging.warning("No tables found on the offering page.")
+        return []
+    
+    for table_idx, table in enumerate(tables):
+        logging.info(f"Processing table #{table_idx} for offerings")
+        rows = table.find_all("tr")[1:]
+        for row_idx, row in enumerate(rows):
+            cols = row.find_all(["th", "td"])
+            if len(cols) == 3:
+                href = cols[0].find("a").get("href", "").strip()
+                icon = get_icon_url(cols[0].find("img"))
+                name = cols[1].find("a", title=True).get_text(strip=True)
+                desc_html = clean_description_html(cols[2])
+                if "<span class=\"tooltip borderless\">" in desc_html:
+                    logging.warning(f"Row #{row_idx} in table #{table_idx} is retired, not available anymore, or on dbd mobile; skipping...")
+                    continue
+                if not href:
+                    logging.warning(f"Row #{row_idx} in table #{table_idx} is missing a link, skipping...")
+                    continue
+                rows_found.append((href, icon, name, desc_html))
+                logging.info(f"Row #{row_idx}: name={name}")
+            else:
+                logging.warning(f"Row #{row_idx} in table #{table_idx} does not have expected structure (cols: {len(cols)})")
+
+    # The role and rarity are only shown on each offering's own page.
+    details = fetch_offering_details([(href, name) for href, _, name, _ in rows_found])
+    offerings = []
+    for href, icon, name, desc_html in rows_found:
+        role, rarity = details[href]
+        offerings.append((icon, name, desc_html, role, rarity))
+    return offerings
+
+
+def scrape_all():
+    """Run every scraper, fetching and parsing independent pages in parallel.
+
+    Only scrape_addons depends on another scraper (it needs the killer data), so
+    it is submitted as soon as scrape_killers has finished.
+    """
+    reset_page_cache()
+    reset_http_metrics()
+    try:
+        with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as pool:
+            futures = {
+                "killers": pool.submit(scrape_killers),
+                "survivors": pool.submit(scrape_survivors),
+                "killer_perks": pool.submit(scrape_killer_perks),
+                "survivor_perks": pool.submit(scrape_survivor_perks),
+                "survivor_items": pool.submit(scrape_survivor_items),
+                "survivor_addons": pool.submit(scrape_survivor_addons),
+                "offerings": pool.submit(scrape_offerings),
+            }
+            futures["killer_addons"] = pool.submit(scrape_addons, futures["killers"].result())
+            scraped = {name: future.result() for name, future in futures.items()}
+    finally:
+        save_page_index()
+        reset_page_cache()
+
+    metrics = get_http_metrics().values()
+    logging.info(
+        f"Fetched {sum(m['requests'] for m in metrics)} URLs, {sum(m['bytes'] for m in metrics)} bytes, "
+        f"{sum(m['retries'] for m in metrics)} retries"
+    )
+    return scraped
@@ -1,5 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
+import { runDatabaseUpdate } from "./updateDatabase";
+import { iconUrl } from "./iconUrl";
 
 const API_BASE = "http://localhost:5000/api";
 
@@ -93,8 +95,7 @@ function AddonMinigame() {
         setUpdateMsg("");
         setError("");
         try {
-            const res = await fetch(`${API_BASE}/update`, { method: "POST" });
-            const data = await res.json();
+            const data = await runDatabaseUpdate(API_BASE);
             if (data.status === "success") {
                 setUpdateMsg("Database updated!");
             } else {
@@ -262,7 +263,7 @@ function AddonMinigame() {
                                     {addonData.killer &&
                                         addonData.killer.icon && (
                                             <img
-                                                src={addonData.killer.icon}
+                                                src={iconUrl(addonData.killer.icon, API_BASE)}
                                                 alt={addonData.killer.name}
                                                 className="absolute opacity-15 pointer-events-none select-none"
                                                 style={{
@@ -321,11 +322,7 @@ function AddonMinigame() {
                                                     {addonData.chosen_addon
                                                         .icon && (
                                                         <img
-                                                            src={
-                                                                addonData
-                                                                    .chosen_addon
-                                                                    .icon
-                                                            }
+                                                            src={iconUrl(addonData.chosen_addon.icon, API_BASE, 128)}
                                                             alt={
                                                                 addonData
                                                                     .chosen_addon
@@ -403,7 +400,7 @@ function AddonMinigame() {
                                                     null ? (
                                                         addon.icon && (
                                                             <img
-                                                                src={addon.icon}
+                                                                src={iconUrl(addon.icon, API_BASE, 128)}
                                                                 alt={addon.name}
                                                                 className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 object-contain"
                                                                 style={{
@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
+import { iconUrl } from "./iconUrl";
 
 const API_BASE = "http://localhost:5000/api";
 
@@ -97,7 +98,7 @@ function CustomMatchBuilds() {
                                 }}>
                                 {build.killer.icon && (
                                     <img
-                                        src={build.killer.icon}
+                                        src={iconUrl(build.killer.icon, API_BASE)}
                                         alt={build.killer.name}
                                         className="absolute opacity-15 pointer-events-none select-none"
                                         style={{
@@ -152,7 +153,7 @@ function CustomMatchBuilds() {
                                                 className="flex items-start gap-3">
                                                 {perk.icon && (
                                                     <img
-                                                        src={perk.icon}
+                                                        src={iconUrl(perk.icon, API_BASE, 128)}
                                                         alt={perk.name}
                                                         className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 object-contain"
                                                         style={{ marginTop: 6 }}
@@ -209,7 +210,7 @@ function CustomMatchBuilds() {
                                                         className="flex items-start gap-3">
                                                         {perk.icon && (
                                                             <img
-                                                                src={perk.icon}
+                                                                src={iconUrl(perk.icon, API_BASE, 128)}
                                                                 alt={perk.name}
                                                                 className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 object-contain"
                                                                 style={{
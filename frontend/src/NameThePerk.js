@@ -1,6 +1,8 @@
 import React, { useState, useEffect, useCallback } from "react";
 import { Link } from "react-router-dom";
 import PerkSearch from "./PerkSearch";
+import { createQuizSession, fetchQuizQuestion } from "./quizSession";
+import { iconUrl } from "./iconUrl";
 
 const API_BASE = "http://localhost:5000/api";
 
@@ -44,6 +46,7 @@ function NameThePerk() {
     const [selectedPerkName, setSelectedPerkName] = useState(null);
     const [isCorrect, setIsCorrect] = useState(null);
     const [winHistory, setWinHistory] = useState([]);
+    const [quiz, setQuiz] = useState(null);
     const [typedAnswer, setTypedAnswer] = useState("");
     const [img_rotation, set_img_rotation] = useState("");
     const [img_blur, set_img_blur] = useState("");
@@ -75,27 +78,45 @@ function NameThePerk() {
         settingOptions.filter((opt) => opt.defaultValue).map((opt) => opt.id)
     );
 
-    const fetchPerks = useCallback(async () => {
-        setLoading(true);
-        setError("");
-        setPerkData(null);
-        setSelectedPerkName(null);
-        setTypedAnswer("");
-        setIsCorrect(null);
-        try {
-            const res = await fetch(`${API_BASE}/random_perks?role=${role}`, {
-                method: "GET",
-                headers: { "Content-Type": "application/json" }
-            });
-            if (!res.ok) throw new Error("Failed to fetch perk set.");
-            const data = await res.json();
-            setPerkData(data);
-        } catch (e) {
-            setError(e.message);
-        }
-        setLoading(false);
+    // A new deck is dealt whenever the role changes
+    useEffect(() => {
+        setQuiz(null);
     }, [role]);
 
+    const showQuestion = useCallback(
+        async (index, restart = false) => {
+            setLoading(true);
+            setError("");
+            setPerkData(null);
+            setSelectedPerkName(null);
+            setTypedAnswer("");
+            setIsCorrect(null);
+            try {
+                let session = restart ? null : quiz;
+                if (!session) {
+                    session = await createQuizSession(API_BASE, "perk", role);
+                }
+                const data = await fetchQuizQuestion(
+                    API_BASE,
+                    session.session_id,
+                    index
+                );
+                setQuiz({ ...session, index });
+                setPerkData(data);
+            } catch (e) {
+                setError(e.message);
+            }
+            setLoading(false);
+        },
+        [role, quiz]
+    );
+
+    const fetchPerks = useCallback(
+        () => showQuestion(quiz ? quiz.index + 1 : 0),
+        [showQuestion, quiz]
+    );
+    const startQuiz = () => showQuestion(0, true);
+
     const updateDatabase = async () => {
         setLoading(true);
         setUpdateMsg("");
@@ -230,7 +251,7 @@ function NameThePerk() {
                                 </button>
                                 <button
                                     className="w-full bg-green-600 hover:bg-green-700 transition-colors px-5 py-2 rounded-lg font-semibold shadow focus:outline-none focus:ring-2 focus:ring-green-400 mt-4"
-                                    onClick={fetchPerks}
+                                    onClick={startQuiz}
                                     disabled={loading}>
                                     Start Perk Quiz
                                 </button>
@@ -320,9 +341,27 @@ function NameThePerk() {
                                 scrollbarColor: "#4f46e5 #1a202c",
                                 scrollbarWidth: "thin"
                             }}>
+                            <div className="flex justify-between items-center text-sm text-gray-400 mb-2 relative z-10">
+                                <button
+                                    className="px-3 py-1 rounded bg-gray-700 hover:bg-gray-600 disabled:opacity-50"
+                                    onClick={() => showQuestion(quiz.index - 1)}
+                                    disabled={loading || perkData.index === 0}>
+                                    ← Previous
+                                </button>
+                                <span>
+                                    Question {(perkData.index % perkData.size) + 1}{" "}
+                                    of {perkData.size}
+                                </span>
+                                <button
+                                    className="px-3 py-1 rounded bg-gray-700 hover:bg-gray-600 disabled:opacity-50"
+                                    onClick={fetchPerks}
+                                    disabled={loading}>
+                                    Next →
+                                </button>
+                            </div>
                             {perkData.killer && perkData.killer.icon && (
                                 <img
-                                    src={perkData.killer.icon}
+                                    src={iconUrl(perkData.killer.icon, API_BASE)}
                                     alt={perkData.killer.name}
                                     className="absolute opacity-15 pointer-events-none select-none"
                                     style={{
@@ -357,11 +396,7 @@ function NameThePerk() {
                                                 perkData.chosen_perk?.icon ? (
                                                     <div className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 flex items-center justify-center overflow-hidden">
                                                         <img
-                                                            src={
-                                                                perkData
-                                                                    .chosen_perk
-                                                                    .icon
-                                                            }
+                                                            src={iconUrl(perkData.chosen_perk.icon, API_BASE, 128)}
                                                             alt={
                                                                 perkData
                                                                     .chosen_perk
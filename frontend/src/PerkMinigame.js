@@ -1,5 +1,8 @@
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
+import { runDatabaseUpdate } from "./updateDatabase";
+import { createQuizSession, fetchQuizQuestion } from "./quizSession";
+import { iconUrl } from "./iconUrl";
 
 const API_BASE = "http://localhost:5000/api";
 
@@ -44,6 +47,7 @@ function PerkMinigame() {
     const [selectedPerkName, setSelectedPerkName] = useState(null);
     const [isCorrect, setIsCorrect] = useState(null);
     const [winHistory, setWinHistory] = useState([]);
+    const [quiz, setQuiz] = useState(null);
 
     const [settingOptions] = useState([
         {
@@ -92,19 +96,32 @@ function PerkMinigame() {
             });
     }, [role]);
 
-    const fetchPerks = async () => {
+    // A new deck is dealt whenever the filters change
+    useEffect(() => {
+        setQuiz(null);
+    }, [role, selectedCharacters]);
+
+    const showQuestion = async (index, restart = false) => {
         setLoading(true);
         setError("");
         setPerkData(null);
         setSelectedPerkName(null);
         try {
-            const res = await fetch(`${API_BASE}/random_perks?role=${role}`, {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ allowed: selectedCharacters })
-            });
-            if (!res.ok) throw new Error("Failed to fetch perk set.");
-            const data = await res.json();
+            let session = restart ? null : quiz;
+            if (!session) {
+                session = await createQuizSession(
+                    API_BASE,
+                    "perk",
+                    role,
+                    selectedCharacters
+                );
+            }
+            const data = await fetchQuizQuestion(
+                API_BASE,
+                session.session_id,
+                index
+            );
+            setQuiz({ ...session, index });
             setPerkData(data);
         } catch (e) {
             setError(e.message);
@@ -112,15 +129,15 @@ function PerkMinigame() {
         setLoading(false);
     };
 
+    const fetchPerks = () => showQuestion(quiz ? quiz.index + 1 : 0);
+    const startQuiz = () => showQuestion(0, true);
+
     const updateDatabase = async () => {
         setLoading(true);
         setUpdateMsg("");
         setError("");
         try {
-            const res = await fetch(`${API_BASE}/update`, {
-                method: "POST"
-            });
-            const data = await res.json();
+            const data = await runDatabaseUpdate(API_BASE);
             if (data.status === "success") {
                 setUpdateMsg("Perk database updated!");
             } else {
@@ -196,7 +213,7 @@ function PerkMinigame() {
                                 </button>
                                 <button
                                     className="w-full bg-green-600 hover:bg-green-700 transition-colors px-5 py-2 rounded-lg font-semibold shadow focus:outline-none focus:ring-2 focus:ring-green-400 mt-4"
-                                    onClick={fetchPerks}
+                                    onClick={startQuiz}
                                     disabled={
                                         loading ||
                                         selectedCharacters.length === 0
@@ -285,10 +302,34 @@ function PerkMinigame() {
                             }}>
                             {perkData && (
                                 <>
+                                    <div className="flex justify-between items-center text-sm text-gray-400 mb-2 relative z-10">
+                                        <button
+                                            className="px-3 py-1 rounded bg-gray-700 hover:bg-gray-600 disabled:opacity-50"
+                                            onClick={() =>
+                                                showQuestion(quiz.index - 1)
+                                            }
+                                            disabled={
+                                                loading || perkData.index === 0
+                                            }>
+                                            ← Previous
+                                        </button>
+                                        <span>
+                                            Question{" "}
+                                            {(perkData.index % perkData.size) +
+                                                1}{" "}
+                                            of {perkData.size}
+                                        </span>
+                                        <button
+                                            className="px-3 py-1 rounded bg-gray-700 hover:bg-gray-600 disabled:opacity-50"
+                                            onClick={fetchPerks}
+                                            disabled={loading}>
+                                            Next →
+                                        </button>
+                                    </div>
                                     {perkData.killer &&
                                         perkData.killer.icon && (
                                             <img
-                                                src={perkData.killer.icon}
+                                                src={iconUrl(perkData.killer.icon, API_BASE)}
                                                 alt={perkData.killer.name}
                                                 className="absolute opacity-15 pointer-events-none select-none"
                                                 style={{
@@ -349,11 +390,7 @@ function PerkMinigame() {
                                                         perkData.chosen_perk
                                                             .icon && (
                                                             <img
-                                                                src={
-                                                                    perkData
-                                                                        .chosen_perk
-                                                                        .icon
-                                                                }
+                                                                src={iconUrl(perkData.chosen_perk.icon, API_BASE, 128)}
                                                                 alt={
                                                                     perkData
                                                                         .chosen_perk
@@ -530,7 +567,7 @@ function PerkMinigame() {
                                                     ) ? (
                                                         perk.icon && (
                                                             <img
-                                                                src={perk.icon}
+                                                                src={iconUrl(perk.icon, API_BASE, 128)}
                                                                 alt={perk.name}
                                                                 className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 object-contain"
                                                                 style={{
@@ -1,43 +1,58 @@
 import { useEffect, useState, useRef } from "react";
 
 function PerkSearch({ role, value, onChange, onSelect }) {
-    const [allPerks, setAllPerks] = useState([]);
     const [filtered, setFiltered] = useState([]);
     const [showDropdown, setShowDropdown] = useState(false);
     const [highlightIndex, setHighlightIndex] = useState(-1);
+    const [error, setError] = useState(null);
     const containerRef = useRef(null);
 
     const API_BASE = "http://localhost:5000/api";
+    const SEARCH_DELAY = 150;
 
-    // Fetch all perks on role change
-    useEffect(() => {
-        async function fetchPerks() {
-            const res = await fetch(`${API_BASE}/all_perks?role=any`);
-            const data = await res.json();
-            setAllPerks(data.perks);
-            setShowDropdown(false);
-            setHighlightIndex(-1);
-        }
-        fetchPerks();
-    }, [role]);
-
-    // Filter perks when search value changes
+    // Search perk names on the server when the search value changes
     useEffect(() => {
         if (!value || !value.trim()) {
             setFiltered([]);
             setShowDropdown(false);
             setHighlightIndex(-1);
+            setError(null);
             return;
         }
-        const filteredPerks = allPerks.filter(
-            (perk) =>
-                perk.name.toLowerCase().includes(value.toLowerCase()) ||
-                perk.owner?.toLowerCase().includes(value.toLowerCase())
-        );
-        setFiltered(filteredPerks);
-        setShowDropdown(filteredPerks.length > 0);
-        setHighlightIndex(-1);
-    }, [value, allPerks]);
+        const controller = new AbortController();
+        const timer = setTimeout(async () => {
+            const params = new URLSearchParams({
+                q: value,
+                kind: "perk",
+                fields: "name",
+                limit: "50",
+            });
+            if (role && role !== "any") params.set("role", role);
+            try {
+                const res = await fetch(`${API_BASE}/search?${params}`, {
+                    signal: controller.signal,
+                });
+                const data = await res.json();
+                if (!res.ok) throw new Error(data.error || "Search failed");
+                const perks = data.results || [];
+                setFiltered(perks);
+                setShowDropdown(perks.length > 0);
+                setHighlightIndex(-1);
+                setError(null);
+            } catch (err) {
+                // Thrown here, the error would escape the timer as an uncaught rejection
+                if (err.name === "AbortError") return;
+                setFiltered([]);
+                setShowDropdown(false);
+                setHighlightIndex(-1);
+                setError(err.message);
+            }
+        }, SEARCH_DELAY);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [value, role]);
 
     // Close dropdown on outside click
     useEffect(() => {
@@ -99,6 +114,9 @@ function PerkSearch({ role, value, onChange, onSelect }) {
                 className="w-full px-4 py-2 rounded-lg bg-gray-800 text-white border border-gray-600 focus:outline-none focus:ring-2 focus:ring-indigo-500 mb-4"
                 autoComplete="off"
             />
+            {error && (
+                <p className="text-red-400 text-sm -mt-2 mb-4">{error}</p>
+            )}
             {showDropdown && (
                 <ul className="absolute z-30 w-full max-h-60 overflow-auto bg-gray-900 border border-gray-700 rounded-lg shadow-lg scrollbar-thin scrollbar-thumb-indigo-600 scrollbar-track-gray-900">
                     {filtered.map((perk, idx) => (
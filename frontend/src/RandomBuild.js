@@ -1,5 +1,7 @@
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
+import { runDatabaseUpdate } from "./updateDatabase";
+import { iconUrl } from "./iconUrl";
 
 const API_BASE = "http://localhost:5000/api";
 
@@ -127,8 +129,7 @@ function RandomBuild() {
         setUpdateMsg("");
         setError("");
         try {
-            const res = await fetch(`${API_BASE}/update`, { method: "POST" });
-            const data = await res.json();
+            const data = await runDatabaseUpdate(API_BASE);
             if (data.status === "success") {
                 setUpdateMsg("Database updated!");
             } else {
@@ -323,7 +324,7 @@ function RandomBuild() {
                                 <>
                                     {build.killer.icon && (
                                         <img
-                                            src={build.killer.icon}
+                                            src={iconUrl(build.killer.icon, API_BASE)}
                                             alt={build.killer.name}
                                             className="absolute opacity-15 pointer-events-none select-none"
                                             style={{
@@ -352,10 +353,7 @@ function RandomBuild() {
                                                 <li className="flex items-start gap-3">
                                                     {build.offering.icon && (
                                                         <img
-                                                            src={
-                                                                build.offering
-                                                                    .icon
-                                                            }
+                                                            src={iconUrl(build.offering.icon, API_BASE, 128)}
                                                             alt={
                                                                 build.offering
                                                                     .name
@@ -425,9 +423,7 @@ function RandomBuild() {
                                                             className="flex items-start gap-3">
                                                             {addon.icon && (
                                                                 <img
-                                                                    src={
-                                                                        addon.icon
-                                                                    }
+                                                                    src={iconUrl(addon.icon, API_BASE, 128)}
                                                                     alt={
                                                                         addon.name
                                                                     }
@@ -487,10 +483,7 @@ function RandomBuild() {
                                                 <li className="flex items-start gap-3">
                                                     {build.offering.icon && (
                                                         <img
-                                                            src={
-                                                                build.offering
-                                                                    .icon
-                                                            }
+                                                            src={iconUrl(build.offering.icon, API_BASE, 128)}
                                                             alt={
                                                                 build.offering
                                                                     .name
@@ -546,9 +539,7 @@ function RandomBuild() {
                                                 <li className="flex items-start gap-3">
                                                     {build.item.icon && (
                                                         <img
-                                                            src={
-                                                                build.item.icon
-                                                            }
+                                                            src={iconUrl(build.item.icon, API_BASE, 128)}
                                                             alt={
                                                                 build.item.name
                                                             }
@@ -588,9 +579,7 @@ function RandomBuild() {
                                                                     className="flex items-start gap-3">
                                                                     {addon.icon && (
                                                                         <img
-                                                                            src={
-                                                                                addon.icon
-                                                                            }
+                                                                            src={iconUrl(addon.icon, API_BASE, 128)}
                                                                             alt={
                                                                                 addon.name
                                                                             }
@@ -647,7 +636,7 @@ function RandomBuild() {
                                             className="flex items-start gap-3">
                                             {perk.icon && (
                                                 <img
-                                                    src={perk.icon}
+                                                    src={iconUrl(perk.icon, API_BASE, 128)}
                                                     alt={perk.name}
                                                     className="w-20 h-20 rounded shadow border border-gray-700 bg-gray-800 object-contain"
                                                     style={{ marginTop: 6 }}
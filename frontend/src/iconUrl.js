@@ -0,0 +1,9 @@
+// Icons are wiki URLs, or, when the backend mirrors them (OFFLINE_ICONS), paths
+// like "/icons/<file>" relative to the backend's address. Mirrored icons are
+// requested as a thumbnail of `size` pixels when one is given.
+export function iconUrl(icon, apiBase, size) {
+    if (!icon || !icon.startsWith("/")) return icon;
+    const url = new URL(icon, new URL(apiBase, window.location.href));
+    if (size) url.searchParams.set("size", size);
+    return url.href;
+}
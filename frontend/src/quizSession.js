@@ -0,0 +1,21 @@
+// Quiz sessions deal questions from a shuffled deck kept by the backend, so no
+// question repeats until every question of the deck has been asked.
+export async function createQuizSession(apiBase, kind, role, allowed) {
+    const res = await fetch(`${apiBase}/quiz`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ kind, role, allowed })
+    });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.error || "Failed to start quiz.");
+    return data;
+}
+
+// Fetches question number `index` of a session; the same index always returns
+// the same question, so callers can page back and forth through the deck.
+export async function fetchQuizQuestion(apiBase, sessionId, index) {
+    const res = await fetch(`${apiBase}/quiz/${sessionId}/${index}`);
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.error || "Failed to fetch question.");
+    return data;
+}
@@ -0,0 +1,13 @@
+// Starts a database update and polls its job until the rebuild has finished.
+export async function runDatabaseUpdate(apiBase, pollInterval = 2000) {
+    const res = await fetch(`${apiBase}/update`, { method: "POST" });
+    let data = await res.json();
+    if (!data.job_id) return data;
+
+    while (data.status === "accepted" || data.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, pollInterval));
+        const statusRes = await fetch(`${apiBase}/update/${data.job_id}`);
+        data = await statusRes.json();
+    }
+    return data;
+}
@@ -0,0 +1,355 @@
+"""Load-test the API routes with the frontend's request mix and check for regressions.
+
+Seeds a deterministic fixture database (FIXTURE_SIZES, built from a fixed
+seed) in a scratch directory, then sends a weighted mix of the requests the
+frontend makes (see request_mix) from --concurrency threads: in-process
+through Flask's test client, over a local socket to a threaded server in this
+process, or to an already running server given with --url (e.g. serve mode,
+which then uses its own database). Reports the p50/p95/p99 latency and
+throughput of every route, and the memory allocated per request, measured
+with tracemalloc in a separate single-threaded pass because tracing slows
+every request down.
+
+The results are compared with the baseline saved by --save-baseline, and the
+exit status is 1 if a route's latency or allocations grew by more than
+--tolerance, or if any request failed with a server error.
+
+    python tools/bench_api.py [--mode inprocess|socket|both] [--requests 5000] [--concurrency 8] [--save-baseline]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdmanager
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_api_baseline.json")
+SEED = 20240601
+# Roughly the size of the live game data
+FIXTURE_SIZES = {
+    "killers": 40, "survivors": 48, "perks_per_character": 3, "general_perks": 10,
+    "addons_per_killer": 20, "items": 5, "addons_per_item": 20, "offerings": 100,
+}
+RARITIES = ["common", "uncommon", "rare", "very rare", "ultra rare"]
+LATENCY_KEYS = ("p50", "p95", "p99")
+
+def _description(rng, name):
+    words = ["Exposed", "Hindered", "Haste", "seconds", "Generator", "Totem", "Survivors", "Killer", "Hook", "Aura"]
+    sentences = " ".join(" ".join(rng.choice(words) for _ in range(12)) + "." for _ in range(3))
+    return f"<p><b>{name}</b>: {sentences}</p><ul><li>{rng.randint(10, 60)}/{rng.randint(10, 60)} %</li></ul>"
+
+def fixture_scraped(seed=SEED):
+    """Return scrape_all()-shaped data of FIXTURE_SIZES, the same for every seed."""
+    rng = Random(seed)
+    sizes = FIXTURE_SIZES
+    killers = [(f"The Killer {i}", f"Power {i}", f"https://icons.example/killer{i}.png") for i in range(sizes["killers"])]
+    # A killer whose page has no icon, which scrape_killers returns as None
+    killers[-1] = killers[-1][:2] + (None,)
+    survivors = [f"Survivor {i}" for i in range(sizes["survivors"])]
+    items = [("https://icons.example/item{i}.png", f"Item {i}", _description(rng, f"Item {i}")) for i in range(sizes["items"])]
+
+    def perks(prefix, owners):
+        rows = []
+        # General perks have no owner
+        for owner in owners + [""] * sizes["general_perks"]:
+            for _ in range(sizes["perks_per_character"] if owner else 1):
+                name = f"{prefix} Perk {len(rows)}"
+                rows.append((f"https://icons.example/{len(rows)}.png", name, _description(rng, name), owner))
+        return rows
+
+    killer_addons = []
+    for _, power, _ in killers:
+        for _ in range(sizes["addons_per_killer"]):
+            name = f"Killer Add-on {len(killer_addons)}"
+            killer_addons.append(("https://icons.example/ka.png", name, power, _description(rng, name), rng.choice(RARITIES)))
+    survivor_addons = []
+    for _, item, _ in items:
+        for _ in range(sizes["addons_per_item"]):
+            name = f"Survivor Add-on {len(survivor_addons)}"
+            survivor_addons.append(("https://icons.example/sa.png", name, item, _description(rng, name), rng.choice(RARITIES)))
+    offerings = [
+        ("https://icons.example/o.png", f"Offering {i}", _description(rng, f"Offering {i}"),
+         rng.choice(["killer", "survivor", "all"]), rng.choice(RARITIES))
+        for i in range(sizes["offerings"])
+    ]
+    return {
+        "killers": killers,
+        "survivors": survivors,
+        "killer_perks": perks("Killer", [name for name, _, _ in killers]),
+        "survivor_perks": perks("Survivor", survivors),
+        "survivor_items": items,
+        "survivor_addons": survivor_addons,
+        "killer_addons": killer_addons,
+        "offerings": offerings,
+    }
+
+def seed_database(work_dir):
+    """Build the fixture database in work_dir (which becomes the working directory) and load it."""
+    os.chdir(work_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dbdmanager._build_database(fixture_scraped(), copy_current=False)
+    dbdmanager.prepare_database()
+
+def request_mix():
+    """Return [(weight, route, build(rng) -> (method, path, json body, headers))] matching frontend traffic."""
+    killers = [f"The Killer {i}" for i in range(FIXTURE_SIZES["killers"])]
+    survivors = [f"Survivor {i}" for i in range(FIXTURE_SIZES["survivors"])]
+    gzip = {"Accept-Encoding": "gzip"}
+
+    def role(rng):
+        return rng.choice(["killer", "survivor"])
+
+    def allowed(rng, role):
+        # The settings panels send every character unless some are unticked
+        names = killers if role == "killer" else survivors
+        return names if rng.random() < 0.7 else rng.sample(names, rng.randint(4, len(names)))
+
+    def random_build(rng):
+        r = role(rng)
+        return "POST", f"/api/random_build?role={r}", {"allowed": allowed(rng, r), "useOfferings": rng.random() < 0.5}, None
+
+    def random_addons(rng):
+        r = role(rng)
+        return "POST", f"/api/random_addons?role={r}", {"allowed": allowed(rng, r)}, None
+
+    def random_perks(rng):
+        r = role(rng)
+        return "POST", f"/api/random_perks?role={r}", {"allowed": allowed(rng, r)}, None
+
+    return [
+        (30, "POST /api/random_build", random_build),
+        (20, "GET /api/characters", lambda rng: ("GET", f"/api/characters?role={role(rng)}", None, None)),
+        (15, "POST /api/random_addons", random_addons),
+        (10, "POST /api/random_perks", random_perks),
+        (10, "GET /api/custom_match_random_builds", lambda rng: ("GET", "/api/custom_match_random_builds", None, None)),
+        (10, "GET /api/all_perks", lambda rng: ("GET", f"/api/all_perks?role={role(rng)}", None, gzip)),
+        (5, "GET /api/batch_random_build", lambda rng: ("GET", f"/api/batch_random_build?role={role(rng)}&amount=25", None, None)),
+    ]
+
+def request_plan(count, seed=SEED):
+    """Return count (route, method, path, body, headers) requests drawn from request_mix."""
+    rng = Random(seed)
+    mix = request_mix()
+    weights = [weight for weight, _, _ in mix]
+    plan = []
+    for _, route, build in rng.choices(mix, weights, k=count):
+        plan.append((route, *build(rng)))
+    return plan
+
+class InProcessClient:
+    def __init__(self):
+        self.client = dbdmanager.app.test_client()
+
+    def send(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+class SocketClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def send(self, method, path, body, headers):
+        response = self.session.request(method, self.base_url + path, json=body, headers=headers)
+        return response.status_code
+
+@contextlib.contextmanager
+def local_server():
+    """Serve the app from a threaded server on a free local port, yielding its base URL."""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", 0, dbdmanager.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+
+def run_load(make_client, plan, concurrency, warmup):
+    """Send plan from concurrency threads; returns ({route: [seconds]}, {route: {status: count}}, wall seconds)."""
+    latencies = {}
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = make_client()
+        for route, method, path, body, headers in chunk[:warmup]:
+            client.send(method, path, body, headers)
+        barrier.wait()
+        timings = []
+        for route, method, path, body, headers in chunk[warmup:]:
+            started = time.perf_counter()
+            status = client.send(method, path, body, headers)
+            timings.append((route, time.perf_counter() - started, status))
+        with lock:
+            for route, seconds, status in timings:
+                latencies.setdefault(route, []).append(seconds)
+                counts = statuses.setdefault(route, {})
+                counts[status] = counts.get(status, 0) + 1
+
+    warmup = warmup // concurrency
+    chunks = [plan[i::concurrency] for i in range(concurrency)]
+    barrier = threading.Barrier(concurrency + 1)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker, chunk) for chunk in chunks]
+        barrier.wait()
+        started = time.perf_counter()
+        for future in futures:
+            future.result()
+        wall = time.perf_counter() - started
+    return latencies, statuses, wall
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, statuses, wall):
+    results = {}
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        results[route] = {
+            "count": len(values),
+            "rps": len(values) / wall,
+            **{key: percentile(values, float(key[1:])) for key in LATENCY_KEYS},
+            "statuses": {str(status): count for status, count in sorted(statuses[route].items())},
+        }
+    return results
+
+def measure_allocations(plan, samples):
+    """Return {route: median peak KiB allocated while serving one request}, in-process and single-threaded."""
+    client = InProcessClient()
+    per_route = {}
+    for route, method, path, body, headers in plan:
+        if len(per_route.setdefault(route, [])) < samples:
+            per_route[route].append((method, path, body, headers))
+    allocations = {}
+    tracemalloc.start()
+    try:
+        for route, requests_ in per_route.items():
+            peaks = []
+            for method, path, body, headers in requests_:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                client.send(method, path, body, headers)
+                peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+            allocations[route] = statistics.median(peaks)
+    finally:
+        tracemalloc.stop()
+    return allocations
+
+def compare(mode, results, baseline, tolerance, min_delta, alloc_min_delta):
+    """Print one mode's results next to its baseline and return the regressions found."""
+    regressions = []
+    total = sum(route["count"] for route in results.values())
+    print(f"\n{mode}: {total} requests, {sum(route['rps'] for route in results.values()):.0f} req/s")
+    print(f"{'route':38}{'count':>7}{'req/s':>9}" + "".join(f"{key + ' ms':>15}" for key in LATENCY_KEYS) + f"{'alloc KiB':>15}  statuses")
+    for route, stats in results.items():
+        before = (baseline or {}).get(route, {})
+        cells = []
+        for key, scale, floor in [(key, 1000, min_delta) for key in LATENCY_KEYS] + [("alloc_kib", 1, alloc_min_delta)]:
+            now, old = stats.get(key), before.get(key)
+            if now is None:
+                cells.append(f"{'-':>15}")
+                continue
+            if old is None:
+                cells.append(f"{now * scale:15.2f}")
+                continue
+            regressed = now > old * (1 + tolerance) and (now - old) * scale > floor
+            if regressed:
+                regressions.append(f"{mode} {route} {key}")
+            change = (now - old) / old if old else 0.0
+            cells.append(f"{now * scale:8.2f}{change:+6.0%}{'!' if regressed else ' '}")
+        errors = sum(count for status, count in stats["statuses"].items() if int(status) >= 500)
+        if errors:
+            regressions.append(f"{mode} {route}: {errors} server errors")
+        statuses = " ".join(f"{status}x{count}" for status, count in stats["statuses"].items())
+        print(f"{route:38}{stats['count']:7d}{stats['rps']:9.0f}" + "".join(cells) + f"  {statuses}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "socket", "both"), default="both")
+    parser.add_argument("--url", help="load-test a running server instead of a local one (socket mode)")
+    parser.add_argument("--requests", type=int, default=5000, help="measured requests per mode")
+    parser.add_argument("--warmup", type=int, default=200, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--alloc-samples", type=int, default=50, help="requests per route traced for allocations (0 to skip)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth before a figure counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.5, help="latency increases under this many milliseconds are ignored")
+    parser.add_argument("--alloc-min-delta", type=float, default=8, help="allocation increases under this many KiB are ignored")
+    args = parser.parse_args()
+
+    # Every request logs a line or two, which would dominate the timings
+    logging.disable(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="bench_api_")
+    seed_database(work_dir)
+    plan = request_plan(args.requests + args.warmup)
+    modes = ["inprocess", "socket"] if args.mode == "both" else [args.mode]
+
+    results = {}
+    for mode in modes:
+        if mode == "inprocess":
+            results[mode] = summarize(*run_load(InProcessClient, plan, args.concurrency, args.warmup))
+        elif args.url:
+            results[mode] = summarize(*run_load(lambda: SocketClient(args.url), plan, args.concurrency, args.warmup))
+        else:
+            with local_server() as base_url:
+                results[mode] = summarize(*run_load(lambda: SocketClient(base_url), plan, args.concurrency, args.warmup))
+    if args.alloc_samples:
+        for route, kib in measure_allocations(plan, args.alloc_samples).items():
+            for mode_results in results.values():
+                if route in mode_results:
+                    mode_results[route]["alloc_kib"] = kib
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("concurrency") != args.concurrency:
+            print(f"Note: the baseline was measured with {saved.get('concurrency')} client threads")
+        baseline = saved["results"]
+
+    print(f"Fixture database in {work_dir}, {args.concurrency} client threads, "
+          f"{os.cpu_count()} CPUs, Python {platform.python_version()}")
+    regressions = []
+    for mode, mode_results in results.items():
+        regressions += compare(mode, mode_results, (baseline or {}).get(mode), args.tolerance,
+                               args.min_delta, args.alloc_min_delta)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "cpus": os.cpu_count(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=1)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to store one")
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Microbenchmark clean_description_html against the original re-parsing version.
+
+Collects every <td> and <p> cell from the pages saved in the page cache (run a
+rebuild first to fill it), checks that both versions produce the same HTML for
+each cell, and times them. The new version is timed cold (empty cache) and warm.
+
+    python tools/bench_clean_description.py [--cache-dir .page_cache] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdscraper
+
+def legacy_clean_description_html(desc_cell):
+    # The original implementation, kept here as the reference
+    soup = BeautifulSoup(str(desc_cell), "html.parser")
+    for a in soup.find_all('a'):
+        a.unwrap()
+    for tag in soup.find_all(True):
+        if 'href' in tag.attrs:
+            del tag.attrs['href']
+    return ''.join(str(child) for child in soup.td.contents) if soup.td else str(soup)
+
+def collect_cells(cache_dir):
+    cells = []
+    index = dbdscraper._load_page_index()
+    for url, entry in index.items():
+        text = dbdscraper._read_cached_page(entry)
+        if text is None:
+            continue
+        soup = dbdscraper.parse_html(text)
+        cells.extend(soup.find_all(["td", "p"]))
+    return cells
+
+def best_of(repeat, func, cells, before=None):
+    best = None
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        for cell in cells:
+            func(cell)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-dir", default=dbdscraper.PAGE_CACHE_DIR, help="page cache to read saved pages from")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing; the best one is reported")
+    args = parser.parse_args()
+
+    dbdscraper.PAGE_CACHE_DIR = args.cache_dir
+    cells = collect_cells(args.cache_dir)
+    if not cells:
+        print(f"No cells found in {args.cache_dir}; run a rebuild first.")
+        return 1
+
+    mismatches = [cell for cell in cells if legacy_clean_description_html(cell) != dbdscraper.clean_description_html(cell)]
+    print(f"{len(cells)} cells, {len(mismatches)} mismatches")
+    for cell in mismatches[:5]:
+        print(f"  expected {legacy_clean_description_html(cell)!r}\n  got      {dbdscraper.clean_description_html(cell)!r}")
+
+    legacy = best_of(args.repeat, legacy_clean_description_html, cells)
+    cold = best_of(args.repeat, dbdscraper.clean_description_html, cells, before=dbdscraper._clean_cache.clear)
+    warm = best_of(args.repeat, dbdscraper.clean_description_html, cells)
+    for label, elapsed in (("legacy", legacy), ("single pass (cold)", cold), ("single pass (warm)", warm)):
+        print(f"{label:>20}: {elapsed * 1000:8.1f} ms total, {elapsed / len(cells) * 1e6:7.1f} us/cell, {legacy / elapsed:5.1f}x")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Time each scraper against a recorded fixture archive and compare with a baseline.
+
+Record an archive once with network access:
+
+    python dbdmanager.py rebuild --record fixtures/wiki.zip
+
+after which the benchmark runs offline. Every scraper is run on its own, with
+empty page and description caches, and its time is split into fetch (reading
+its pages from the archive into a scratch page cache), parse (BeautifulSoup),
+clean (clean_description_html), other (the scraper's own work) and insert
+(writing its table into a fresh database). Time spent on several threads at
+once, such as the offering detail pages, is summed. The median of --repeat
+runs is compared with the baseline saved by --save-baseline, and the exit
+status is 1 if any phase got more than --tolerance slower.
+
+    python tools/bench_rebuild.py fixtures/wiki.zip [--repeat 5] [--save-baseline]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdmanager
+import dbdscraper
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_rebuild_baseline.json")
+PHASES = ("fetch", "parse", "clean", "other", "insert", "total")
+
+# Scrapers in the order they are timed; killer_addons is given the killers
+# scraped just before it, as scrape_all does.
+SCRAPERS = {
+    "killers": lambda scraped: dbdscraper.scrape_killers(),
+    "survivors": lambda scraped: dbdscraper.scrape_survivors(),
+    "killer_perks": lambda scraped: dbdscraper.scrape_killer_perks(),
+    "survivor_perks": lambda scraped: dbdscraper.scrape_survivor_perks(),
+    "survivor_items": lambda scraped: dbdscraper.scrape_survivor_items(),
+    "survivor_addons": lambda scraped: dbdscraper.scrape_survivor_addons(),
+    "killer_addons": lambda scraped: dbdscraper.scrape_addons(scraped["killers"]),
+    "offerings": lambda scraped: dbdscraper.scrape_offerings(),
+}
+
+class PhaseTimer:
+    """Adds up the time spent in the wrapped functions under the scraper being run."""
+
+    def __init__(self):
+        self.current = None
+        self.times = {}
+        self.lock = threading.Lock()
+
+    def add(self, phase, seconds, scraper=None):
+        with self.lock:
+            phases = self.times.setdefault(scraper or self.current, dict.fromkeys(PHASES, 0.0))
+            phases[phase] += seconds
+
+    def wrap(self, function, phase):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - started)
+        return timed
+
+def instrument(timer):
+    """Route the scrapers' fetch, parse and clean calls through timer."""
+    dbdscraper.fetch_page = timer.wrap(dbdscraper.fetch_page, "fetch")
+    dbdscraper.fetch_page_revisions = timer.wrap(dbdscraper.fetch_page_revisions, "fetch")
+    dbdscraper.parse_html = timer.wrap(dbdscraper.parse_html, "parse")
+    dbdscraper.clean_description_html = timer.wrap(dbdscraper.clean_description_html, "clean")
+
+def timed_insert(timer, scraped, work_dir):
+    """Write scraped into a fresh database, timing each table under its scraper."""
+    scraped_rows, sync_table = dbdmanager._scraped_rows, dbdmanager._sync_table
+    fill_search_index = dbdmanager.fill_search_index
+
+    def rows(c, table, data, unresolved):
+        started = time.perf_counter()
+        result = scraped_rows(c, table, data, unresolved)
+        timer.add("insert", time.perf_counter() - started, table)
+        return result
+
+    def sync(c, table, desired, conflicts):
+        started = time.perf_counter()
+        result = sync_table(c, table, desired, conflicts)
+        timer.add("insert", time.perf_counter() - started, table)
+        return result
+
+    def search_index(conn):
+        started = time.perf_counter()
+        fill_search_index(conn)
+        timer.add("insert", time.perf_counter() - started, "search_index")
+
+    dbdmanager.SHADOW_DB_PATH = os.path.join(work_dir, "bench.db")
+    dbdmanager._scraped_rows, dbdmanager._sync_table = rows, sync
+    dbdmanager.fill_search_index = search_index
+    try:
+        conn = dbdmanager._open_shadow_database(copy_current=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            dbdmanager.write_scraped_data(conn, scraped)
+        conn.close()
+    finally:
+        dbdmanager._scraped_rows, dbdmanager._sync_table = scraped_rows, sync_table
+        dbdmanager.fill_search_index = fill_search_index
+
+def run_once(timer):
+    """Scrape and insert everything once; returns {scraper: {phase: seconds}}."""
+    timer.times = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        dbdscraper.PAGE_CACHE_DIR = os.path.join(work_dir, "pages")
+        dbdscraper.OFFERING_DETAILS_PATH = os.path.join(work_dir, "offerings.json")
+        scraped = {}
+        for name, scraper in SCRAPERS.items():
+            dbdscraper.reset_page_cache()
+            dbdscraper._clean_cache.clear()
+            timer.current = name
+            started = time.perf_counter()
+            scraped[name] = scraper(scraped)
+            timer.add("total", time.perf_counter() - started)
+        timer.current = None
+        timed_insert(timer, scraped, work_dir)
+    for phases in timer.times.values():
+        scraped_time = phases["total"]
+        phases["other"] = max(0.0, scraped_time - phases["fetch"] - phases["parse"] - phases["clean"])
+        phases["total"] = scraped_time + phases["insert"]
+    return timer.times
+
+def median_times(runs):
+    names = list(dict.fromkeys(name for run in runs for name in run))
+    return {
+        name: {phase: statistics.median(run.get(name, {}).get(phase, 0.0) for run in runs) for phase in PHASES}
+        for name in names
+    }
+
+def archive_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print results next to the baseline and return the regressed (scraper, phase) pairs."""
+    regressions = []
+    print(f"{'scraper':16}" + "".join(f"{phase:>18}" for phase in PHASES))
+    for name, phases in results.items():
+        cells = []
+        for phase in PHASES:
+            now = phases[phase]
+            before = baseline.get(name, {}).get(phase) if baseline else None
+            if before is None:
+                cells.append(f"{now * 1000:10.1f}ms      ")
+                continue
+            change = (now - before) / before if before else 0.0
+            regressed = now > before * (1 + tolerance) and now - before > min_delta
+            regressions += [(name, phase)] if regressed else []
+            cells.append(f"{now * 1000:10.1f}ms{change:+5.0%}{'!' if regressed else ' '}")
+        print(f"{name:16}" + "".join(f"{cell:>18}" for cell in cells))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("archive", help="fixture archive recorded with dbdmanager.py rebuild --record")
+    parser.add_argument("--repeat", type=int, default=5, help="runs to take the median of")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a phase counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="slowdowns under this many seconds are ignored")
+    args = parser.parse_args()
+
+    # The scrapers log every row, and writing that to a terminal would swamp the timings
+    logging.disable(logging.WARNING)
+    manifest = dbdscraper.use_fixture_archive(args.archive, "replay")
+    # Scrapers build their URLs from WIKI_BASE, so ask for the pages the archive holds
+    dbdscraper.WIKI_BASE = manifest["wiki_base"]
+    timer = PhaseTimer()
+    instrument(timer)
+    runs = [run_once(timer) for _ in range(args.repeat)]
+    results = median_times(runs)
+    digest = archive_digest(args.archive)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("archive") != digest:
+            print(f"Note: the baseline was measured on a different fixture archive ({saved.get('archive', '?')[:12]})")
+        baseline = saved["results"]
+
+    print(f"Median of {args.repeat} runs on {args.archive} ({digest[:12]}), parser {dbdscraper.HTML_PARSER}")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "archive": digest,
+                "fixture_version": dbdscraper.FIXTURE_VERSION,
+                "parser": dbdscraper.HTML_PARSER,
+                "python": platform.python_version(),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+    elif baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to store one")
+    if regressions:
+        print("Slower than the baseline: " + ", ".join(f"{name} {phase}" for name, phase in regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
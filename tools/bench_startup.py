@@ -0,0 +1,172 @@
+"""Time how long a fresh backend process takes to answer its first request.
+
+Every run starts a new Python process that imports dbdmanager, prepares the
+database (prepare_database) and answers GET /api/characters through Flask's
+test client, timing each step. Two starts are measured:
+
+  database   a fixture database already exists (a restart)
+  bundled    there is no database yet, so the bundled catalog is served (a new
+             instance); the background build it would start is left out
+
+The process also reports which slow-to-import modules it loaded. Serving must
+not load the scraper (dbdscraper, requests, bs4), so the exit status is 1 if
+it does, or if a step got more than --tolerance slower than the baseline saved
+by --save-baseline.
+
+    python tools/bench_startup.py [--repeat 7] [--save-baseline]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(TOOLS_DIR, "..")
+sys.path.insert(0, REPO_DIR)
+import dbdmanager
+from bench_api import fixture_scraped
+
+DEFAULT_BASELINE = os.path.join(TOOLS_DIR, "bench_startup_baseline.json")
+STEPS = ("import", "prepare", "first_request", "total")
+# Modules that serving should not load, and optional ones it should only load on first use
+SCRAPING_MODULES = ("dbdscraper", "requests", "bs4")
+LAZY_MODULES = ("numpy", "PIL", "lxml")
+
+# Run in a fresh interpreter; argv[1] is the bundled catalog to use, if any
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import dbdmanager
+imported = time.perf_counter()
+if sys.argv[1]:
+    dbdmanager.BUNDLED_CATALOG_PATH = sys.argv[1]
+    dbdmanager.start_database_build = lambda: None
+dbdmanager.prepare_database()
+prepared = time.perf_counter()
+response = dbdmanager.app.test_client().get("/api/characters")
+answered = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import": imported - started,
+    "prepare": prepared - imported,
+    "first_request": answered - prepared,
+    "modules": sorted(name for name in sys.modules if "." not in name),
+}))
+"""
+
+def seed(work_dir):
+    """Build the fixture database in work_dir/database and return the path of a bundled catalog made from it."""
+    database_dir = os.path.join(work_dir, "database")
+    os.makedirs(database_dir)
+    cwd = os.getcwd()
+    os.chdir(database_dir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            dbdmanager._build_database(fixture_scraped(), copy_current=False)
+        snapshot = dbdmanager.write_catalog_snapshot(dbdmanager.read_db_generation())
+        bundle = os.path.join(work_dir, "catalog_bundle.snapshot")
+        shutil.copyfile(snapshot, bundle)
+    finally:
+        os.chdir(cwd)
+    return database_dir, bundle
+
+def start_once(cwd, bundle):
+    """Start one backend process in cwd and return its step times and loaded modules."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBE, bundle or ""], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - started
+    probe = json.loads(result.stdout.splitlines()[-1])
+    if probe["status"] != 200:
+        raise RuntimeError(f"/api/characters answered {probe['status']}")
+    probe["total"] = total
+    return probe
+
+def run(scenarios, repeat):
+    """Start every scenario repeat times, interleaved; returns medians and the modules loaded."""
+    runs = {name: [] for name in scenarios}
+    for _ in range(repeat):
+        for name, (cwd, bundle) in scenarios.items():
+            runs[name].append(start_once(cwd, bundle))
+    results = {}
+    for name, probes in runs.items():
+        results[name] = {step: statistics.median(probe[step] for probe in probes) for step in STEPS}
+        modules = set(probes[-1]["modules"])
+        results[name]["scraping_modules"] = [m for m in SCRAPING_MODULES if m in modules]
+        results[name]["lazy_modules"] = [m for m in LAZY_MODULES if m in modules]
+    return results
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print results next to the baseline and return the regressions found."""
+    regressions = []
+    print(f"{'start':10}" + "".join(f"{step:>20}" for step in STEPS) + "  loaded")
+    for name, steps in results.items():
+        cells = []
+        for step in STEPS:
+            now = steps[step]
+            before = (baseline or {}).get(name, {}).get(step)
+            if before is None:
+                cells.append(f"{now * 1000:10.1f}ms      ")
+                continue
+            change = (now - before) / before if before else 0.0
+            regressed = now > before * (1 + tolerance) and (now - before) * 1000 > min_delta
+            if regressed:
+                regressions.append(f"{name} {step}: {before * 1000:.1f}ms -> {now * 1000:.1f}ms")
+            cells.append(f"{now * 1000:10.1f}ms{change:+5.0%}{'!' if regressed else ' '}")
+        loaded = steps["scraping_modules"] + steps["lazy_modules"]
+        print(f"{name:10}" + "".join(f"{cell:>20}" for cell in cells) + "  " + (", ".join(loaded) or "-"))
+        if steps["scraping_modules"]:
+            regressions.append(f"{name}: serving loaded {', '.join(steps['scraping_modules'])}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7, help="starts of each kind to take the median of")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a step counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=20, help="slowdowns under this many milliseconds are ignored")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as work_dir:
+        database_dir, bundle = seed(work_dir)
+        empty_dir = os.path.join(work_dir, "empty")
+        os.makedirs(empty_dir)
+        results = run({"database": (database_dir, None), "bundled": (empty_dir, bundle)}, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"Median of {args.repeat} starts, Python {platform.python_version()}")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "repeat": args.repeat,
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=1)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to store one")
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,691 @@
+"""Check the rebuild and the API for regressions against the fixture database.
+
+Builds the fixture database of tools/bench_api.py in a scratch directory and
+runs every check in CHECKS against it, printing OK or FAIL for each. Nothing
+is fetched from the network. Exits with status 1 if any check fails.
+
+    python tools/check_api.py
+"""
+import contextlib
+import gc
+import gzip
+import io
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import traceback
+import zipfile
+from random import Random
+
+import requests
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, ".."))
+import dbdmanager
+import dbdscraper
+from bench_api import fixture_scraped, seed_database
+
+def check_icon_mirror(work_dir):
+    """Mirroring icons skips rows without an icon instead of failing the rebuild."""
+    archive = os.path.join(work_dir, "empty.zip")
+    dbdscraper.use_fixture_archive(archive, "record")
+    dbdscraper.save_fixture_archive()
+    # Replaying an empty archive fails every download at once, without the network
+    dbdscraper.use_fixture_archive(archive, "replay")
+    try:
+        scraped = fixture_scraped()
+        assert any(icon is None for _, _, icon in scraped["killers"]), "the fixture has no killer without an icon"
+        counts = dbdmanager.mirror_icons(scraped)
+    finally:
+        dbdscraper.use_fixture_archive(None, None)
+    urls = {row[field] for table, field in dbdmanager.ICON_FIELDS.items() for row in scraped[table] if row[field]}
+    assert counts["failed"] == len(urls), f"expected {len(urls)} failed downloads, got {counts}"
+
+def check_quiz_cold_session(work_dir):
+    """A worker that never saw a quiz session deals a far-off question without dealing every round before it."""
+    client = dbdmanager.app.test_client()
+    session_id = client.post("/api/quiz", json={"kind": "perk", "role": "survivor"}).json["session_id"]
+    last = dbdmanager.QUIZ_MAX_INDEX
+    warm = client.get(f"/api/quiz/{session_id}/{last}")
+    # Forget the session, as a worker process that didn't create it would not have it
+    dbdmanager._quiz_sessions.clear()
+    cold = client.get(f"/api/quiz/{session_id}/{last}")
+    assert cold.status_code == 200, f"question {last} of a cold session answered {cold.status_code}"
+    assert cold.json == warm.json, "a cold session dealt a different question than the warm one"
+    response = client.get(f"/api/quiz/{session_id}/{last + 1}")
+    assert response.status_code == 400, f"question {last + 1} answered {response.status_code}, expected 400"
+
+def check_quiz_deck(work_dir):
+    """A quiz session asks every question once per round, so none repeats within a deck or across a round's end."""
+    session = dbdmanager.create_quiz_session("perk", "killer")
+    size = len(session.pool)
+    asked = [session.question(i)["chosen_perk"]["name"] for i in range(2 * size)]
+    pool = {perk.name for perk in session.pool}
+    for round_number in range(2):
+        deck = asked[round_number * size:(round_number + 1) * size]
+        assert len(set(deck)) == size, f"round {round_number} asked {size - len(set(deck))} questions twice"
+        assert set(deck) == pool, f"round {round_number} did not ask every question"
+    assert asked[size - 1] != asked[size], "the second round started with the first round's last question"
+
+    client = dbdmanager.app.test_client()
+    response = client.post("/api/quiz", json={"kind": "addon", "role": "killer", "allowed": ["The Killer 0"]})
+    assert response.status_code == 201, f"/api/quiz answered {response.status_code}"
+    session_id, size = response.json["session_id"], response.json["size"]
+    names = [client.get(f"/api/quiz/{session_id}/{i}").json["chosen_addon"]["name"] for i in range(size)]
+    assert len(set(names)) == size, f"an add-on quiz of {size} questions asked only {len(set(names))} of them"
+
+def check_sample_distinct(work_dir):
+    """sample_distinct draws min(k, n) distinct elements of its pool, and every element can be drawn."""
+    rng = Random(0)
+    pools = [(), (1,), tuple(range(5)), tuple(range(50)), dbdmanager.PoolView([(0, 1, 2), (), (3, 4)])]
+    for pool in pools:
+        for k in range(len(pool) + 3):
+            for _ in range(20):
+                drawn = dbdmanager.sample_distinct(pool, k, rng)
+                assert len(drawn) == min(k, len(pool)), f"drew {len(drawn)} of {k} from a pool of {len(pool)}"
+                assert len(set(drawn)) == len(drawn), f"drew {drawn} from {list(pool)}, with repeats"
+                assert set(drawn) <= set(pool), f"drew {drawn}, which is not all in {list(pool)}"
+    seen = set()
+    for _ in range(500):
+        seen.update(dbdmanager.sample_distinct(range(10), 2, rng))
+    assert seen == set(range(10)), f"500 draws of 2 out of 10 never drew {sorted(set(range(10)) - seen)}"
+
+def _query_count(client, kind):
+    prefix = f'dbd_sqlite_query_duration_seconds_count{{kind="{kind}"}} '
+    for line in client.get("/metrics").get_data(as_text=True).splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    raise AssertionError(f"/metrics has no {prefix.strip()} line")
+
+def check_search_query_metrics(work_dir):
+    """Queries made by /api/search through conn.execute show up in the /metrics query histograms."""
+    client = dbdmanager.app.test_client()
+    before = _query_count(client, "select")
+    response = client.get("/api/search?q=Hook")
+    assert response.status_code == 200, f"/api/search answered {response.status_code}"
+    after = _query_count(client, "select")
+    assert after > before, f"the select query count stayed at {before} after a search"
+
+def check_search_exact_name(work_dir):
+    """A search for a perk's exact name ranks it first, and the request's connection is closed afterwards."""
+    client = dbdmanager.app.test_client()
+    connect = dbdmanager.connect_database
+    opened = []
+
+    def recording_connect(path):
+        opened.append(connect(path))
+        return opened[-1]
+
+    dbdmanager.connect_database = recording_connect
+    try:
+        for name in ("Killer Perk 12", "survivor perk 3"):
+            response = client.get(f"/api/search?q={name}&kind=perk&limit=5")
+            assert response.status_code == 200, f"/api/search answered {response.status_code}"
+            data = response.get_json()
+            first = data["results"][0]["name"] if data["results"] else None
+            assert first and first.lower() == name.lower(), f"a search for {name!r} ranked {first!r} first"
+            assert data["more"], f"a search for {name!r} did not report another page"
+    finally:
+        dbdmanager.connect_database = connect
+    assert opened, "/api/search opened no connection"
+    for conn in opened:
+        try:
+            conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            continue
+        raise AssertionError("/api/search left its connection open after the request")
+
+def check_filter_validation(work_dir):
+    """Filters that aren't lists of strings are rejected with a 400 instead of matching nothing."""
+    client = dbdmanager.app.test_client()
+    for rarities in ("rare", ["rare", 3], {"rare": True}):
+        response = client.post("/api/random_build", json={"role": "killer", "rarities": rarities})
+        assert response.status_code == 400, f"rarities {rarities!r} answered {response.status_code}, expected 400"
+    response = client.post("/api/random_build", json={"role": "killer", "rarities": ["rare"]})
+    assert response.status_code == 200, f"a list of rarities answered {response.status_code}"
+    routes = {
+        "/api/random_build": "allowed", "/api/batch_random_build": "allowed", "/api/random_addons": "allowed",
+        "/api/random_perks": "allowed", "/api/quiz": "allowed",
+        "/api/custom_match_random_builds": "killerAllowed",
+    }
+    for route, field in routes.items():
+        for allowed in ("The Trapper", [1, 2], {"The Trapper": True}):
+            response = client.post(route, json={"role": "killer", "kind": "perk", field: allowed})
+            assert response.status_code == 400, f"{route} with {field} {allowed!r} answered {response.status_code}, expected 400"
+    response = client.post("/api/custom_match_random_builds", json={"survivorAllowed": "Meg Thomas"})
+    assert response.status_code == 400, f"a survivorAllowed string answered {response.status_code}, expected 400"
+
+def check_query_counted_once(work_dir):
+    """A query is one observation in the query histograms, however its rows are fetched."""
+    metrics = dbdmanager.get_metrics()
+    conn = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    fetches = {
+        "fetchall": lambda: conn.execute("SELECT 1").fetchall(),
+        "fetchone": lambda: conn.execute("SELECT 1").fetchone(),
+        "fetchmany": lambda: conn.execute("SELECT 1").fetchmany(10),
+        "iteration": lambda: list(conn.execute("SELECT name FROM killers")),
+        "no fetch": lambda: conn.execute("SELECT 1"),
+    }
+    try:
+        for name, fetch in fetches.items():
+            before = metrics.totals(("query", "select"), len(dbdmanager.METRICS_BUCKETS) + 2)
+            fetch()
+            after = metrics.totals(("query", "select"), len(dbdmanager.METRICS_BUCKETS) + 2)
+            moved = sum(after[:-1]) - sum(before[:-1])
+            assert moved == 1, f"a query read with {name} was counted {moved:g} times"
+    finally:
+        conn.close()
+
+def check_streamed_builds(work_dir):
+    """Streamed batch builds are valid JSON even when a chunk draws no builds, with or without NumPy."""
+    client = dbdmanager.app.test_client()
+    amount = dbdmanager.BATCH_BUILD_STREAM_THRESHOLD + 2 * dbdmanager.BATCH_BUILD_CHUNK
+    generate = dbdmanager.generate_random_builds
+    calls = []
+
+    def first_chunk_empty(role, chunk, allowed=None):
+        # The first chunk finds no characters, as if a rebuild removed them mid-stream
+        calls.append(chunk)
+        return None if len(calls) == 1 else generate(role, chunk, allowed)
+
+    numpy = dbdmanager.optional_module("numpy")
+    try:
+        for module in dict.fromkeys([numpy, None]):
+            dbdmanager._optional_modules["numpy"] = module
+            calls.clear()
+            dbdmanager.generate_random_builds = first_chunk_empty
+            # The response is streamed, so the builds are drawn as its body is read
+            body = client.get(f"/api/batch_random_build?role=killer&amount={amount}").get_data(as_text=True)
+            dbdmanager.generate_random_builds = generate
+            builds = json.loads(body)["builds"]
+            expected = amount - calls[0]
+            assert len(builds) == expected, f"expected {expected} builds, got {len(builds)}"
+    finally:
+        dbdmanager.generate_random_builds = generate
+        dbdmanager._optional_modules["numpy"] = numpy
+
+def check_cached_response_etags(work_dir):
+    """Each encoding of a cached catalog response has its own ETag, and only that tag gets a 304."""
+    client = dbdmanager.app.test_client()
+    encodings = ["identity", "gzip"] + (["br"] if dbdmanager.brotli is not None else [])
+    for path in ("/api/all_perks?role=any", "/api/all_addons"):
+        etags = {}
+        for encoding in encodings:
+            response = client.get(path, headers={"Accept-Encoding": encoding})
+            assert response.status_code == 200, f"{path} with {encoding} answered {response.status_code}"
+            sent = response.headers.get("Content-Encoding", "identity")
+            assert sent == encoding, f"{path} asked for {encoding} was sent as {sent}"
+            assert "Accept-Encoding" in response.headers.get("Vary", ""), f"{path} does not vary on Accept-Encoding"
+            etags[encoding] = response.headers["ETag"]
+            if encoding == "gzip":
+                body = gzip.decompress(response.get_data())
+                assert json.loads(body) == client.get(path, headers={"Accept-Encoding": "identity"}).json, \
+                    f"{path} gzipped is not the same JSON as uncompressed"
+        assert len(set(etags.values())) == len(etags), f"{path} shares an ETag between encodings: {etags}"
+        for encoding, etag in etags.items():
+            response = client.get(path, headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+            assert response.status_code == 304, f"{path} with its {encoding} ETag answered {response.status_code}"
+            assert not response.get_data(), f"the 304 for {path} has a body"
+            other = "gzip" if encoding == "identity" else "identity"
+            response = client.get(path, headers={"Accept-Encoding": other, "If-None-Match": etag})
+            assert response.status_code == 200, f"{path} as {other} answered 304 to the {encoding} ETag"
+
+def check_custom_match_constraints(work_dir):
+    """A custom match whose uniqueness constraints can't be met answers 409, and one that can meets them."""
+    client = dbdmanager.app.test_client()
+    survivors = [f"Survivor {i}" for i in range(4)]
+    impossible = [
+        {"survivorAllowed": survivors[:2], "survivors": 4, "uniqueSurvivors": True},
+        {"survivorAllowed": survivors[:2], "survivors": 2, "uniquePerks": True},
+    ]
+    for options in impossible:
+        response = client.post("/api/custom_match_random_builds", json=options)
+        assert response.status_code == 409, f"{options} answered {response.status_code}, expected 409"
+        assert response.json.get("error"), f"the 409 for {options} has no error message"
+    # Four survivors have the 12 perks that three distinct builds need
+    options = {"survivorAllowed": survivors, "survivors": 3, "uniquePerks": True, "uniqueItems": True}
+    for _ in range(20):
+        response = client.post("/api/custom_match_random_builds", json=options)
+        assert response.status_code == 200, f"{options} answered {response.status_code}"
+        lobby = response.json["survivors"]
+        names = [build["survivor"]["name"] for build in lobby]
+        perks = [perk["name"] for build in lobby for perk in build["perks"]]
+        items = [build["item"]["name"] for build in lobby]
+        assert len(lobby) == 3 and len(set(names)) == 3, f"the lobby's survivors are {names}"
+        assert len(perks) == 12 and len(set(perks)) == 12, f"the lobby's survivors share perks: {perks}"
+        assert len(set(items)) == 3, f"the lobby's survivors share items: {items}"
+    response = client.post("/api/custom_match_random_builds", json={**impossible[0], "uniqueSurvivors": False})
+    assert response.status_code == 200, f"a lobby that may repeat survivors answered {response.status_code}"
+
+def _write_archive(path, responses):
+    """Write a fixture archive answering each url in responses with its (status, body)."""
+    entries = {}
+    with zipfile.ZipFile(path, "w") as archive:
+        for i, (url, (status, body)) in enumerate(responses.items()):
+            entries[url] = {"status": status, "encoding": "utf-8", "headers": {}, "body": f"bodies/{i}"}
+            archive.writestr(f"bodies/{i}", body)
+        archive.writestr("manifest.json", json.dumps({
+            "version": dbdscraper.FIXTURE_VERSION, "wiki_base": dbdscraper.WIKI_BASE, "entries": entries,
+        }))
+
+def check_error_pages(work_dir):
+    """An error response from the wiki is never parsed: the cached copy is used, or the fetch fails."""
+    cached_url, uncached_url = dbdscraper.WIKI_BASE + "/wiki/Killers", dbdscraper.WIKI_BASE + "/wiki/Perks"
+    archive = os.path.join(work_dir, "errors.zip")
+    error_page = "<html><body>Service Unavailable</body></html>"
+    _write_archive(archive, {cached_url: (503, error_page), uncached_url: (503, error_page)})
+    page_cache_dir = dbdscraper.PAGE_CACHE_DIR
+    dbdscraper.PAGE_CACHE_DIR = os.path.join(work_dir, "pages")
+    os.makedirs(dbdscraper.PAGE_CACHE_DIR)
+    cached_page = "<html><body><table><tr><td>cached</td></tr></table></body></html>"
+    with open(os.path.join(dbdscraper.PAGE_CACHE_DIR, "cached.html"), "w", encoding="utf-8") as f:
+        f.write(cached_page)
+    dbdscraper._save_page_index({cached_url: {"sha256": "cached", "etag": '"1"', "last_modified": None}})
+    dbdscraper.use_fixture_archive(archive, "replay")
+    try:
+        assert dbdscraper.fetch_page(cached_url) == cached_page, "a 503 did not fall back to the cached copy"
+        try:
+            text = dbdscraper.fetch_page(uncached_url)
+        except requests.HTTPError:
+            pass
+        else:
+            raise AssertionError(f"a 503 without a cached copy returned {text!r}")
+    finally:
+        dbdscraper.use_fixture_archive(None, None)
+        dbdscraper.PAGE_CACHE_DIR = page_cache_dir
+
+def check_page_cache_pruned(work_dir):
+    """The page index is written once per scrape, and a page's old body is deleted when it changes."""
+    urls = [dbdscraper.WIKI_BASE + f"/wiki/Page_{i}" for i in range(3)]
+    page_cache_dir, save = dbdscraper.PAGE_CACHE_DIR, dbdscraper._save_page_index
+    dbdscraper.PAGE_CACHE_DIR = os.path.join(work_dir, "pruned_pages")
+    saves = []
+
+    def counting_save(index):
+        saves.append(dict(index))
+        save(index)
+
+    dbdscraper._save_page_index = counting_save
+    try:
+        for version in ("old", "new"):
+            archive = os.path.join(work_dir, f"pages_{version}.zip")
+            _write_archive(archive, {url: (200, f"<html><body>{url} {version}</body></html>") for url in urls})
+            dbdscraper.use_fixture_archive(archive, "replay")
+            try:
+                for url in urls:
+                    dbdscraper.fetch_page(url)
+            finally:
+                dbdscraper.use_fixture_archive(None, None)
+            dbdscraper.save_page_index()
+        assert len(saves) == 2, f"the page index was written {len(saves)} times for two scrapes"
+        bodies = sorted(name for name in os.listdir(dbdscraper.PAGE_CACHE_DIR) if name.endswith(".html"))
+        expected = sorted(entry["sha256"] + ".html" for entry in saves[-1].values())
+        assert bodies == expected, f"the page cache kept {len(bodies)} bodies for {len(expected)} pages"
+        assert all(dbdscraper._read_cached_page(entry).endswith("new</body></html>") for entry in saves[-1].values()), \
+            "the page index does not point at the new bodies"
+    finally:
+        dbdscraper._save_page_index = save
+        dbdscraper.PAGE_CACHE_DIR = page_cache_dir
+
+def check_clean_cache(work_dir):
+    """Cleaned descriptions are cached by their cell's content, with lxml as with html.parser."""
+    parsers = ["html.parser"] + (["lxml"] if dbdmanager.optional_module("lxml") else [])
+    html_parser = dbdscraper.HTML_PARSER
+    try:
+        for parser in parsers:
+            dbdscraper.HTML_PARSER = parser
+            dbdscraper._clean_cache.clear()
+            first, second = (
+                dbdscraper.parse_html(f"<table><tr><td><a href='/x'>Hex</a>: {word}</td></tr></table>").td
+                for word in ("Ruin", "Plaything")
+            )
+            assert dbdscraper.clean_description_html(first) == "Hex: Ruin"
+            assert len(dbdscraper._clean_cache) == 1, f"a cell parsed by {parser} was not cached"
+            # Same place in the same-shaped page, different content
+            assert dbdscraper.clean_description_html(second) == "Hex: Plaything", \
+                f"a cell parsed by {parser} was served another cell's cached description"
+    finally:
+        dbdscraper.HTML_PARSER = html_parser
+        dbdscraper._clean_cache.clear()
+
+def check_parser_parity(work_dir):
+    """The scrapers give the same output with the default parser as with full html.parser trees, on the fixture pages."""
+    parity = subprocess.run(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_parity.py")],
+        capture_output=True, text=True, cwd=work_dir,
+    )
+    failures = [line for line in parity.stdout.splitlines() if not line.startswith("OK")]
+    assert parity.returncode == 0 and not failures, "\n".join(failures) or parity.stderr[-2000:]
+
+def check_offline_icons(work_dir):
+    """Offline icons are stored as paths on the API's own address, and their thumbnails are served."""
+    Image = dbdmanager.optional_module("PIL.Image")
+    icon = io.BytesIO()
+    if Image is not None:
+        Image.new("RGBA", (256, 256), "red").save(icon, "PNG")
+    scraped = fixture_scraped()
+    urls = {row[field] for table, field in dbdmanager.ICON_FIELDS.items() for row in scraped[table] if row[field]}
+    archive = os.path.join(work_dir, "icons.zip")
+    _write_archive(archive, {url: (200, icon.getvalue()) for url in urls})
+    dbdscraper.use_fixture_archive(archive, "replay")
+    dbdmanager.OFFLINE_ICONS = True
+    try:
+        dbdmanager.mirror_icons(scraped)
+    finally:
+        dbdmanager.OFFLINE_ICONS = False
+        dbdscraper.use_fixture_archive(None, None)
+    path = scraped["killer_perks"][0][0]
+    assert path.startswith("/icons/"), f"an offline icon was stored as {path}"
+
+    client = dbdmanager.app.test_client()
+    response = client.get(path + "?size=7")
+    assert response.status_code == 400, f"an unknown thumbnail size answered {response.status_code}"
+    if Image is None:
+        return
+    for accept, mimetype in (("image/webp,*/*", "image/webp"), ("image/png", "image/png")):
+        response = client.get(f"{path}?size=64", headers={"Accept": accept})
+        assert response.status_code == 200, f"a thumbnail answered {response.status_code}"
+        assert response.mimetype == mimetype, f"Accept: {accept} got a {response.mimetype} thumbnail"
+        assert Image.open(io.BytesIO(response.data)).size == (64, 64), "the thumbnail is not 64 pixels"
+        response.close()
+    sheet = client.get("/api/icon_sprites/killer", base_url="http://192.168.1.20:8080").json["sheet"]
+    assert sheet.startswith("http://192.168.1.20:8080/icons/"), f"the sprite sheet of a LAN client is at {sheet}"
+
+class _NoFts5Connection(dbdmanager._MeteredConnection):
+    """A connection to an SQLite built without FTS5."""
+
+    def execute(self, sql, *args):
+        if "USING fts5" in sql:
+            raise sqlite3.OperationalError("no such module: fts5")
+        return super().execute(sql, *args)
+
+def check_search_index_migration(work_dir):
+    """The search index migration is retried once SQLite has FTS5, also where it was wrongly recorded as applied."""
+    path = os.path.join(work_dir, "migrations.db")
+    conn = sqlite3.connect(path, factory=_NoFts5Connection)
+    dbdmanager.migrate_database(conn)
+    conn.close()
+    conn = dbdmanager.connect_database(path)
+    try:
+        assert not dbdmanager.has_search_index(conn), "the search index exists without FTS5"
+        dbdmanager.migrate_database(conn)
+        assert dbdmanager.has_search_index(conn), "the search index was not created once FTS5 was available"
+        # A database that recorded every migration but has no index, as the old migrate_database left it
+        conn.execute("DROP TABLE search_terms")
+        conn.execute("DROP TABLE search_index")
+        conn.commit()
+        dbdmanager.migrate_database(conn)
+        assert dbdmanager.has_search_index(conn), "the search index was not restored on an upgraded database"
+    finally:
+        conn.close()
+
+def _table_ids(tables):
+    conn = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    try:
+        return {table: dict(conn.execute(f"SELECT name, id FROM {table}")) for table in tables}
+    finally:
+        conn.close()
+
+def check_refresh_keeps_ids(work_dir):
+    """An incremental refresh only writes the rows that changed, and every row still on the wiki keeps its id."""
+    scraped = fixture_scraped()
+    perks = scraped["killer_perks"] = list(scraped["killer_perks"])
+    removed = perks.pop(5)[1]
+    icon, changed, description, killer = perks[5]
+    perks[5] = (icon, changed, description + "<p>Changed.</p>", killer)
+    perks.append((None, "New Killer Perk", "<p>New.</p>", None))
+    before = _table_ids(dbdmanager.SYNC_COLUMNS)
+    scrape_all, icon_mirror = dbdscraper.scrape_all, dbdmanager.ICON_MIRROR
+    dbdmanager.ICON_MIRROR = False
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            dbdscraper.scrape_all = lambda: scraped
+            diff = dbdmanager.refresh_database()
+            after = _table_ids(dbdmanager.SYNC_COLUMNS)
+            # Put the fixture back for the checks that follow
+            dbdscraper.scrape_all = fixture_scraped
+            dbdmanager.refresh_database()
+    finally:
+        dbdscraper.scrape_all, dbdmanager.ICON_MIRROR = scrape_all, icon_mirror
+    counts = {kind: diff["killer_perks"][kind] for kind in ("inserted", "updated", "retired")}
+    assert counts == {"inserted": 1, "updated": 1, "retired": 1}, f"the refresh wrote {counts} killer perks"
+    unchanged = [table for table, counts in diff.items() if table != "killer_perks" and any(counts.values())]
+    assert not unchanged, f"the refresh wrote rows of unchanged tables: {unchanged}"
+    assert removed not in after["killer_perks"], "a perk gone from the wiki was kept"
+    for table, ids in before.items():
+        moved = [name for name, row_id in ids.items() if name in after[table] and after[table][name] != row_id]
+        assert not moved, f"the refresh changed the ids of {table}: {moved[:5]}"
+
+def check_shadow_swap(work_dir):
+    """During a rebuild the old database stays readable, and a connection opened before the swap keeps reading it."""
+    client = dbdmanager.app.test_client()
+    reader = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    generation = reader.execute("PRAGMA user_version").fetchone()[0]
+    killers = reader.execute("SELECT COUNT(*) FROM killers").fetchone()[0]
+    validate = dbdmanager.validate_database
+    during = {}
+
+    def validate_and_read(conn):
+        validate(conn)
+        # The shadow is fully written now; nothing has replaced DB_PATH yet
+        during["generation"] = reader.execute("PRAGMA user_version").fetchone()[0]
+        during["killers"] = reader.execute("SELECT COUNT(*) FROM killers").fetchone()[0]
+        during["status"] = client.get("/api/characters").status_code
+
+    dbdmanager.validate_database = validate_and_read
+    try:
+        with dbdmanager._BuildLock(), contextlib.redirect_stdout(io.StringIO()):
+            dbdmanager._build_database(fixture_scraped(), copy_current=True)
+        assert during == {"generation": generation, "killers": killers, "status": 200}, \
+            f"the old database read {during} during the rebuild, expected generation {generation} with {killers} killers"
+        after = reader.execute("PRAGMA user_version").fetchone()[0]
+        assert after == generation, f"a connection opened before the swap read generation {after}"
+    finally:
+        dbdmanager.validate_database = validate
+        reader.close()
+    new = dbdmanager.read_db_generation()
+    assert new == generation + 1, f"the swapped-in database is generation {new}, expected {generation + 1}"
+
+def check_rollback_journal(work_dir):
+    """A rebuilt database uses the rollback journal, and no -wal or -shm file is left next to it."""
+    with dbdmanager._BuildLock():
+        dbdmanager._build_database(fixture_scraped(), copy_current=True)
+    conn = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    try:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+    assert mode == "delete", f"the rebuilt database is in {mode} mode"
+    sidecars = [suffix for suffix in ("-wal", "-shm") if os.path.exists(dbdmanager.DB_PATH + suffix)]
+    assert not sidecars, f"the swap left {', '.join(sidecars)} next to the database"
+
+def check_sync_conflicts(work_dir):
+    """A rebuild keeps row ids, resolves descriptions swapped between rows, and reports true duplicates."""
+    conn = dbdmanager.connect_database(os.path.join(work_dir, "sync.db"))
+    try:
+        dbdmanager.migrate_database(conn)
+        scraped = fixture_scraped()
+        dbdmanager.write_scraped_data(conn, scraped)
+        ids = dict(conn.execute("SELECT name, id FROM killer_perks"))
+        perks = scraped["killer_perks"] = list(scraped["killer_perks"])
+        (icon_a, name_a, desc_a, killer_a), (icon_b, name_b, desc_b, killer_b) = perks[:2]
+        perks[0], perks[1] = (icon_a, name_a, desc_b, killer_a), (icon_b, name_b, desc_a, killer_b)
+        perks.append((None, "Duplicate Perk", desc_a, None))
+        diff = dbdmanager.write_scraped_data(conn, scraped)["killer_perks"]
+        descriptions = dict(conn.execute("SELECT name, description FROM killer_perks"))
+        after = dict(conn.execute("SELECT name, id FROM killer_perks"))
+    finally:
+        conn.close()
+    assert (descriptions[name_a], descriptions[name_b]) == (desc_b, desc_a), "swapped descriptions were not both saved"
+    assert diff["updated"] == 2 and diff["conflicts"] == 1, f"expected 2 updates and 1 conflict, got {diff}"
+    assert "Duplicate Perk" not in after, "a row duplicating another's description was saved"
+    assert after == ids, "row ids changed across a rebuild"
+
+    # The command-line rebuild takes the same id-preserving path as an update
+    conn = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    try:
+        conn.execute("DELETE FROM survivors WHERE id = (SELECT MIN(id) FROM survivors)")
+        conn.commit()
+        before = dict(conn.execute("SELECT name, id FROM survivors"))
+    finally:
+        conn.close()
+    scrape_all, icon_mirror = dbdscraper.scrape_all, dbdmanager.ICON_MIRROR
+    dbdscraper.scrape_all, dbdmanager.ICON_MIRROR = fixture_scraped, False
+    try:
+        dbdmanager.init_database()
+    finally:
+        dbdscraper.scrape_all, dbdmanager.ICON_MIRROR = scrape_all, icon_mirror
+    conn = dbdmanager.connect_database(dbdmanager.DB_PATH)
+    try:
+        rebuilt = dict(conn.execute("SELECT name, id FROM survivors"))
+    finally:
+        conn.close()
+    assert all(rebuilt[name] == row_id for name, row_id in before.items()), "the command-line rebuild renumbered rows"
+
+def check_update_job_dedup(work_dir):
+    """An update is not started while another process holds the build lock, and its running job is returned instead."""
+    client = dbdmanager.app.test_client()
+    # Locks are per open file, so a second _BuildLock stands in for another worker process
+    other_worker = dbdmanager._BuildLock()
+    assert other_worker.acquire(blocking=False), "the build lock is already taken"
+    try:
+        response = client.post("/api/update")
+        assert response.status_code == 409, f"an update during a rebuild answered {response.status_code}, expected 409"
+        # The job the other worker saved when it started its update
+        job = {"job_id": "otherworker", "status": "running", "message": "Database update in progress.",
+               "changes": None, "generation": 0, "started_at": 0.0, "finished_at": None}
+        dbdmanager._save_update_job(job)
+        try:
+            running = dbdmanager.start_update_job()
+            assert running is not None and running["job_id"] == job["job_id"], \
+                f"expected the other worker's job, got {running}"
+        finally:
+            os.remove(os.path.join(dbdmanager.UPDATE_JOBS_DIR, job["job_id"] + ".json"))
+        assert not dbdmanager._BuildLock().acquire(blocking=False), "a second build lock was taken"
+    finally:
+        other_worker.release()
+
+def check_abandoned_update_job(work_dir):
+    """A job left running by a process that died is reported as failed, not as running forever."""
+    client = dbdmanager.app.test_client()
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    other_worker = dbdmanager._BuildLock()
+    assert other_worker.acquire(blocking=False), "the build lock is already taken"
+    jobs = [
+        # Saved with the id of its process, or by an older version without it
+        {"job_id": "crashedworker", "pid": dead.pid},
+        {"job_id": "crashedoldworker"},
+    ]
+    try:
+        for job in jobs:
+            job.update({"status": "running", "message": "Database update in progress.", "changes": None,
+                        "generation": 0, "started_at": 0.0, "finished_at": None})
+        dbdmanager._save_update_job(jobs[0])
+        # The build lock is held by a rebuild from the command line, not by the job
+        assert dbdmanager.start_update_job() is None, "a crashed worker's job was returned as running"
+        dbdmanager._save_update_job(jobs[1])
+        # Without a process id, the job is only known to be abandoned once the lock is free
+        other_worker.release()
+        for job in jobs:
+            data = client.get(f"/api/update/{job['job_id']}").get_json()
+            assert data["status"] == "error", f"{job['job_id']}'s status is {data['status']}"
+            assert "pid" not in data, "the job's process id was returned"
+    finally:
+        if other_worker.file is not None:
+            other_worker.release()
+        for job in jobs:
+            os.remove(os.path.join(dbdmanager.UPDATE_JOBS_DIR, job["job_id"] + ".json"))
+
+def check_serve_fast_failures(work_dir):
+    """Serve mode builds the cached responses before forking, and gives up on workers that die on startup."""
+    saved = {
+        name: getattr(dbdmanager, name)
+        for name in ("_serve_worker", "SERVE_RESPAWN_MAX_DELAY", "SERVE_MAX_FAST_FAILURES")
+    }
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    starts = []
+
+    def failing_worker(sock, host, port):
+        os._exit(1)
+
+    def counting_fork():
+        pid = fork()
+        if pid:
+            starts.append(pid)
+        return pid
+
+    fork = os.fork
+    dbdmanager._serve_worker = failing_worker
+    dbdmanager.SERVE_RESPAWN_MAX_DELAY = 0
+    dbdmanager.SERVE_MAX_FAST_FAILURES = 3
+    os.fork = counting_fork
+    try:
+        dbdmanager.serve("127.0.0.1", 0, workers=2)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("serve returned although every worker died on startup")
+    finally:
+        os.fork = fork
+        gc.unfreeze()
+        for name, value in saved.items():
+            setattr(dbdmanager, name, value)
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    # Two workers, each started until its third fast failure, one of which ends serving
+    assert len(starts) <= 2 * 3, f"serve started {len(starts)} workers before giving up"
+    responses = dbdmanager.get_catalog().responses
+    assert "all_addons" in responses and ("all_perks", "any") in responses, \
+        "the cached responses were not built before forking"
+
+CHECKS = [
+    check_icon_mirror,
+    check_quiz_cold_session,
+    check_quiz_deck,
+    check_sample_distinct,
+    check_search_query_metrics,
+    check_search_exact_name,
+    check_query_counted_once,
+    check_filter_validation,
+    check_streamed_builds,
+    check_cached_response_etags,
+    check_custom_match_constraints,
+    check_error_pages,
+    check_page_cache_pruned,
+    check_clean_cache,
+    check_parser_parity,
+    check_offline_icons,
+    check_search_index_migration,
+    check_refresh_keeps_ids,
+    check_shadow_swap,
+    check_rollback_journal,
+    check_sync_conflicts,
+    check_update_job_dedup,
+    check_abandoned_update_job,
+    check_serve_fast_failures,
+]
+
+def main():
+    # Failed downloads and rebuild progress are logged, which would bury the results
+    logging.disable(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="check_api_")
+    seed_database(work_dir)
+    failures = 0
+    for check in CHECKS:
+        try:
+            check(work_dir)
+        except Exception:
+            failures += 1
+            print(f"FAIL  {check.__doc__}\n{traceback.format_exc()}")
+        else:
+            print(f"OK    {check.__doc__}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
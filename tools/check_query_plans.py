@@ -0,0 +1,76 @@
+"""Check that the database's query shapes are answered from an index.
+
+Applies the schema migrations to a fresh in-memory database (or opens an
+existing one with --db) and runs EXPLAIN QUERY PLAN on each filtered lookup
+and join. Exits with status 1 if any of them scans a table it should search.
+
+    python tools/check_query_plans.py [--db dbd_data.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdmanager
+
+# (description, query, parameters, tables that must be searched rather than
+# scanned, named by their alias where the query gives one)
+QUERY_SHAPES = [
+    ("killer perks by killer", "SELECT id FROM killer_perks WHERE killer_id = ?", (1,), ["killer_perks"]),
+    ("survivor perks by survivor", "SELECT id FROM survivor_perks WHERE survivor_id = ?", (1,), ["survivor_perks"]),
+    ("killer add-ons by killer", "SELECT id FROM killer_addons WHERE killer_id = ?", (1,), ["killer_addons"]),
+    ("killer add-ons by killer and rarity",
+     "SELECT id FROM killer_addons WHERE killer_id = ? AND rarity = ?", (1, "rare"), ["killer_addons"]),
+    ("survivor add-ons by item", "SELECT id FROM survivor_addons WHERE item = ?", (1,), ["survivor_addons"]),
+    ("survivor add-ons by item and rarity",
+     "SELECT id FROM survivor_addons WHERE item = ? AND rarity = ?", (1, "rare"), ["survivor_addons"]),
+    ("offerings by role", "SELECT id FROM offerings WHERE role IN (?, 'all')", ("killer",), ["offerings"]),
+    ("offerings by role and rarity",
+     "SELECT id FROM offerings WHERE role IN (?, 'all') AND rarity = ?", ("killer", "rare"), ["offerings"]),
+    ("killer by power", "SELECT id FROM killers WHERE power = ?", ("Blink",), ["killers"]),
+    ("killer perk owners",
+     "SELECT kp.name, k.name FROM killer_perks kp LEFT JOIN killers k ON kp.killer_id = k.id", (), ["k"]),
+    ("survivor perk owners",
+     "SELECT sp.name, s.name FROM survivor_perks sp LEFT JOIN survivors s ON sp.survivor_id = s.id", (), ["s"]),
+    ("killer add-on owners",
+     "SELECT a.name, k.name FROM killer_addons a LEFT JOIN killers k ON a.killer_id = k.id", (), ["k"]),
+    ("survivor add-on items",
+     "SELECT a.name, i.name FROM survivor_addons a LEFT JOIN survivor_items i ON a.item = i.id", (), ["i"]),
+    # Deleting a parent row checks its children through the foreign key
+    ("killer perks of a retired killer", "SELECT 1 FROM killer_perks WHERE killer_id = ? LIMIT 1", (1,), ["killer_perks"]),
+]
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+def scanned_tables(plan, tables):
+    """Return the tables in tables that plan reads without an index."""
+    scanned = []
+    for table in tables:
+        steps = [step.split() for step in plan if table in step.split()]
+        if not steps or any(words[0] == "SCAN" or "USING" not in words for words in steps):
+            scanned.append(table)
+    return scanned
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database to check instead of a freshly migrated one")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db or ":memory:")
+    if not args.db:
+        dbdmanager.migrate_database(conn)
+    print(f"Schema version {dbdmanager.get_schema_version(conn)}")
+
+    failures = 0
+    for description, query, params, tables in QUERY_SHAPES:
+        plan = query_plan(conn, query, params)
+        scanned = scanned_tables(plan, tables)
+        print(f"{'SCAN' if scanned else 'OK':5} {description}: {'; '.join(plan)}")
+        failures += bool(scanned)
+    conn.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Write fixtures/wiki.zip, a small offline copy of the wiki pages the scrapers read.
+
+The pages follow the wiki's markup (page chrome around the article, tabbers,
+wikitables, rarity classes, links and formatting in descriptions) for a few
+killers, survivors, items and offerings, so the scrapers can be run and
+compared without network access. The archive is a fixture archive that
+--replay and tools/parser_parity.py read. A recording of the live wiki
+(dbdmanager.py rebuild --record) can be used in its place.
+
+    python tools/make_wiki_fixture.py [fixtures/wiki.zip]
+"""
+import hashlib
+import json
+import os
+import sys
+import zipfile
+from html import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdscraper
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures", "wiki.zip")
+ICON_BASE = "https://static.wikia.nocookie.net/deadbydaylight_gamepedia_en/images"
+
+# (killer, power, short name, perks); the Nurse's add-ons are only on her own page
+KILLERS = [
+    ("The Trapper", "Bear Trap", "Trapper", ["Unnerving Presence", "Brutal Strength", "Agitation"]),
+    ("The Wraith", "Wailing Bell", "Wraith", ["Predator", "Bloodhound", "Shadowborn"]),
+    ("The Hag", "Blackened Catalyst", "Hag", ["Hex: Ruin", "Hex: The Third Seal", "Hex: Devour Hope"]),
+    ("The Nurse", "Spencer's Last Breath", "Nurse", ["Stridor", "Thanatophobia", "A Nurse's Calling"]),
+]
+KILLER_ADDONS = {
+    "Bear Trap": [("Padded Jaws", "common"), ("Trapper Sack", "uncommon"), ("Honing Stone", "very rare"),
+                  ("Iridescent Stone", "ultra rare")],
+    "Wailing Bell": [("Bone Clapper", "common"), ("Blind Warrior - Mud", "rare"), ("Coxcombed Clapper", "very rare")],
+    "Blackened Catalyst": [("Powdered Eggshell", "common"), ("Rope Necklet", "uncommon"), ("Mint Rag", "ultra rare")],
+    "Spencer's Last Breath": [("Wooden Horse", "common"), ("Bad Man's Last Breath", "rare"),
+                              ("Kavanagh's Last Breath", "ultra rare")],
+}
+# (survivor, wiki page, perks); the wiki lists the Troupe's two survivors as one
+SURVIVORS = [
+    ("Dwight Fairfield", "Dwight_Fairfield", ["Bond", "Prove Thyself", "Leader"]),
+    ("Meg Thomas", "Meg_Thomas", ["Quick & Quiet", "Sprint Burst", "Adrenaline"]),
+    ("Claudette Morel", "Claudette_Morel", ["Empathy", "Botany Knowledge", "Self-Care"]),
+    ("Troupe", "Troupe", ["Bardic Inspiration", "Still Sight", "Mirrored Illusion"]),
+]
+# Item tabs of the add-ons page; the last add-on of each is retired
+ITEMS = {
+    "Flashlights": [("Battery", "common"), ("Wide Lens", "uncommon"), ("Heavy Duty Battery", "rare"),
+                    ("Odd Bulb", "ultra rare")],
+    "Toolboxes": [("Clean Rag", "common"), ("Socket Swivels", "uncommon"), ("Brand New Part", "ultra rare")],
+    "Med-Kits": [("Bandages", "common"), ("Gauze Roll", "uncommon"), ("Styptic Agent", "very rare")],
+    "Maps": [("Yellow Wire", "uncommon"), ("Red Twine", "rare"), ("Glass Bead", "rare")],
+}
+OFFERINGS = [
+    ("Bloody Party Streamers", "Ultra Rare", "All Players"),
+    ("Escape! Cake", "Ultra Rare", "All Players"),
+    ("Ebony Memento Mori", "Ultra Rare", "Killers"),
+    ("Cypress Memento Mori", "Uncommon", "Killers"),
+    ("Sacrificial Ward", "Very Rare", "Survivors"),
+    ("Chalk Pouch", "Uncommon", "Survivors"),
+    ("Shroud of Separation", "Rare", "Survivors"),
+]
+FLASHLIGHTS = [("Flashlight", True), ("Sport Flashlight", True), ("Will Power Flashlight", False)]
+
+def href(title):
+    return "/wiki/" + title.replace(" ", "_")
+
+def icon(name):
+    file = "".join(ch for ch in name.title() if ch.isalnum())
+    return f"{ICON_BASE}/{hashlib.md5(file.encode()).hexdigest()[:2]}/Icon_{file}.png/revision/latest?cb=20240101"
+
+def page(title, article):
+    # Navigation and footer chrome outside the article, like the wiki's skin
+    return (
+        f'<!DOCTYPE html><html><head><title>{escape(title)} | Dead by Daylight Wiki | Fandom</title></head><body>'
+        f'<nav class="global-navigation"><h3>Explore</h3><table class="navbox"><tr><th>Nav</th></tr></table>'
+        f'<div><a href="/wiki/Main_Page" title="Main Page">Main Page</a></div></nav>'
+        f'<main class="page__main"><div class="mw-parser-output">{article}</div></main>'
+        f'<footer><h3>Follow us</h3><p>Fandom</p></footer></body></html>'
+    )
+
+def description(name, number):
+    return (
+        f'<p>Unlocks potential in your <a href="/wiki/Aura" title="Aura">Aura</a>-reading ability. '
+        f'<b>{escape(name)}</b> grants the following effect for <span style="color:#E7DA7A">{number}</span>'
+        f'/<span style="color:#9BD9D5">{number + 2}</span>&#160;seconds:</p>'
+        f'<ul><li>Suffer from the <a href="/wiki/Status_Effects#Exposed" title="Status Effects">Exposed</a> '
+        f'Status Effect&#8217;s penalty &amp; <i>lose</i> {number}&#160;%.</li></ul>'
+    )
+
+def addon_rows(addons, rarity_class, retired=False):
+    rows = ["<tr><th>Icon</th><th>Name</th><th>Description</th></tr>"]
+    for number, (name, rarity) in enumerate(addons):
+        tooltip = '<span class="tooltip borderless">Retired</span>' if retired and number == len(addons) - 1 else ""
+        rows.append(
+            f'<tr><th><div class="{rarity_class(rarity.replace(" ", "-") + "-item-element")}" '
+            f'style="--assembly-image-size: 128px;"><img src="{icon(name)}" alt="{escape(name)}"/></div></th>'
+            f'<th><a href="{href(name)}" title="{escape(name)}">{escape(name)}</a></th>'
+            f'<td>{description(name, number + 1)}{tooltip}</td></tr>'
+        )
+    return '<table class="wikitable">' + "".join(rows) + "</table>"
+
+def perk_rows(perks):
+    rows = ["<tr><th>Icon</th><th>Name</th><th>Character</th><th>Description</th></tr>"]
+    for number, (name, owner_link, owner_icon) in enumerate(perks):
+        rows.append(
+            f'<tr><th><a href="{href(name)}"><img alt="{escape(name)}" src="data:image/gif;base64,R0lGODlhAQABAIABAAAAAP///yH5BAEAAAEALAAAAAABAAEAQAICTAEAOw%3D%3D" '
+            f'data-src="{icon(name)}"/></a></th>'
+            f'<th><a href="{href(name)}" title="{escape(name)}">{escape(name)}</a></th>'
+            f'<th>{owner_link}<img src="{owner_icon}"/></th>'
+            f'<td>{description(name, number + 1)}</td></tr>'
+        )
+    return '<table class="wikitable sortable">' + "".join(rows) + "</table>"
+
+def killers_page():
+    powers = "".join(
+        f'<th><a href="{href(power)}" title="{escape(power)}">{escape(power)}</a><br/>'
+        f'<a href="{href(killer)}" title="{escape(killer)}">{escape(killer)}</a></th>'
+        for killer, power, _, _ in KILLERS
+    )
+    perks = [
+        (perk, f'<a href="{href(killer)}" title="{escape(killer)}">{escape(short)}</a>',
+         "//static.wikia.nocookie.net/deadbydaylight_gamepedia_en/images/" + short + "Portrait.png")
+        for killer, _, short, killer_perks in KILLERS for perk in killer_perks
+    ]
+    return page("Killers", (
+        '<p>The <b>Killers</b> hunt the <a href="/wiki/Survivors" title="Survivors">Survivors</a>.</p>'
+        f'<h2>Killers</h2><table class="wikitable"><tr>{powers}</tr></table>'
+        f"<h2>Perks</h2>{perk_rows(perks)}"
+    ))
+
+def survivors_page():
+    perks = [
+        (perk, f'<a href="/wiki/{page_name}" title="{escape(name)}">{escape(name)}</a>',
+         f"/images/{page_name}Portrait.png")
+        for name, page_name, survivor_perks in SURVIVORS for perk in survivor_perks
+    ]
+    roster = "".join(f'<a href="/wiki/{page_name}" title="{escape(name)}">{escape(name)}</a>' for name, page_name, _ in SURVIVORS)
+    return page("Survivors", (
+        '<p>The <b>Survivors</b> try to escape the <a href="/wiki/Killers" title="Killers">Killers</a>.</p>'
+        '<table class="wikitable"><tr><th>Overview</th></tr><tr><td>Four Survivors per Trial.</td></tr></table>'
+        f"<h2>Perks</h2>{perk_rows(perks)}"
+        '<table class="wikitable"><tr><th>Chapters</th></tr><tr><td>Chapter I</td></tr></table>'
+        '<table class="wikitable"><tr><th>SURVIVORS</th></tr>'
+        f'<tr><td>{roster}<a href="/wiki/File:Roster.png" title="File:Roster.png">Roster</a>'
+        '<a href="/wiki/Chapter_II" title="Chapter II">Chapter II</a></td></tr></table>'
+    ))
+
+def addons_page():
+    tabs = "".join(
+        f'<div class="wds-tab__content"><h3>{escape(item)}</h3>'
+        f'<figure><a href="{href(item)}"><img src="/images/{item}.png"/></a></figure>'
+        f'<p>{escape(item)} are <a href="/wiki/Items" title="Items">Items</a> Survivors bring into the Trial.</p>'
+        f'<p>Their Add-ons are listed below.</p>'
+        f'{addon_rows(addons, lambda rarity: "assembly " + rarity, retired=True)}</div>'
+        for item, addons in ITEMS.items()
+    )
+    killer_sections = "".join(
+        f'<figure><a href="{href(killer)}" title="{escape(power)}"><img src="/images/{short}.png"/></a></figure>'
+        f'<h3><span class="mw-headline" id="{href(power)[6:]}">{escape(power)}</span></h3>'
+        f'{addon_rows(KILLER_ADDONS[power], lambda rarity: "assembly " + rarity)}'
+        for killer, power, short, _ in KILLERS if killer != "The Nurse"
+    )
+    return page("Add-ons", (
+        '<p><b>Add-ons</b> modify Items and Powers.</p>'
+        '<div class="tabber wds-tabber"><div class="wds-tab__content"><h3>Overview</h3><p>Rarities.</p></div></div>'
+        f'<div class="tabber wds-tabber">{tabs}</div>'
+        f"<h2>Killer Add-ons</h2>{killer_sections}"
+    ))
+
+def trapper_page():
+    # The add-ons page heads his add-ons "Bear Trap", which the scraper renames,
+    # so it looks for them here too
+    return page("The Trapper", '<p><b>The Trapper</b> is a Killer.</p><h3>Lore</h3><p>A hunter.</p>')
+
+def nurse_page():
+    power = "Spencer's Last Breath"
+    anchor = "Add-ons_for_" + power.replace(" ", "_")
+    return page("The Nurse", (
+        '<p><b>The Nurse</b> is a Killer.</p>'
+        f'<h3 id="{escape(anchor)}"><span class="mw-headline" id="{escape(anchor)}">Add-ons for {escape(power)}</span></h3>'
+        f'{addon_rows(KILLER_ADDONS[power], lambda rarity: rarity + " assembly")}'
+    ))
+
+def offerings_page():
+    rows = "".join(
+        f'<tr><th><a href="{href(name)}" title="{escape(name)}"><img src="{icon(name)}"/></a></th>'
+        f'<th><a href="{href(name)}" title="{escape(name)}">{escape(name)}</a></th>'
+        f'<td>{description(name, number + 1)}</td></tr>'
+        for number, (name, _, _) in enumerate(OFFERINGS)
+    )
+    return page("Offerings", (
+        '<p><b>Offerings</b> are burnt before a Trial.</p>'
+        f'<table class="wikitable"><tr><th>Icon</th><th>Name</th><th>Description</th></tr>{rows}</table>'
+    ))
+
+def offering_page(name, rarity, players):
+    return page(name, f'<p>{rarity} Offering for {players}</p><p>{escape(name)} is an Offering.</p>')
+
+def flashlights_page():
+    rows = "".join(
+        f'<tr><th><img src="{icon(name)}"/></th><th><a href="{href(name)}" title="{escape(name)}">{escape(name)}</a></th>'
+        f'<td>{description(name, number + 1)}'
+        f'{"" if obtainable else "<p>THIS ITEM CAN NO LONGER BE OBTAINED FROM THE BLOODWEB</p>"}</td></tr>'
+        for number, (name, obtainable) in enumerate(FLASHLIGHTS)
+    )
+    addons = "".join(
+        f'<tr><th><img src="{icon(name)}"/></th><th><a href="{href(name)}" title="{escape(name)}">{escape(name)}</a></th>'
+        f'<td>{description(name, number + 1)}</td></tr>'
+        for number, (name, _) in enumerate(ITEMS["Flashlights"])
+    )
+    return page("Flashlights", (
+        '<p><b>Flashlights</b> blind Killers.</p>'
+        f'<table class="wikitable"><tr><th>Icon</th><th>Name</th><th>Description</th></tr>{rows}</table>'
+        f'<table class="wikitable"><tr><th>Icon</th><th>Name</th><th>Description</th></tr>{addons}</table>'
+    ))
+
+def revisions_response():
+    titles = [name for name, _, _ in OFFERINGS]
+    pages = [{"pageid": 1000 + number, "ns": 0, "title": title, "lastrevid": 50000 + number}
+             for number, title in enumerate(titles)]
+    url = dbdscraper._fixture_url(dbdscraper.WIKI_BASE + "/api.php", {
+        "action": "query",
+        "prop": "info",
+        "titles": "|".join(titles),
+        "format": "json",
+        "formatversion": "2",
+    })
+    return url, json.dumps({"batchcomplete": True, "query": {"pages": pages}})
+
+def pages():
+    """Return {url: (content type, body)} for every request a rebuild makes."""
+    base = dbdscraper.WIKI_BASE
+    html = "text/html; charset=utf-8"
+    responses = {
+        base + "/wiki/Killers": (html, killers_page()),
+        base + "/wiki/Survivors": (html, survivors_page()),
+        base + "/wiki/Add-ons": (html, addons_page()),
+        base + "/wiki/The_Trapper": (html, trapper_page()),
+        base + "/wiki/The_Nurse": (html, nurse_page()),
+        base + "/wiki/Offerings": (html, offerings_page()),
+        base + "/wiki/Flashlights": (html, flashlights_page()),
+    }
+    for name, rarity, players in OFFERINGS:
+        responses[base + href(name)] = (html, offering_page(name, rarity, players))
+    url, body = revisions_response()
+    responses[url] = ("application/json; charset=utf-8", body)
+    return {dbdscraper._fixture_url(url, None): response for url, response in responses.items()}
+
+def write_archive(path):
+    entries, bodies = {}, {}
+    for url, (content_type, text) in pages().items():
+        body = text.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        name = "bodies/" + digest
+        entries[url] = {
+            "status": 200,
+            "encoding": "utf-8",
+            "headers": {"Content-Type": content_type, "ETag": f'"{digest[:32]}"'},
+            "body": name,
+        }
+        bodies[name] = body
+    manifest = {"version": dbdscraper.FIXTURE_VERSION, "wiki_base": dbdscraper.WIKI_BASE, "entries": entries}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Fixed timestamps, so the same pages always give the same archive
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(zipfile.ZipInfo("manifest.json"), json.dumps(manifest, indent=1, sort_keys=True),
+                         zipfile.ZIP_DEFLATED)
+        for name in sorted(bodies):
+            archive.writestr(zipfile.ZipInfo(name), bodies[name], zipfile.ZIP_DEFLATED)
+    return len(entries)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    print(f"Wrote {write_archive(path)} pages to {os.path.relpath(path)}")
@@ -0,0 +1,101 @@
+"""Check that targeted parsing gives the same scraper output as a full parse.
+
+Runs every scraper twice against the pages of a fixture archive, offline:
+once with full html.parser trees, which is how the scrapers originally parsed
+pages, and once with the configured backend and strainers. The archive is the
+committed fixtures/wiki.zip (see tools/make_wiki_fixture.py) unless another is
+given, such as a recording of the live wiki; --cache-dir reads the pages saved
+in a page cache by a rebuild instead. Exits with status 1 if any scraper's
+output differs.
+
+    python tools/parser_parity.py [--parser lxml] [--archive fixtures/wiki.zip | --cache-dir .page_cache]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dbdscraper
+
+DEFAULT_ARCHIVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures", "wiki.zip")
+
+SCRAPERS = {
+    "killers": lambda: dbdscraper.scrape_killers(),
+    "survivors": lambda: dbdscraper.scrape_survivors(),
+    "killer_perks": lambda: dbdscraper.scrape_killer_perks(),
+    "survivor_perks": lambda: dbdscraper.scrape_survivor_perks(),
+    "survivor_items": lambda: dbdscraper.scrape_survivor_items(),
+    "survivor_addons": lambda: dbdscraper.scrape_survivor_addons(),
+    "killer_addons": lambda: dbdscraper.scrape_addons(dbdscraper.scrape_killers()),
+    "flashlights": lambda: dbdscraper.scrape_flashlights(),
+    "offerings": lambda: dbdscraper.scrape_offerings(),
+}
+
+def saved_page(url):
+    entry = dbdscraper._load_page_index().get(url)
+    text = dbdscraper._read_cached_page(entry) if entry else None
+    if text is None:
+        raise LookupError(f"{url} is not in the page cache")
+    return text
+
+def run_scrapers(parser, targeted):
+    dbdscraper.HTML_PARSER = parser
+    dbdscraper.TARGETED_PARSING = targeted
+    dbdscraper.reset_page_cache()
+    dbdscraper._clean_cache.clear()
+    results = {}
+    for name, scraper in SCRAPERS.items():
+        try:
+            results[name] = scraper()
+        except (LookupError, requests.ConnectionError) as e:
+            results[name] = e
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parser", default=dbdscraper.HTML_PARSER, help="BeautifulSoup backend to compare against html.parser")
+    pages = parser.add_mutually_exclusive_group()
+    pages.add_argument("--archive", default=DEFAULT_ARCHIVE, help="fixture archive to replay the pages from")
+    pages.add_argument("--cache-dir", help="page cache to read saved pages from instead of an archive")
+    args = parser.parse_args(argv)
+
+    scratch_dir = tempfile.mkdtemp()
+    dbdscraper.OFFERING_DETAILS_PATH = os.path.join(scratch_dir, "offerings.json")
+    if args.cache_dir:
+        dbdscraper.PAGE_CACHE_DIR = args.cache_dir
+        dbdscraper.fetch_page = saved_page
+        # Offering details come from the saved offering pages, not from the wiki API
+        dbdscraper.fetch_page_revisions = lambda hrefs: {}
+    else:
+        dbdscraper.PAGE_CACHE_DIR = os.path.join(scratch_dir, "pages")
+        dbdscraper.use_fixture_archive(args.archive, "replay")
+
+    reference = run_scrapers("html.parser", targeted=False)
+    candidate = run_scrapers(args.parser, targeted=True)
+
+    failed = False
+    for name in SCRAPERS:
+        expected, actual = reference[name], candidate[name]
+        if isinstance(expected, Exception):
+            print(f"SKIP  {name}: {expected}")
+        elif expected == actual:
+            print(f"OK    {name}: {len(expected)} rows")
+        else:
+            failed = True
+            print(f"FAIL  {name}: output differs")
+            if isinstance(actual, Exception):
+                print(f"      {actual}")
+            else:
+                for want, got in zip(expected, actual):
+                    if want != got:
+                        print(f"      expected {want!r}\n      got      {got!r}")
+                        break
+                if len(expected) != len(actual):
+                    print(f"      expected {len(expected)} rows, got {len(actual)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())